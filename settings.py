@@ -7,6 +7,17 @@ PASSWORD: Final = "postgres"
 HOST: Final = "127.0.0.1"
 PORT: Final = "5432"
 
+# connection pool shared by the pipeline and the API,
+# idle connections above DB_POOL_MIN are closed
+DB_POOL_MIN: Final = 2
+DB_POOL_MAX: Final = 10
+# connections idle for longer are checked before use
+DB_POOL_CHECK_SECONDS: Final = 30
+# the API listens for notifications again this often after losing the connection
+DB_LISTEN_RETRY_SECONDS: Final = 5
+# files registered in DB in one batch
+FILES_BATCH_SIZE: Final = 1000
+
 # open access hub
 OAH_LOGIN: Final = ""
 OAH_PASSWORD: Final = ""
@@ -15,3 +26,62 @@ OAH_PASSWORD: Final = ""
 # if you want to publish data to AGOL
 AGOL_LOGIN: Final = ""
 AGOL_PASSWORD: Final = ""    
+
+# imagery processing
+# keep rasters passed between processing stages in memory (GDAL /vsimem/)
+INTERMEDIATE_IN_MEMORY: Final = True
+# above this size of in-memory rasters, next ones are written to disk
+INTERMEDIATE_SPILL_THRESHOLD_MB: Final = 4096
+# cache results of pipeline stages on disk, so a failed run can be resumed,
+# when disabled, intermediate rasters are kept in memory
+PIPELINE_CACHE: Final = True
+# keep cached stages after a successful run
+PIPELINE_KEEP_CACHE: Final = False
+# products are downloaded while earlier ones are processed, at most this many
+# are waiting for processing
+PIPELINE_PREFETCH_PRODUCTS: Final = 2
+# next products are not downloaded while products waiting for processing
+# would take more than this, or less memory than this is available
+PIPELINE_PREFETCH_GB: Final = 4
+PIPELINE_MIN_FREE_MEMORY_GB: Final = 4
+# downloaded products are deleted when their stages are done, so processing
+# frees disk space for next downloads, but failed runs download them again
+# and jobs calculating past dates of AOIs do not find them
+PIPELINE_DELETE_PRODUCTS: Final = False
+# downloads wait for processing of waiting products while less disk space
+# than this would be left after the download, and fail if none are waiting
+DOWNLOAD_MIN_FREE_GB: Final = 10
+# computed rasters are compressed and written by background threads,
+# stages wait when this many rasters are waiting for writing
+WRITER_THREADS: Final = 2
+WRITER_QUEUE_SIZE: Final = 4
+# record per-stage metrics to data/metrics
+METRICS: Final = True
+
+# API
+# time series of AOI statistics cached in memory
+TIMESERIES_CACHE_SIZE: Final = 4096
+# statistics of any polygon are computed in worker processes,
+# for polygons up to the area
+STATS_WORKERS: Final = 2
+STATS_MAX_AREA_KM2: Final = 100
+# rendered map tiles cached in memory, a few KB each
+TILES_CACHE_SIZE: Final = 4096
+# authenticated users cached in memory, changes in DB drop them from the cache
+USER_CACHE_SIZE: Final = 1024
+USER_CACHE_SECONDS: Final = 60
+# vector tiles of AOIs and clouds cached in memory
+MVT_CACHE_SIZE: Final = 4096
+MVT_CACHE_SECONDS: Final = 300
+
+# jobs
+# workers check the queue of jobs this often when it is empty
+JOBS_POLL_SECONDS: Final = 5
+# running jobs send heartbeats this often, jobs without them for JOBS_STALE_SECONDS
+# are queued again, e.g. when their worker node was stopped
+JOBS_HEARTBEAT_SECONDS: Final = 30
+JOBS_STALE_SECONDS: Final = 300
+# failed jobs of distributed tasks are retried after JOBS_RETRY_SECONDS,
+# doubled with every attempt
+JOBS_MAX_ATTEMPTS: Final = 3
+JOBS_RETRY_SECONDS: Final = 60
@@ -15,16 +15,21 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from starlette.responses import RedirectResponse, Response, JSONResponse
 
-from ..db_client.models.users import UserNoPassword
+from ..db_client.models.users import USERS_CHANNEL, UserNoPassword
+from ..db_client.pool import close_pools
+from ..db_client.async_db_client import close_pool, get_pool, listen
+from ..db_client.models.stats import STATS_CHANNEL
 from .models.authentication import (
     BasicAuth,
     Token,
     authenticate_user,
     get_current_active_user,
     create_access_token,
+    invalidate_user,
+    user_claims,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
-from .routers import aois, users
+from .routers import aois, files, jobs, mvt, stats, tiles, users
 
 origins = {
     "http://localhost",
@@ -45,6 +50,25 @@ app.add_middleware(
 
 app.include_router(users.router)
 app.include_router(aois.router)
+app.include_router(stats.router)
+app.include_router(tiles.router)
+app.include_router(mvt.router)
+app.include_router(files.router)
+app.include_router(jobs.router)
+
+
+@app.on_event("startup")
+async def open_database_connections():
+    await get_pool()
+    await listen(STATS_CHANNEL, aois.invalidate_timeseries)
+    await listen(USERS_CHANNEL, invalidate_user)
+
+
+@app.on_event("shutdown")
+async def close_database_connections():
+    await close_pool()
+    close_pools()
+    stats.shutdown_executor()
 
 
 @app.get("/")
@@ -54,12 +78,12 @@ async def root():
 
 @app.post("/token", response_model=Token)
 async def route_login_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = authenticate_user(form_data.username, form_data.password)
+    user = await authenticate_user(form_data.username, form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect username or password")
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data=user_claims(user), expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -80,12 +104,12 @@ async def login_basic(auth: BasicAuth = Depends(basic_auth)):
     try:
         decoded = base64.b64decode(auth).decode("ascii")
         username, _, password = decoded.partition(":")
-        user = authenticate_user(username, password)
+        user = await authenticate_user(username, password)
         if not user:
             raise HTTPException(status_code=400, detail="Incorrect email or password")
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
         access_token = create_access_token(
-            data={"sub": username}, expires_delta=access_token_expires
+            data=user_claims(user), expires_delta=access_token_expires
         )
 
         token = jsonable_encoder(access_token)
@@ -0,0 +1,61 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Union
+
+
+class LRUCache:
+    """
+    In-process cache keeping maxsize most recently used items,
+    for at most ttl seconds if given.
+    Generation is increased by every invalidation, so results of queries
+    started before it can be dropped instead of cached.
+    """
+
+    def __init__(self, maxsize: int, ttl: Union[float, None] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._items: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        self.generation = 0
+
+    def get(self, key: Hashable) -> Union[Any, None]:
+        with self._lock:
+            if key not in self._items:
+                return None
+            expires, value = self._items[key]
+            if expires is not None and expires < time.monotonic():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return value
+
+    def put(
+        self, key: Hashable, value: Any, generation: Union[int, None] = None
+    ) -> None:
+        """
+        Stores the value, unless generation is given and the cache was
+        invalidated since, then the value may be stale and is dropped.
+        """
+        expires = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._items[key] = (expires, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def invalidate(
+        self, matches: Union[Callable[[Hashable], bool], None] = None
+    ) -> int:
+        """
+        Removes items with keys for which matches is true, all items by default.
+        Returns number of removed items.
+        """
+        with self._lock:
+            self.generation += 1
+            keys = [key for key in self._items if matches is None or matches(key)]
+            for key in keys:
+                del self._items[key]
+            return len(keys)
@@ -0,0 +1,40 @@
+"""
+Conditional and compressed responses of the API.
+"""
+import gzip
+import hashlib
+from typing import Tuple
+
+# smaller bodies are not worth compressing
+GZIP_MIN_SIZE = 1024
+GZIP_LEVEL = 5
+
+
+def etag(body: bytes) -> str:
+    # weak, because the gzip and plain bodies are equivalent
+    return 'W/"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """
+    If the ETag is in the If-None-Match header, "*" matches any ETag.
+    Tags are compared weakly, as required for If-None-Match, ignoring W/.
+    """
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or (tag[2:] if tag.startswith("W/") else tag) == opaque:
+            return True
+    return False
+
+
+def compress(body: bytes, accept_encoding: str) -> Tuple[bytes, dict]:
+    """
+    Body compressed with gzip if the client accepts it, with headers to add.
+    """
+    if len(body) < GZIP_MIN_SIZE or "gzip" not in accept_encoding.lower():
+        return body, {"Vary": "Accept-Encoding"}
+    return gzip.compress(body, compresslevel=GZIP_LEVEL), {
+        "Content-Encoding": "gzip",
+        "Vary": "Accept-Encoding",
+    }
@@ -0,0 +1,100 @@
+"""
+Streaming of produced files: byte ranges of one file and zip archives
+written while they are sent, so no file is read whole into memory.
+"""
+import os
+import re
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple, Union
+
+CHUNK_SIZE = 1024 * 1024
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> Union[Tuple[int, int], None]:
+    """
+    First and last byte of a single range of the Range header,
+    None if the whole file has to be sent, e.g. for multiple ranges.
+    """
+    match = RANGE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # suffix range, last bytes of the file
+        length = int(last)
+        if length == 0:
+            raise RangeNotSatisfiable()
+        return max(0, size - length), size - 1
+    first = int(first)
+    last = size - 1 if last == "" else min(int(last), size - 1)
+    if first >= size or first > last:
+        raise RangeNotSatisfiable()
+    return first, last
+
+
+def iter_file(path: Path, first: int, last: int) -> Iterator[bytes]:
+    with open(path, "rb") as file:
+        file.seek(first)
+        remaining = last - first + 1
+        while remaining > 0:
+            chunk = file.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+class _Sink:
+    """
+    Non-seekable file collecting bytes written by ZipFile until they are sent.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data: bytes) -> int:
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_zip(files: Iterable[Tuple[Path, str]]) -> Iterator[bytes]:
+    """
+    Zip archive of files saved under their names in the archive,
+    missing files are skipped. TIF files are compressed already, so they are stored.
+    """
+    sink = _Sink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        for path, name in files:
+            if not path.is_file():
+                print(f"Skipping missing file {path}")
+                continue
+            info = zipfile.ZipInfo.from_file(path, name)
+            with open(path, "rb") as file, archive.open(
+                info, mode="w", force_zip64=os.path.getsize(path) > 2**31
+            ) as entry:
+                while True:
+                    chunk = file.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    entry.write(chunk)
+                    yield sink.drain()
+    yield sink.drain()
@@ -0,0 +1,20 @@
+"""
+GeoJSON feature collections built from geometries serialized by the database,
+so geometries are not decoded and encoded again in the API.
+"""
+from typing import List
+
+MEDIA_TYPE = "application/geo+json"
+
+
+def feature_collection(rows: List[dict]) -> bytes:
+    """
+    FeatureCollection of AOIs from rows of geom_id, order_id and GeoJSON geometry.
+    """
+    features = ",".join(
+        f'{{"type":"Feature","id":{row["geom_id"]},'
+        f'"properties":{{"geom_id":{row["geom_id"]},"order_id":{row["order_id"]}}},'
+        f'"geometry":{row["geometry"]}}}'
+        for row in rows
+    )
+    return f'{{"type":"FeatureCollection","features":[{features}]}}'.encode()
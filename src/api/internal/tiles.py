@@ -0,0 +1,150 @@
+"""
+Rendering of XYZ tiles in EPSG:3857 from final rasters of indexes,
+with the colormap of the web application: 5 classes of YlOrRd.
+"""
+import math
+import os
+import warnings
+from functools import lru_cache
+from typing import Final, List, Tuple
+
+import matplotlib as mpl
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.errors import NotGeoreferencedWarning, WindowError
+from rasterio.io import MemoryFile
+from rasterio.windows import Window, from_bounds
+
+from src.imagery_processing.statistics import HISTOGRAM_RANGES
+
+TILE_SIZE: Final = 256
+MAX_ZOOM: Final = 24
+# half of the circumference of the Earth in EPSG:3857
+ORIGIN_SHIFT: Final = 20037508.342789244
+
+# same colors as get_colormap of the web application, for pixel values 1-5
+COLORS: Final = mpl.cm.ScalarMappable(cmap=mpl.cm.YlOrRd).to_rgba(
+    np.arange(1, 6, 1), alpha=True, bytes=True
+)
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """
+    Bounds of the tile in EPSG:3857 as left, bottom, right, top.
+    """
+    size = 2 * ORIGIN_SHIFT / 2**z
+    left = -ORIGIN_SHIFT + x * size
+    top = ORIGIN_SHIFT - y * size
+    return left, top - size, left + size, top
+
+
+def is_valid_tile(z: int, x: int, y: int) -> bool:
+    return 0 <= z <= MAX_ZOOM and 0 <= x < 2**z and 0 <= y < 2**z
+
+
+def checksum(layer: str) -> Tuple[str, int, int]:
+    """
+    Cheap checksum of the raster, based on its path, size and modification time,
+    it changes when the raster is saved again.
+    """
+    stat = os.stat(layer)
+    return layer, stat.st_size, stat.st_mtime_ns
+
+
+@lru_cache(maxsize=1024)
+def _value_range(layer: str, layer_checksum: tuple) -> Tuple[float, float]:
+    # read from the smallest overview, so every tile of the raster has the same classes
+    with rasterio.open(layer) as src:
+        factor = max(src.overviews(1) or [1])
+        data = src.read(
+            1,
+            out_shape=(
+                max(1, src.height // factor),
+                max(1, src.width // factor),
+            ),
+        )
+    valid = data[np.isfinite(data)]
+    if not valid.size:
+        return 0.0, 1.0
+    return float(valid.min()), float(valid.max())
+
+
+def value_range(layer: str, index: str) -> Tuple[float, float]:
+    """
+    Range of values split into the classes of the colormap, fixed for drought indexes.
+    """
+    if index in HISTOGRAM_RANGES:
+        return HISTOGRAM_RANGES[index]
+    return _value_range(layer, checksum(layer))
+
+
+def _classify(data: np.ndarray, low: float, high: float) -> np.ndarray:
+    """
+    Colors of the values, NaN values are transparent.
+    """
+    width = (high - low) / len(COLORS) or 1.0
+    with np.errstate(invalid="ignore"):
+        classes = np.clip(np.floor((data - low) / width), 0, len(COLORS) - 1)
+    rgba = COLORS[np.nan_to_num(classes).astype("uint8")]
+    rgba[~np.isfinite(data)] = 0
+    return rgba
+
+
+def _read_tile(layer: str, bounds: tuple) -> Tuple[np.ndarray, Window]:
+    """
+    Values of the raster inside the tile, resampled to the tile resolution,
+    and the window of the tile they fill. Overviews are used when zoomed out.
+    """
+    with rasterio.open(layer) as src:
+        tile_window = from_bounds(*bounds, transform=src.transform)
+        window = tile_window.intersection(Window(0, 0, src.width, src.height))
+        scale_x = TILE_SIZE / tile_window.width
+        scale_y = TILE_SIZE / tile_window.height
+        col = math.floor((window.col_off - tile_window.col_off) * scale_x)
+        row = math.floor((window.row_off - tile_window.row_off) * scale_y)
+        width = min(TILE_SIZE - col, max(1, round(window.width * scale_x)))
+        height = min(TILE_SIZE - row, max(1, round(window.height * scale_y)))
+        data = src.read(
+            1,
+            window=window,
+            out_shape=(height, width),
+            resampling=Resampling.nearest,
+        )
+    return data, Window(col, row, width, height)
+
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        with MemoryFile() as memfile:
+            with memfile.open(
+                driver="PNG",
+                width=TILE_SIZE,
+                height=TILE_SIZE,
+                count=4,
+                dtype="uint8",
+            ) as dst:
+                dst.write(np.moveaxis(rgba, -1, 0))
+            return memfile.read()
+
+
+def render_tile(layers: List[str], index: str, z: int, x: int, y: int) -> bytes:
+    """
+    PNG tile of the index, later layers are drawn over earlier ones.
+    """
+    bounds = tile_bounds(z, x, y)
+    tile = np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype="uint8")
+    for layer in layers:
+        try:
+            data, window = _read_tile(layer, bounds)
+        except WindowError:
+            continue
+        rgba = _classify(data, *value_range(layer, index))
+        target = tile[window.toslices()]
+        visible = rgba[..., 3] > 0
+        target[visible] = rgba[visible]
+    return _encode_png(tile)
+
+
+EMPTY_TILE: Final = _encode_png(np.zeros((TILE_SIZE, TILE_SIZE, 4), dtype="uint8"))
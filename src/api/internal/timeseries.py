@@ -0,0 +1,59 @@
+"""
+Serialization of time series of AOI statistics, as columnar JSON or Arrow IPC stream.
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import List, Union
+
+import pyarrow as pa
+
+# statistics in the time series, columns of drought.stats
+COLUMNS = ["mean", "median", "p10", "p90", "valid_fraction", "cloud_fraction"]
+MEDIA_TYPES = {
+    "json": "application/json",
+    "arrow": "application/vnd.apache.arrow.stream",
+}
+
+
+def _to_json(geom_id: int, index: str, rows: List[dict]) -> bytes:
+    series = {
+        "geom_id": geom_id,
+        "index": index,
+        "dates": [row["date"].strftime("%Y-%m-%d") for row in rows],
+        **{column: [row[column] for row in rows] for column in COLUMNS},
+    }
+    return json.dumps(series, separators=(",", ":")).encode()
+
+
+def _to_arrow(geom_id: int, index: str, rows: List[dict]) -> bytes:
+    table = pa.table(
+        {
+            "date": pa.array([row["date"] for row in rows], pa.timestamp("s")),
+            **{
+                column: pa.array([row[column] for row in rows], pa.float64())
+                for column in COLUMNS
+            },
+        },
+        metadata={"geom_id": str(geom_id), "index": index},
+    )
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def serialize(geom_id: int, index: str, rows: List[dict], format: str) -> dict:
+    """
+    Body of the response with its media type, ETag and time of the last change.
+    """
+    body = (_to_arrow if format == "arrow" else _to_json)(geom_id, index, rows)
+    last_modified: Union[datetime, None] = max(
+        (row["updated_at"] for row in rows), default=None
+    )
+    return {
+        "body": body,
+        "media_type": MEDIA_TYPES[format],
+        "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+        "last_modified": last_modified,
+    }
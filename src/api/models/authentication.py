@@ -14,10 +14,13 @@ from fastapi.security.utils import get_authorization_scheme_param
 from fastapi.openapi.models import OAuthFlows as OAuthFlowsModel
 
 from starlette.status import HTTP_403_FORBIDDEN
+from starlette.concurrency import run_in_threadpool
 from starlette.requests import Request
 
+from settings import USER_CACHE_SIZE, USER_CACHE_SECONDS
 from src.db_client.models.users import UserNoPassword
-from src.db_client.db_client import DBClient
+from src.db_client.async_db_client import AsyncDBClient
+from src.api.internal.cache import LRUCache
 
 # to get a string like this run:
 # openssl rand -hex 32
@@ -25,6 +28,12 @@ SECRET_KEY = "988862c3976496a34adc80a2258b621ddf39c476b10e2ae764c9f8b37abbdb8d"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# users by username, so authenticated requests do not query DB,
+# entries are dropped when the user changes in DB or after USER_CACHE_SECONDS
+users_cache = LRUCache(USER_CACHE_SIZE, ttl=USER_CACHE_SECONDS)
+
 
 class Token(BaseModel):
     access_token: str
@@ -33,6 +42,7 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: str = None
+    user_id: int = None
 
 
 class OAuth2PasswordBearerCookie(OAuth2):
@@ -102,25 +112,55 @@ class BasicAuth(SecurityBase):
 
 
 def verify_password(plain_password, hashed_password):
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     return pwd_context.verify(plain_password, hashed_password)
 
 
 def get_password_hash(password):
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     return pwd_context.hash(password)
 
 
-def authenticate_user(username: str, password: str):
-    db = DBClient()
-    user = db.get_user(username)
+def invalidate_user(payload: str) -> None:
+    """
+    Drops the user from the notification of a changed user, all users if empty.
+    """
+    if not payload:
+        users_cache.invalidate()
+        return
+    users_cache.invalidate(lambda username: username == payload)
+
+
+async def get_cached_user(username: str) -> Optional[UserNoPassword]:
+    user = users_cache.get(username)
+    if user is None:
+        # the user may be changed while it is queried
+        generation = users_cache.generation
+        db = AsyncDBClient()
+        user = await db.get_user(username)
+        if user is None:
+            return None
+        user = UserNoPassword(**user.dict(exclude={"password"}))
+        users_cache.put(username, user, generation)
+    return user
+
+
+async def authenticate_user(username: str, password: str):
+    db = AsyncDBClient()
+    user = await db.get_user(username)
     if not user:
         return False
-    if not verify_password(password, user.password):
+    # bcrypt is slow on purpose, so it would block the event loop
+    if not await run_in_threadpool(verify_password, password, user.password):
         return False
     return user
 
 
+def user_claims(user: UserNoPassword) -> dict:
+    """
+    Claims of the access token identifying the user.
+    """
+    return {"sub": user.username, "uid": user.user_id}
+
+
 def create_access_token(*, data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -143,13 +183,15 @@ async def get_current_user(
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
+        token_data = TokenData(username=username, user_id=payload.get("uid"))
     except PyJWTError:
         raise credentials_exception
-    db = DBClient()
-    user = db.get_user(username=token_data.username)
+    user = await get_cached_user(token_data.username)
     if user is None:
         raise credentials_exception
+    # tokens of a deleted user are not valid for a new user with the same name
+    if token_data.user_id is not None and token_data.user_id != user.user_id:
+        raise credentials_exception
     return user
 
 
@@ -1,28 +1,128 @@
-from typing import List
+from datetime import date, datetime, time, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
 
-from fastapi import APIRouter, Depends
-import geopandas as gpd
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 
+from settings import TIMESERIES_CACHE_SIZE
 from ...db_client.models.users import UserNoPassword
-from ...db_client.db_client import DBClient
+from ...db_client.async_db_client import AsyncDBClient
+from ...imagery_processing.indexes import INDEXES
+from ..internal import encoding, geojson
+from ..internal.cache import LRUCache
+from ..internal.timeseries import serialize
 from ..models.authentication import get_current_active_user
 
 router = APIRouter()
 
+# serialized time series by (user_id, geom_id, index, from, to, format)
+timeseries_cache = LRUCache(TIMESERIES_CACHE_SIZE)
+
+
+def invalidate_timeseries(payload: str) -> None:
+    """
+    Drops cached time series of AOIs from the notification of new statistics.
+    """
+    if not payload:
+        timeseries_cache.invalidate()
+        return
+    geom_ids = {int(geom_id) for geom_id in payload.split(",")}
+    timeseries_cache.invalidate(lambda key: key[1] in geom_ids)
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]):
+    if "if-none-match" in request.headers:
+        return encoding.etag_matches(request.headers["if-none-match"], etag)
+    if last_modified and "if-modified-since" in request.headers:
+        try:
+            since = parsedate_to_datetime(request.headers["if-modified-since"])
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates have no fraction of seconds, statistics are updated in UTC
+        return last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+    return False
+
 
 @router.get("/aois/mine/", tags=["aois"])
 async def read_mine_aois(
+    request: Request,
+    simplify: Optional[float] = Query(
+        None, ge=0, description="simplify geometries for display, in meters"
+    ),
+    limit: int = Query(1000, ge=1, le=10000, description="AOIs in one page"),
+    after: int = Query(0, ge=0, description="geom_id of the last AOI of the page"),
     current_user: UserNoPassword = Depends(get_current_active_user),
 ):
-    # credentials_exception = HTTPException(
-    #     status_code=HTTP_403_FORBIDDEN, detail="Could not validate credentials"
-    # )
-    db = DBClient()
-    aois = db.get_all_aois_for_user(current_user.user_id)
-
-    if len(aois) > 0:
-        aois = [aoi.dict() for aoi in aois]
-        aois = gpd.GeoDataFrame(aois)
-        print(aois.to_json())
-
-    return aois.to_json()
+    """
+    AOIs of the user as GeoJSON in EPSG:4326, ordered by geom_id.
+    If there are more AOIs, the Link header points to the next page.
+    """
+    db = AsyncDBClient()
+    rows = await db.get_aois_geojson_for_user(
+        current_user.user_id, simplify, limit, after
+    )
+    body = geojson.feature_collection(rows)
+
+    headers = {"ETag": encoding.etag(body), "Cache-Control": "private, no-cache"}
+    if len(rows) == limit:
+        next_page = request.url.include_query_params(after=rows[-1]["geom_id"])
+        headers["Link"] = f'<{next_page}>; rel="next"'
+    if _not_modified(request, headers["ETag"], None):
+        return Response(status_code=304, headers=headers)
+
+    body, encoding_headers = encoding.compress(
+        body, request.headers.get("accept-encoding", "")
+    )
+    return Response(
+        content=body,
+        media_type=geojson.MEDIA_TYPE,
+        headers={**headers, **encoding_headers},
+    )
+
+
+@router.get("/aois/{geom_id}/timeseries", tags=["aois"])
+async def read_aoi_timeseries(
+    geom_id: int,
+    request: Request,
+    index: str = Query(..., description="one of calculated indexes, e.g. nmdi"),
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    format: str = Query("json", regex="^(json|arrow)$"),
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Statistics of the index inside the AOI for every processed date,
+    as columnar JSON or Arrow IPC stream.
+    """
+    if index not in INDEXES:
+        raise HTTPException(status_code=404, detail=f"Unknown index {index}")
+
+    key = (current_user.user_id, geom_id, index, date_from, date_to, format)
+    series = timeseries_cache.get(key)
+    if series is None:
+        # statistics may be invalidated while they are queried
+        generation = timeseries_cache.generation
+        db = AsyncDBClient()
+        rows = await db.get_timeseries(
+            current_user.user_id,
+            geom_id,
+            index,
+            date_from and datetime.combine(date_from, time.min),
+            date_to and datetime.combine(date_to, time.min),
+        )
+        series = serialize(geom_id, index, rows, format)
+        timeseries_cache.put(key, series, generation)
+
+    headers = {"ETag": series["etag"], "Cache-Control": "private, no-cache"}
+    if series["last_modified"]:
+        headers["Last-Modified"] = format_datetime(
+            series["last_modified"].replace(microsecond=0, tzinfo=timezone.utc),
+            usegmt=True,
+        )
+    if _not_modified(request, series["etag"], series["last_modified"]):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        content=series["body"], media_type=series["media_type"], headers=headers
+    )
@@ -0,0 +1,103 @@
+import datetime as dt
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+from ...db_client.models.users import UserNoPassword
+from ...db_client.async_db_client import AsyncDBClient
+from ..internal.files import RangeNotSatisfiable, iter_file, iter_zip, parse_range
+from ..models.authentication import get_current_active_user
+
+router = APIRouter()
+
+
+@router.get("/files/{file_id}", tags=["files"])
+async def read_file(
+    file_id: int,
+    request: Request,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Produced TIF file, a single byte range can be requested with the Range header.
+    """
+    db = AsyncDBClient()
+    file = await db.get_file(current_user.user_id, file_id)
+    path = file and Path.cwd().joinpath(file["path"])
+    if path is None or not path.is_file():
+        raise HTTPException(status_code=404, detail=f"No file {file_id}")
+
+    stat = path.stat()
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    headers = {
+        "Accept-Ranges": "bytes",
+        "ETag": etag,
+        "Last-Modified": format_datetime(
+            dt.datetime.fromtimestamp(int(stat.st_mtime), dt.timezone.utc),
+            usegmt=True,
+        ),
+        "Content-Disposition": f'attachment; filename="{path.name}"',
+    }
+
+    byte_range = None
+    # ranges of an older version of the file are not mixed with the new one
+    if "range" in request.headers and request.headers.get("if-range", etag) == etag:
+        try:
+            byte_range = parse_range(request.headers["range"], stat.st_size)
+        except RangeNotSatisfiable:
+            return Response(
+                status_code=416,
+                headers={**headers, "Content-Range": f"bytes */{stat.st_size}"},
+            )
+
+    if byte_range is None:
+        first, last, status_code = 0, stat.st_size - 1, 200
+    else:
+        first, last = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {first}-{last}/{stat.st_size}"
+    headers["Content-Length"] = str(last - first + 1)
+
+    return StreamingResponse(
+        iter_file(path, first, last),
+        status_code=status_code,
+        media_type="image/tiff",
+        headers=headers,
+    )
+
+
+@router.get("/orders/{order_id}/bundle", tags=["files"])
+async def read_order_bundle(
+    order_id: int,
+    date_from: Optional[dt.date] = Query(None, alias="from"),
+    date_to: Optional[dt.date] = Query(None, alias="to"),
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Zip archive of files of the order produced in the date range,
+    saved as geom_id/date/file_name. It is sent while it is written.
+    """
+    db = AsyncDBClient()
+    files = await db.get_order_files(
+        current_user.user_id,
+        order_id,
+        date_from and dt.datetime.combine(date_from, dt.time.min),
+        date_to and dt.datetime.combine(date_to, dt.time.min),
+    )
+    if not files:
+        raise HTTPException(status_code=404, detail=f"No files of order {order_id}")
+
+    entries = [
+        (
+            Path.cwd().joinpath(file["path"]),
+            f"{file['geom_id']}/{file['date']:%Y-%m-%d}/{Path(file['path']).name}",
+        )
+        for file in files
+    ]
+    return StreamingResponse(
+        iter_zip(entries),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="order_{order_id}.zip"'},
+    )
@@ -0,0 +1,123 @@
+import datetime as dt
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Response
+from pydantic import BaseModel, Field, root_validator, validator
+
+from ...db_client.models.jobs import DONE, FAILED
+from ...db_client.models.users import UserNoPassword
+from ...db_client.async_db_client import AsyncDBClient
+from ...imagery_processing.indexes import INDEXES
+from ..models.authentication import get_current_active_user
+
+router = APIRouter()
+
+
+class AOIHistoryRequest(BaseModel):
+    geom_id: int
+    indexes: List[str]
+    date_from: dt.date = Field(..., alias="from")
+    date_to: dt.date = Field(..., alias="to")
+
+    @validator("indexes", each_item=True)
+    def known_index(cls, index):
+        if index not in INDEXES:
+            raise ValueError(f"Unknown index {index}")
+        return index
+
+    @root_validator(skip_on_failure=True)
+    def ordered_dates(cls, values):
+        if values["date_from"] > values["date_to"]:
+            raise ValueError("from is after to")
+        return values
+
+
+def _status(job) -> dict:
+    return {
+        "job_id": job.job_id,
+        "kind": job.kind,
+        "status": job.status,
+        "attempts": job.attempts,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "error": job.error,
+    }
+
+
+@router.post("/jobs", status_code=202, tags=["jobs"])
+async def submit_aoi_history(
+    request: AOIHistoryRequest,
+    response: Response,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Queues calculation of indexes for the AOI from already downloaded products
+    of the date range.
+    """
+    db = AsyncDBClient()
+    if not await db.has_aoi(current_user.user_id, request.geom_id):
+        raise HTTPException(status_code=404, detail=f"No AOI {request.geom_id}")
+
+    job_id = await db.submit_job(
+        "aoi_history",
+        current_user.user_id,
+        {
+            "geom_id": request.geom_id,
+            "indexes": request.indexes,
+            "from": request.date_from.isoformat(),
+            "to": request.date_to.isoformat(),
+        },
+    )
+    response.headers["Location"] = f"/jobs/{job_id}"
+    return {"job_id": job_id, "status": "queued"}
+
+
+async def _get_job(user_id: int, job_id: int):
+    job = await AsyncDBClient().get_job(user_id, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+
+@router.get("/jobs/{job_id}", tags=["jobs"])
+async def read_job(
+    job_id: int,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    return _status(await _get_job(current_user.user_id, job_id))
+
+
+@router.get("/jobs/{job_id}/result", tags=["jobs"])
+async def read_job_result(
+    job_id: int,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Result of the finished job with files produced for the AOI.
+    """
+    job = await _get_job(current_user.user_id, job_id)
+    if job.status == FAILED:
+        raise HTTPException(status_code=409, detail=f"Job failed: {job.error}")
+    if job.status != DONE:
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+    files = await AsyncDBClient().get_aoi_files(
+        current_user.user_id,
+        job.params["geom_id"],
+        job.params["indexes"],
+        dt.datetime.fromisoformat(job.params["from"]),
+        dt.datetime.fromisoformat(job.params["to"]),
+    )
+    return {
+        **job.result,
+        "files": [
+            {
+                "file_id": file["file_id"],
+                "index": file["wq_index"],
+                "date": file["date"].date().isoformat(),
+                "url": f"/files/{file['file_id']}",
+            }
+            for file in files
+        ],
+    }
@@ -0,0 +1,80 @@
+import datetime as dt
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+
+from settings import MVT_CACHE_SIZE, MVT_CACHE_SECONDS
+from ...db_client.models.users import UserNoPassword
+from ...db_client.async_db_client import AsyncDBClient
+from ..internal import encoding
+from ..internal.cache import LRUCache
+from ..internal.tiles import is_valid_tile
+from ..models.authentication import get_current_active_user
+
+router = APIRouter()
+
+MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+
+# vector tiles by (layer, user_id or date, z, x, y), AOIs and clouds are not
+# notified when they change, so tiles are kept for MVT_CACHE_SECONDS
+mvt_cache = LRUCache(MVT_CACHE_SIZE, ttl=MVT_CACHE_SECONDS)
+
+
+def _tile_response(request: Request, tile: bytes) -> Response:
+    headers = {"ETag": encoding.etag(tile), "Cache-Control": "private, no-cache"}
+    if encoding.etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers=headers)
+    tile, encoding_headers = encoding.compress(
+        tile, request.headers.get("accept-encoding", "")
+    )
+    return Response(
+        content=tile, media_type=MEDIA_TYPE, headers={**headers, **encoding_headers}
+    )
+
+
+def _check_tile(z: int, x: int, y: int) -> None:
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail=f"No tile {z}/{x}/{y}")
+
+
+@router.get("/mvt/aois/{z}/{x}/{y}.pbf", tags=["tiles"])
+async def read_aois_tile(
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Vector tile with AOIs of the user, geometries are clipped to the tile
+    and simplified to its resolution.
+    """
+    _check_tile(z, x, y)
+    key = ("aois", current_user.user_id, z, x, y)
+    tile = mvt_cache.get(key)
+    if tile is None:
+        db = AsyncDBClient()
+        tile = await db.get_aois_mvt(current_user.user_id, z, x, y)
+        mvt_cache.put(key, tile)
+    return _tile_response(request, tile)
+
+
+@router.get("/mvt/clouds/{date}/{z}/{x}/{y}.pbf", tags=["tiles"])
+async def read_clouds_tile(
+    date: dt.date,
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Vector tile with clouds detected in products of the date.
+    """
+    _check_tile(z, x, y)
+    key = ("clouds", date, z, x, y)
+    tile = mvt_cache.get(key)
+    if tile is None:
+        db = AsyncDBClient()
+        tile = await db.get_clouds_mvt(dt.datetime.combine(date, dt.time.min), z, x, y)
+        mvt_cache.put(key, tile)
+    return _tile_response(request, tile)
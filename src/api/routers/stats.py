@@ -0,0 +1,110 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time
+from itertools import groupby
+from pathlib import Path
+from typing import Optional, Union
+
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import BaseModel, Field
+from pyproj import Geod, Transformer
+from shapely.errors import ShapelyError
+from shapely.geometry import shape
+from shapely.ops import transform
+
+from settings import STATS_MAX_AREA_KM2, STATS_WORKERS
+from ...db_client.models.users import UserNoPassword
+from ...db_client.async_db_client import AsyncDBClient
+from ...imagery_processing.indexes import INDEXES
+from ...imagery_processing.statistics import polygon_statistics
+from ..models.authentication import get_current_active_user
+
+router = APIRouter()
+
+geod = Geod(ellps="WGS84")
+to_web_mercator = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
+
+# reading and reducing rasters would block the event loop
+_executor: Union[ProcessPoolExecutor, None] = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=STATS_WORKERS)
+    return _executor
+
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
+
+
+class StatsRequest(BaseModel):
+    geometry: dict = Field(..., description="GeoJSON polygon in EPSG:4326")
+    index: str
+    date_from: Optional[date] = Field(None, alias="from")
+    date_to: Optional[date] = Field(None, alias="to")
+
+
+@router.post("/stats", tags=["stats"])
+async def read_polygon_stats(
+    request: StatsRequest,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    Statistics of the index inside any polygon for every processed date,
+    computed from windows of final rasters intersecting the polygon.
+    """
+    if request.index not in INDEXES:
+        raise HTTPException(status_code=404, detail=f"Unknown index {request.index}")
+
+    try:
+        polygon = shape(request.geometry)
+    except (ShapelyError, AttributeError, KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=422, detail="Geometry is not valid GeoJSON")
+    if polygon.geom_type not in ["Polygon", "MultiPolygon"] or not polygon.is_valid:
+        raise HTTPException(status_code=422, detail="Geometry is not a valid polygon")
+
+    area_km2 = abs(geod.geometry_area_perimeter(polygon)[0]) / 1e6
+    if area_km2 > STATS_MAX_AREA_KM2:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Polygon of {area_km2:.1f} km2 is bigger than {STATS_MAX_AREA_KM2} km2",
+        )
+
+    geometry = transform(to_web_mercator.transform, polygon).wkb
+    db = AsyncDBClient()
+    products = await db.get_products(
+        current_user.user_id,
+        request.index,
+        request.date_from and datetime.combine(request.date_from, time.min),
+        request.date_to and datetime.combine(request.date_to, time.min),
+        geometry,
+    )
+
+    # products are ordered by date, rasters of one date are reduced together
+    loop = asyncio.get_running_loop()
+    dates = [
+        (
+            day,
+            loop.run_in_executor(
+                get_executor(),
+                polygon_statistics,
+                [str(Path.cwd().joinpath(product["path"])) for product in rows],
+                geometry,
+                request.index,
+            ),
+        )
+        for day, rows in groupby(products, key=lambda product: product["date"])
+    ]
+    return {
+        "index": request.index,
+        "area_km2": area_km2,
+        "dates": [
+            {"date": day.date().isoformat(), **(await statistics)}
+            for day, statistics in dates
+        ],
+    }
@@ -0,0 +1,70 @@
+import datetime as dt
+import hashlib
+from pathlib import Path
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from shapely.geometry import box
+from starlette.concurrency import run_in_threadpool
+
+from settings import TILES_CACHE_SIZE
+from ...db_client.models.users import UserNoPassword
+from ...db_client.async_db_client import AsyncDBClient
+from ...imagery_processing.indexes import INDEXES
+from ..internal import encoding
+from ..internal.cache import LRUCache
+from ..internal.tiles import (
+    EMPTY_TILE,
+    checksum,
+    is_valid_tile,
+    render_tile,
+    tile_bounds,
+)
+from ..models.authentication import get_current_active_user
+
+router = APIRouter()
+
+# PNG tiles by (index, z, x, y, checksums of rendered rasters),
+# tiles of rasters saved again are not used anymore and drop out of the cache
+tiles_cache = LRUCache(TILES_CACHE_SIZE)
+
+
+@router.get("/tiles/{index}/{date}/{z}/{x}/{y}.png", tags=["tiles"])
+async def read_tile(
+    index: str,
+    date: dt.date,
+    z: int,
+    x: int,
+    y: int,
+    request: Request,
+    current_user: UserNoPassword = Depends(get_current_active_user),
+):
+    """
+    XYZ tile of final rasters of the index on the date, regional ones
+    and ones clipped to AOIs of the user.
+    """
+    if index not in INDEXES:
+        raise HTTPException(status_code=404, detail=f"Unknown index {index}")
+    if not is_valid_tile(z, x, y):
+        raise HTTPException(status_code=404, detail=f"No tile {z}/{x}/{y}")
+
+    day = dt.datetime.combine(date, dt.time.min)
+    db = AsyncDBClient()
+    products = await db.get_products(
+        current_user.user_id, index, day, day, box(*tile_bounds(z, x, y)).wkb
+    )
+    layers = [str(Path.cwd().joinpath(product["path"])) for product in products]
+    if not layers:
+        return Response(content=EMPTY_TILE, media_type="image/png")
+
+    checksums = tuple(checksum(layer) for layer in layers)
+    key = (index, z, x, y, checksums)
+    etag = '"' + hashlib.sha256(repr(key).encode()).hexdigest()[:32] + '"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if encoding.etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+
+    tile = tiles_cache.get(key)
+    if tile is None:
+        tile = await run_in_threadpool(render_tile, layers, index, z, x, y)
+        tiles_cache.put(key, tile)
+    return Response(content=tile, media_type="image/png", headers=headers)
@@ -0,0 +1,344 @@
+"""
+Asynchronous client of the database for the API, with the queries of DBClient,
+so handlers do not block the event loop while waiting for the database.
+"""
+import asyncio
+import json
+from datetime import datetime
+from typing import Callable, List, Optional, Set, Tuple, Union
+
+import asyncpg
+
+from src.db_client.models.aois import AOI, aois_from_rows
+from src.db_client.models.jobs import Job
+from src.db_client.models.users import User
+
+from settings import (
+    DATABASE,
+    USER,
+    PASSWORD,
+    HOST,
+    PORT,
+    DB_POOL_MIN,
+    DB_POOL_MAX,
+    DB_LISTEN_RETRY_SECONDS,
+)
+
+_pool: Union[asyncpg.Pool, None] = None
+# listening connections with their termination listeners
+_listeners: List[Tuple[asyncpg.Connection, Callable]] = []
+_relistening: Set[asyncio.Task] = set()
+
+
+async def get_pool() -> asyncpg.Pool:
+    """
+    Pool of connections shared by all clients, the API creates it on startup.
+    """
+    global _pool
+    if _pool is None:
+        _pool = await asyncpg.create_pool(
+            database=DATABASE,
+            user=USER,
+            password=PASSWORD,
+            host=HOST,
+            port=int(PORT),
+            min_size=DB_POOL_MIN,
+            max_size=DB_POOL_MAX,
+        )
+    return _pool
+
+
+async def listen(channel: str, callback: Callable[[str], None]) -> None:
+    """
+    Calls callback with payload of every notification on the channel,
+    the connection is kept until the pool is closed. When the connection
+    is lost, the channel is listened on a new one and callback is called
+    with an empty payload, as notifications may have been missed.
+    """
+    pool = await get_pool()
+    connection = await pool.acquire()
+
+    def terminated(connection: asyncpg.Connection) -> None:
+        _listeners.remove((connection, terminated))
+        task = asyncio.get_running_loop().create_task(
+            _listen_again(pool, connection, channel, callback)
+        )
+        _relistening.add(task)
+        task.add_done_callback(_relistening.discard)
+
+    try:
+        await connection.add_listener(
+            channel, lambda connection, pid, channel, payload: callback(payload)
+        )
+    except BaseException:
+        await pool.release(connection)
+        raise
+    connection.add_termination_listener(terminated)
+    _listeners.append((connection, terminated))
+
+
+async def _listen_again(
+    pool: asyncpg.Pool,
+    connection: asyncpg.Connection,
+    channel: str,
+    callback: Callable[[str], None],
+) -> None:
+    print(f"Lost connection listening on {channel}, listening again")
+    await pool.release(connection)
+    while _pool is pool:
+        try:
+            await listen(channel, callback)
+        except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as error:
+            print(f"Listening on {channel} failed: {error}")
+            await asyncio.sleep(DB_LISTEN_RETRY_SECONDS)
+            continue
+        callback("")
+        return
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        for task in list(_relistening):
+            task.cancel()
+        for connection, terminated in _listeners:
+            connection.remove_termination_listener(terminated)
+            await _pool.release(connection)
+        _listeners.clear()
+        await _pool.close()
+        _pool = None
+
+
+class AsyncDBClient:
+    async def _execute_get(self, command: str, *values) -> List[asyncpg.Record]:
+        pool = await get_pool()
+        return await pool.fetch(command, *values)
+
+    async def get_all_aois(self) -> List[AOI]:
+        command = """
+        SELECT geom_id, order_id, ST_AsBinary(geom), ST_SRID(geom) FROM drought.aois
+        """
+        result = await self._execute_get(command)
+
+        return aois_from_rows(result)
+
+    async def get_aois_geojson_for_user(
+        self,
+        user_id: int,
+        simplify_tolerance: Optional[float] = None,
+        limit: int = 1000,
+        after_geom_id: int = 0,
+    ) -> List[asyncpg.Record]:
+        """
+        Page of AOIs of the user with geom_id greater than after_geom_id,
+        with geometries as GeoJSON in EPSG:4326, simplified in units of their SRID.
+        """
+        command = """
+        SELECT aois.geom_id, aois.order_id, ST_AsGeoJSON(ST_Transform(
+            CASE WHEN $2::float8 IS NULL THEN aois.geom
+            ELSE ST_SimplifyPreserveTopology(aois.geom, $2::float8) END,
+            4326
+        ), 7) AS geometry
+        FROM drought.aois
+        JOIN drought.orders ON aois.order_id = orders.order_id
+        WHERE orders.user_id = $1 AND aois.geom_id > $4
+        ORDER BY aois.geom_id
+        LIMIT $3
+        """
+        return await self._execute_get(
+            command, user_id, simplify_tolerance, limit, after_geom_id
+        )
+
+    async def get_aois_mvt(self, user_id: int, z: int, x: int, y: int) -> bytes:
+        """
+        Mapbox Vector Tile with AOIs of the user clipped to the tile, layer aois.
+        """
+        command = """
+        WITH bounds AS (SELECT ST_TileEnvelope($2, $3, $4) AS geom),
+        tile AS (
+            SELECT aois.geom_id, aois.order_id,
+            ST_AsMVTGeom(aois.geom, bounds.geom, 4096, 64, true) AS geom
+            FROM drought.aois
+            JOIN drought.orders ON aois.order_id = orders.order_id
+            CROSS JOIN bounds
+            WHERE orders.user_id = $1 AND aois.geom && bounds.geom
+        )
+        SELECT ST_AsMVT(tile, 'aois', 4096, 'geom') FROM tile
+        """
+        result = await self._execute_get(command, user_id, z, x, y)
+        return result[0][0] or b""
+
+    async def get_clouds_mvt(self, date: datetime, z: int, x: int, y: int) -> bytes:
+        """
+        Mapbox Vector Tile with clouds detected on the date clipped to the tile,
+        layer clouds.
+        """
+        command = """
+        WITH bounds AS (SELECT ST_TileEnvelope($2, $3, $4) AS geom),
+        tile AS (
+            SELECT clouds.product,
+            ST_AsMVTGeom(clouds.geom, bounds.geom, 4096, 64, true) AS geom
+            FROM drought.clouds
+            CROSS JOIN bounds
+            WHERE clouds.date = $1 AND clouds.geom && bounds.geom
+        )
+        SELECT ST_AsMVT(tile, 'clouds', 4096, 'geom') FROM tile
+        """
+        result = await self._execute_get(command, date, z, x, y)
+        return result[0][0] or b""
+
+    async def get_timeseries(
+        self,
+        user_id: int,
+        geom_id: int,
+        index: str,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> List[asyncpg.Record]:
+        """
+        Statistics of the index for every date, only for AOIs of the user.
+        """
+        command = """
+        SELECT stats.date, stats.mean, stats.median, stats.p10, stats.p90,
+        stats.valid_fraction, stats.cloud_fraction, stats.updated_at
+        FROM drought.stats
+        JOIN drought.orders ON stats.order_id = orders.order_id
+        WHERE stats.geom_id = $1 AND stats.wq_index = $2 AND orders.user_id = $3
+        AND ($4::timestamp IS NULL OR stats.date >= $4::timestamp)
+        AND ($5::timestamp IS NULL OR stats.date <= $5::timestamp)
+        ORDER BY stats.date
+        """
+        return await self._execute_get(
+            command, geom_id, index, user_id, date_from, date_to
+        )
+
+    async def get_products(
+        self,
+        user_id: int,
+        index: str,
+        date_from: Optional[datetime],
+        date_to: Optional[datetime],
+        geometry: bytes,
+    ) -> List[asyncpg.Record]:
+        """
+        Final rasters of the index intersecting the geometry given as WKB in EPSG:3857,
+        regional ones and ones clipped to AOIs of the user, regional first.
+        """
+        command = """
+        SELECT products.path, products.date FROM drought.products
+        LEFT JOIN drought.orders ON products.order_id = orders.order_id
+        WHERE products.wq_index = $2
+        AND (products.order_id IS NULL OR orders.user_id = $1)
+        AND ($3::timestamp IS NULL OR products.date >= $3::timestamp)
+        AND ($4::timestamp IS NULL OR products.date <= $4::timestamp)
+        AND ST_Intersects(products.footprint, ST_GeomFromWKB($5, 3857))
+        ORDER BY products.date, products.order_id IS NOT NULL, products.path
+        """
+        return await self._execute_get(
+            command, user_id, index, date_from, date_to, geometry
+        )
+
+    async def get_file(self, user_id: int, file_id: int) -> Optional[asyncpg.Record]:
+        """
+        Registered file, only of orders of the user.
+        """
+        command = """
+        SELECT files.file_id, files.path, files.date FROM drought.files
+        JOIN drought.orders ON files.order_id = orders.order_id
+        WHERE files.file_id = $1 AND orders.user_id = $2
+        """
+        result = await self._execute_get(command, file_id, user_id)
+        return result[0] if result else None
+
+    async def get_order_files(
+        self,
+        user_id: int,
+        order_id: int,
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+    ) -> List[asyncpg.Record]:
+        """
+        Registered files of the order of the user, ordered by AOI and date.
+        """
+        command = """
+        SELECT files.file_id, files.geom_id, files.wq_index, files.path, files.date
+        FROM drought.files
+        JOIN drought.orders ON files.order_id = orders.order_id
+        WHERE files.order_id = $1 AND orders.user_id = $2
+        AND ($3::timestamp IS NULL OR files.date >= $3::timestamp)
+        AND ($4::timestamp IS NULL OR files.date <= $4::timestamp)
+        ORDER BY files.geom_id, files.date, files.wq_index
+        """
+        return await self._execute_get(command, order_id, user_id, date_from, date_to)
+
+    async def has_aoi(self, user_id: int, geom_id: int) -> bool:
+        command = """
+        SELECT 1 FROM drought.aois
+        JOIN drought.orders ON aois.order_id = orders.order_id
+        WHERE aois.geom_id = $1 AND orders.user_id = $2
+        """
+        return bool(await self._execute_get(command, geom_id, user_id))
+
+    async def submit_job(self, kind: str, user_id: int, params: dict) -> int:
+        """
+        Adds the job to the queue, returns its id.
+        """
+        command = """
+        INSERT INTO drought.jobs (kind, user_id, params) VALUES ($1, $2, $3::jsonb)
+        RETURNING job_id
+        """
+        result = await self._execute_get(command, kind, user_id, json.dumps(params))
+        return result[0]["job_id"]
+
+    async def get_job(self, user_id: int, job_id: int) -> Optional[Job]:
+        """
+        Job of the user, None if there is no such job.
+        """
+        command = """
+        SELECT job_id, kind, user_id, params, status, result, error, attempts,
+        created_at, started_at, finished_at
+        FROM drought.jobs WHERE job_id = $1 AND user_id = $2
+        """
+        result = await self._execute_get(command, job_id, user_id)
+        if not result:
+            return None
+        job = dict(result[0])
+        job["params"] = json.loads(job["params"])
+        job["result"] = job["result"] and json.loads(job["result"])
+        return Job(**job)
+
+    async def get_aoi_files(
+        self,
+        user_id: int,
+        geom_id: int,
+        indexes: List[str],
+        date_from: datetime,
+        date_to: datetime,
+    ) -> List[asyncpg.Record]:
+        """
+        Registered files of the AOI of the user for the indexes in the date range.
+        """
+        command = """
+        SELECT files.file_id, files.wq_index, files.date FROM drought.files
+        JOIN drought.orders ON files.order_id = orders.order_id
+        WHERE files.geom_id = $1 AND orders.user_id = $2
+        AND files.wq_index = ANY($3::varchar[])
+        AND files.date >= $4::timestamp AND files.date <= $5::timestamp
+        ORDER BY files.date, files.wq_index
+        """
+        return await self._execute_get(
+            command, geom_id, user_id, indexes, date_from, date_to
+        )
+
+    async def get_user(self, username: str) -> Union[User, None]:
+        command = """
+        SELECT user_id, username, password, email, phone, disabled
+        FROM drought.users WHERE username = $1
+        """
+        result = await self._execute_get(command, username)
+
+        users = [User(**dict(user)) for user in result]
+        if len(users) > 1:
+            raise ValueError("Returned more than 1 user from DB")
+
+        return users[0] if users else None
@@ -1,12 +1,21 @@
+from pathlib import Path
+
 import psycopg2
+from psycopg2.extras import Json, execute_values
 from pydantic import BaseModel
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
-from src.db_client.models.aois import AOI
+from src.db_client.models.aois import AOI, aois_from_rows
+from src.db_client.models.clouds import Clouds
 from src.db_client.models.files import File
+from src.db_client.models.jobs import Job, QUEUED, RUNNING, DONE, FAILED
+from src.db_client.models.products import Product
+from src.db_client.models.stats import Stats, STATS_CHANNEL
 
-from settings import DATABASE, USER, PASSWORD, HOST, PORT
+from settings import DATABASE, USER, PASSWORD, HOST, PORT, FILES_BATCH_SIZE
 from .prepare_database_commands import create_table_commands, add_test_data
+from .migrations import create_migrations_table, migrations, hot_queries
+from .pool import ConnectionPool, get_pool
 from .models.users import User
 
 
@@ -44,6 +53,18 @@ class DBClient:
 
         return conn
 
+    def _pool(self) -> ConnectionPool:
+        """
+        Pool of connections to the database, shared by all clients.
+        """
+        return get_pool(
+            database=self.database,
+            user=self.user,
+            password=self.password,
+            host=self.host,
+            port=self.port,
+        )
+
     def _execute_for_prepare_database(self, curr, command):
         try:
             curr.execute(command)
@@ -58,29 +79,40 @@ class DBClient:
         except Exception as e:
             raise e
 
-    def _execute_get(self, command):
-        try:
-            db = self._connect()
-            curr = db.cursor()
-            curr.execute(command)
-            return curr.fetchall()
-        except Exception as e:
-            raise e
-        finally:
-            curr.close()
-            db.close()
+    def _execute_get(self, command, values=None):
+        with self._pool().connection() as db:
+            with db.cursor() as curr:
+                curr.execute(command, values)
+                return curr.fetchall()
 
     def _execute_insert(self, command, values):
-        try:
-            db = self._connect()
-            curr = db.cursor()
-            curr.execute(command, values)
-            db.commit()
-        except Exception as e:
-            raise e
-        finally:
-            curr.close()
-            db.close()
+        with self._pool().connection() as db:
+            with db.cursor() as curr:
+                curr.execute(command, values)
+
+    def _execute_values(self, command, values, template=None, before=None) -> list:
+        """
+        Inserts all values in one transaction, returns rows from RETURNING clause.
+        before is a command with its values executed first in the same transaction.
+        """
+        with self._pool().connection() as db:
+            db.autocommit = False
+            try:
+                # commits on success, rolls back on exception
+                with db:
+                    with db.cursor() as curr:
+                        if before is not None:
+                            curr.execute(*before)
+                        return execute_values(
+                            curr,
+                            command,
+                            values,
+                            template=template,
+                            page_size=FILES_BATCH_SIZE,
+                            fetch=True,
+                        )
+            finally:
+                db.autocommit = True
 
     def prepare_database(self) -> None:
         """
@@ -111,55 +143,440 @@ class DBClient:
         curr.close()
         db.close()
 
+        self.migrate()
+
+    def migrate(self) -> List[int]:
+        """
+        Applies migrations which were not applied yet, each in one transaction.
+        Returns versions of applied migrations.
+        """
+        applied = []
+        with self._pool().connection() as db:
+            with db.cursor() as curr:
+                curr.execute(create_migrations_table)
+
+            db.autocommit = False
+            try:
+                for version, description, commands in migrations:
+                    with db:
+                        with db.cursor() as curr:
+                            # other clients wait until the migration is applied
+                            curr.execute("LOCK TABLE drought.schema_migrations")
+                            curr.execute(
+                                "SELECT 1 FROM drought.schema_migrations WHERE version = %s",
+                                (version,),
+                            )
+                            if curr.fetchone():
+                                continue
+
+                            print(f"Applying migration {version}: {description}")
+                            for command in commands:
+                                curr.execute(command)
+                            curr.execute(
+                                "INSERT INTO drought.schema_migrations (version, description) VALUES (%s, %s)",
+                                (version, description),
+                            )
+                            applied.append(version)
+            finally:
+                db.autocommit = True
+
+        if not applied:
+            print("Database schema is up to date")
+        return applied
+
+    def check_query_plans(self) -> Dict[str, List[str]]:
+        """
+        Checks with EXPLAIN that hot queries use indexes. Sequential scans are
+        disabled, so on small tables indexes are used whenever they can be.
+        Returns tables scanned sequentially by each query.
+        """
+
+        def seq_scans(plan: dict) -> List[str]:
+            tables = []
+            if plan["Node Type"] == "Seq Scan":
+                tables.append(plan["Relation Name"])
+            for subplan in plan.get("Plans", []):
+                tables.extend(seq_scans(subplan))
+            return tables
+
+        scans = {}
+        with self._pool().connection() as db:
+            db.autocommit = False
+            try:
+                with db:
+                    with db.cursor() as curr:
+                        curr.execute("SET LOCAL enable_seqscan = off")
+                        for name, command in hot_queries.items():
+                            curr.execute("EXPLAIN (FORMAT JSON) " + command)
+                            scans[name] = seq_scans(curr.fetchone()[0][0]["Plan"])
+            finally:
+                db.autocommit = True
+
+        for name, tables in scans.items():
+            if tables:
+                print(f"{name}: sequential scan of {', '.join(tables)}")
+            else:
+                print(f"{name}: uses indexes")
+        return scans
+
     def get_all_aois(self) -> List[AOI]:
         command = """
-        SELECT geom_id, order_id, ST_AsText(geom), ST_SRID(geom) FROM drought.aois
+        SELECT geom_id, order_id, ST_AsBinary(geom), ST_SRID(geom) FROM drought.aois
         """
         result = self._execute_get(command)
 
-        return [
-            AOI(geom_id=aoi[0], order_id=aoi[1], geometry=aoi[2], epsg=aoi[3])
-            for aoi in result
-        ]
+        return aois_from_rows(result)
 
-    def get_all_aois_for_user(self, user_id: int) -> List[AOI]:
-        command = f"""
-        SELECT aois.geom_id, aois.order_id, ST_AsText(aois.geom), ST_SRID(aois.geom)
+    def get_aoi(self, geom_id: int) -> Optional[AOI]:
+        command = """
+        SELECT geom_id, order_id, ST_AsBinary(geom), ST_SRID(geom) FROM drought.aois
+        WHERE geom_id = %s
+        """
+        result = self._execute_get(command, (geom_id,))
+
+        aois = aois_from_rows(result)
+        return aois[0] if aois else None
+
+    def get_all_aois_for_user(
+        self, user_id: int, simplify_tolerance: Optional[float] = None
+    ) -> List[AOI]:
+        """
+        AOIs of the user, geometries can be simplified with the tolerance
+        in units of their SRID, e.g. for display only.
+        """
+        command = """
+        SELECT aois.geom_id, aois.order_id, ST_AsBinary(
+            CASE WHEN %(tolerance)s::float8 IS NULL THEN aois.geom
+            ELSE ST_SimplifyPreserveTopology(aois.geom, %(tolerance)s::float8) END
+        ), ST_SRID(aois.geom)
         FROM drought.aois
         LEFT JOIN drought.orders ON aois.order_id = orders.order_id
-        WHERE orders.user_id = {user_id}
+        WHERE orders.user_id = %(user_id)s
         """
-        result = self._execute_get(command)
+        result = self._execute_get(
+            command, {"user_id": user_id, "tolerance": simplify_tolerance}
+        )
 
-        return [
-            AOI(geom_id=aoi[0], order_id=aoi[1], geometry=aoi[2], epsg=aoi[3])
-            for aoi in result
-        ]
+        return aois_from_rows(result)
 
     def insert_file(self, file: File) -> None:
-        # make path relative to waterpix-backend
-        file.make_path_relative()
-
-        command = """INSERT INTO drought.files (order_id, geom_id, path, wq_index, file_extension, date)
-        VALUES (%s, %s, %s, %s, %s, %s);
-        """
-        values = (
-            file.order_id,
-            file.geom_id,
-            str(file.path),
-            file.wq_index,
-            file.file_extension,
-            file.date.strftime("%Y-%m-%d 00:00:00"),
+        self.insert_files([file])
+
+    def insert_files(self, files: List[File]) -> int:
+        """
+        Inserts files in one transaction, skipping files already in DB
+        for the same order, AOI, index and date, so reruns do not duplicate them.
+        Returns number of inserted files.
+        """
+        if not files:
+            return 0
+
+        values = []
+        for file in files:
+            # make path relative to waterpix-backend
+            file.make_path_relative()
+            values.append(
+                (
+                    file.order_id,
+                    file.geom_id,
+                    str(file.path),
+                    file.wq_index,
+                    file.file_extension,
+                    file.date.strftime("%Y-%m-%d 00:00:00"),
+                    file.checksum,
+                )
+            )
+
+        # files are partitioned by month, partitions of new months are created first
+        self._execute_get(
+            "SELECT drought.create_files_partition(day) FROM unnest(%s::timestamp[]) AS day",
+            (sorted({value[5] for value in values}),),
         )
 
-        self._execute_insert(command, values)
+        # files of reruns are written again, so their checksums are updated
+        command = """
+        INSERT INTO drought.files (order_id, geom_id, path, wq_index, file_extension, date, checksum)
+        VALUES %s
+        ON CONFLICT (order_id, geom_id, wq_index, date)
+        DO UPDATE SET checksum = EXCLUDED.checksum
+        RETURNING xmax = 0
+        """
+        inserted = sum(row[0] for row in self._execute_values(command, values))
         print(
-            f"    Inserted produced TIF for {file.wq_index} AOI {file.order_id} to DB"
+            f"    Inserted {inserted} produced files to DB, "
+            f"{len(files) - inserted} were already registered"
+        )
+        return inserted
+
+    def insert_products(self, products: List[Product]) -> None:
+        """
+        Inserts final rasters in one transaction, products saved again
+        to the same path are replaced.
+        """
+        if not products:
+            return
+
+        values = []
+        for product in products:
+            path = product.path
+            if path.is_absolute():
+                path = path.relative_to(Path.cwd())
+            values.append(
+                (
+                    product.order_id,
+                    product.wq_index,
+                    product.date.strftime("%Y-%m-%d 00:00:00"),
+                    str(path),
+                    product.footprint.wkb,
+                )
+            )
+
+        command = """
+        INSERT INTO drought.products (order_id, wq_index, date, path, footprint)
+        VALUES %s
+        ON CONFLICT (path) DO UPDATE SET
+        order_id = EXCLUDED.order_id, wq_index = EXCLUDED.wq_index,
+        date = EXCLUDED.date, footprint = EXCLUDED.footprint
+        RETURNING product_id
+        """
+        self._execute_values(
+            command,
+            values,
+            template="(%s, %s, %s::timestamp, %s, ST_GeomFromWKB(%s, 3857))",
+        )
+        print(f"    Inserted {len(products)} final products to DB")
+
+    def insert_clouds(self, clouds: List[Clouds]) -> None:
+        """
+        Inserts polygons of clouds detected in products, in one transaction,
+        clouds of products detected again are replaced.
+        """
+        if not clouds:
+            return
+
+        values = [
+            (cloud.product, cloud.date.strftime("%Y-%m-%d 00:00:00"), polygon.wkb)
+            for cloud in clouds
+            for polygon in cloud.polygons
+        ]
+        self._execute_values(
+            """
+            INSERT INTO drought.clouds (product, date, geom)
+            VALUES %s
+            RETURNING cloud_id
+            """,
+            values,
+            template="(%s, %s::timestamp, ST_GeomFromWKB(%s, 3857))",
+            before=(
+                "DELETE FROM drought.clouds WHERE product = ANY(%s)",
+                ([cloud.product for cloud in clouds],),
+            ),
         )
+        print(f"    Inserted {len(values)} clouds of {len(clouds)} products to DB")
+
+    def insert_stats(self, stats: List[Stats]) -> None:
+        """
+        Inserts statistics in one transaction, statistics of the same AOI,
+        index and date are replaced, e.g. after the date was processed again.
+        """
+        if not stats:
+            return
+
+        columns = list(Stats.__fields__)
+        values = []
+        for stat in stats:
+            row = stat.dict()
+            row["date"] = stat.date.strftime("%Y-%m-%d 00:00:00")
+            row["histogram"] = Json(stat.histogram) if stat.histogram else None
+            values.append(tuple(row[column] for column in columns))
+
+        updated = [
+            column
+            for column in columns
+            if column not in ["geom_id", "wq_index", "date"]
+        ]
+        command = f"""
+        INSERT INTO drought.stats ({", ".join(columns)})
+        VALUES %s
+        ON CONFLICT (geom_id, wq_index, date) DO UPDATE SET
+        {", ".join(f"{column} = EXCLUDED.{column}" for column in updated)},
+        updated_at = now() AT TIME ZONE 'utc'
+        RETURNING stat_id
+        """
+        self._execute_values(command, values)
+        print(f"    Inserted statistics of {len(stats)} AOIs and indexes to DB")
+
+        # the API drops cached time series of these AOIs, all if there are too many
+        geom_ids = ",".join(
+            str(geom_id) for geom_id in sorted({s.geom_id for s in stats})
+        )
+        self._execute_insert(
+            "SELECT pg_notify(%s, %s)",
+            (STATS_CHANNEL, geom_ids if len(geom_ids) < 7000 else ""),
+        )
+
+    def submit_jobs(
+        self, jobs: List[Tuple[str, dict, List[int]]], max_attempts: int = 1
+    ) -> List[int]:
+        """
+        Queues jobs given as (kind, params, positions in the list of jobs it depends on)
+        in one transaction, so workers never see a part of them. Returns their ids.
+        """
+        if not jobs:
+            return []
+        # ids are taken first, so dependencies can refer to them
+        command = """
+        SELECT nextval(pg_get_serial_sequence('drought.jobs', 'job_id'))
+        FROM generate_series(1, %s)
+        """
+        job_ids = [row[0] for row in self._execute_get(command, (len(jobs),))]
+        command = """
+        INSERT INTO drought.jobs (job_id, kind, params, depends_on, max_attempts)
+        VALUES %s
+        """
+        values = [
+            (
+                job_id,
+                kind,
+                Json(params),
+                [job_ids[position] for position in depends_on],
+                max_attempts,
+            )
+            for job_id, (kind, params, depends_on) in zip(job_ids, jobs)
+        ]
+        self._execute_values(command, values, template="(%s, %s, %s, %s::bigint[], %s)")
+        return job_ids
+
+    def claim_job(self, kinds: List[str]) -> Optional[Job]:
+        """
+        Marks the oldest queued job of the kinds as running and returns it.
+        Jobs locked by other workers are skipped, so every job is claimed once.
+        Jobs waiting for a retry or for jobs they depend on are not claimed.
+        """
+        command = """
+        UPDATE drought.jobs SET status = %s, attempts = attempts + 1,
+        started_at = now() AT TIME ZONE 'utc', heartbeat_at = now() AT TIME ZONE 'utc'
+        WHERE job_id = (
+            SELECT queued.job_id FROM drought.jobs AS queued
+            WHERE queued.status = %s AND queued.kind = ANY(%s)
+            AND queued.run_after <= now() AT TIME ZONE 'utc'
+            AND NOT EXISTS (
+                SELECT 1 FROM drought.jobs AS dependency
+                WHERE dependency.job_id = ANY(queued.depends_on)
+                AND dependency.status <> %s
+            )
+            ORDER BY queued.job_id
+            FOR UPDATE SKIP LOCKED
+            LIMIT 1
+        )
+        RETURNING job_id, kind, user_id, params, status, attempts, max_attempts,
+        depends_on, created_at, started_at, heartbeat_at
+        """
+        result = self._execute_get(command, (RUNNING, QUEUED, kinds, DONE))
+        if not result:
+            return None
+        columns = [
+            "job_id",
+            "kind",
+            "user_id",
+            "params",
+            "status",
+            "attempts",
+            "max_attempts",
+            "depends_on",
+            "created_at",
+            "started_at",
+            "heartbeat_at",
+        ]
+        return Job(**dict(zip(columns, result[0])))
+
+    def heartbeat(self, job: Job) -> bool:
+        """
+        Tells other workers that the job is still running,
+        returns False if the job was taken from this worker as stale.
+        """
+        command = """
+        UPDATE drought.jobs SET heartbeat_at = now() AT TIME ZONE 'utc'
+        WHERE job_id = %s AND status = %s AND attempts = %s
+        RETURNING job_id
+        """
+        return bool(self._execute_get(command, (job.job_id, RUNNING, job.attempts)))
+
+    def finish_job(self, job: Job, result: dict) -> None:
+        # a job requeued as stale and claimed again belongs to its new worker
+        command = """
+        UPDATE drought.jobs SET status = %s, result = %s,
+        finished_at = now() AT TIME ZONE 'utc'
+        WHERE job_id = %s AND status = %s AND attempts = %s
+        """
+        self._execute_insert(
+            command, (DONE, Json(result), job.job_id, RUNNING, job.attempts)
+        )
+
+    def fail_job(self, job: Job, error: str, retry_seconds: float = 0) -> None:
+        """
+        Queues the job again after retry_seconds, doubled with every attempt,
+        until it runs out of attempts. Then it fails with all jobs depending on it.
+        """
+        command = """
+        UPDATE drought.jobs SET error = %s,
+        status = CASE WHEN attempts < max_attempts THEN %s ELSE %s END,
+        run_after = now() AT TIME ZONE 'utc'
+            + make_interval(secs => %s * 2 ^ (attempts - 1)),
+        finished_at = CASE WHEN attempts < max_attempts
+            THEN NULL ELSE now() AT TIME ZONE 'utc' END
+        WHERE job_id = %s AND status = %s AND attempts = %s
+        RETURNING status
+        """
+        result = self._execute_get(
+            command,
+            (error, QUEUED, FAILED, retry_seconds, job.job_id, RUNNING, job.attempts),
+        )
+        if result and result[0][0] == FAILED:
+            self._fail_dependents([job.job_id])
+
+    def requeue_stale_jobs(self, stale_seconds: float) -> List[int]:
+        """
+        Queues again running jobs without a heartbeat for stale_seconds,
+        their workers were stopped. Returns ids of the jobs.
+        """
+        command = """
+        UPDATE drought.jobs SET error = 'worker stopped sending heartbeats',
+        status = CASE WHEN attempts < max_attempts THEN %s ELSE %s END,
+        finished_at = CASE WHEN attempts < max_attempts
+            THEN NULL ELSE now() AT TIME ZONE 'utc' END
+        WHERE status = %s
+        AND heartbeat_at < now() AT TIME ZONE 'utc' - make_interval(secs => %s)
+        RETURNING job_id, status
+        """
+        result = self._execute_get(command, (QUEUED, FAILED, RUNNING, stale_seconds))
+        failed = [job_id for job_id, status in result if status == FAILED]
+        if failed:
+            self._fail_dependents(failed)
+        return [job_id for job_id, _ in result]
+
+    def _fail_dependents(self, job_ids: List[int]) -> None:
+        command = """
+        WITH RECURSIVE dependents AS (
+            SELECT job_id FROM drought.jobs
+            WHERE status = %s AND depends_on && %s::bigint[]
+            UNION
+            SELECT jobs.job_id FROM drought.jobs
+            JOIN dependents ON dependents.job_id = ANY(jobs.depends_on)
+            WHERE jobs.status = %s
+        )
+        UPDATE drought.jobs SET status = %s, error = 'a job it depends on failed',
+        finished_at = now() AT TIME ZONE 'utc'
+        WHERE job_id IN (SELECT job_id FROM dependents)
+        """
+        self._execute_insert(command, (QUEUED, job_ids, QUEUED, FAILED))
 
     def get_user(self, username: str) -> User:
-        command = f"SELECT * FROM drought.users WHERE username='{username}'"
-        result = self._execute_get(command)
+        command = """
+        SELECT user_id, username, password, email, phone, disabled
+        FROM drought.users WHERE username = %s
+        """
+        result = self._execute_get(command, (username,))
 
         users = [
             User(
@@ -176,3 +593,34 @@ class DBClient:
             raise ValueError("Returned more than 1 user from DB")
 
         return users[0]
+
+
+class FilesBuffer:
+    """
+    Collects files to register and inserts them in batches of FILES_BATCH_SIZE,
+    remaining files are inserted when the buffer is flushed or its block ends.
+    """
+
+    def __init__(self, db: DBClient = None, batch_size: int = FILES_BATCH_SIZE):
+        self.db = db or DBClient()
+        self.batch_size = batch_size
+        self.files: List[File] = []
+        self.inserted = 0
+
+    def add(self, file: File) -> None:
+        self.files.append(file)
+        if len(self.files) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> int:
+        files, self.files = self.files, []
+        self.inserted += self.db.insert_files(files)
+        return self.inserted
+
+    def __enter__(self) -> "FilesBuffer":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # files of a failed run are not registered
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,353 @@
+from typing import Final
+
+# schema created by create_table_commands is version 0,
+# every migration is applied once, in one transaction, in order of versions
+create_migrations_table: Final = """
+    CREATE TABLE IF NOT EXISTS drought.schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT now()
+        );
+    """
+
+migrations: Final = [
+    (
+        1,
+        "spatial and lookup indexes of AOIs and orders",
+        [
+            """
+            CREATE INDEX IF NOT EXISTS aois_geom_idx ON drought.aois USING GIST (geom);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS aois_order_id_idx ON drought.aois (order_id);
+            """,
+            """
+            CREATE INDEX IF NOT EXISTS orders_user_id_idx ON drought.orders (user_id);
+            """,
+        ],
+    ),
+    (
+        2,
+        "files partitioned by month, unique for order, AOI, index and date",
+        [
+            # names of the sequence and indexes are taken by the new table
+            """
+            ALTER TABLE drought.files RENAME TO files_unpartitioned;
+            """,
+            """
+            ALTER SEQUENCE IF EXISTS drought.files_file_id_seq
+            RENAME TO files_unpartitioned_file_id_seq;
+            """,
+            """
+            ALTER INDEX IF EXISTS drought.files_pkey RENAME TO files_unpartitioned_pkey;
+            """,
+            """
+            ALTER INDEX IF EXISTS drought.files_file_id_key
+            RENAME TO files_unpartitioned_file_id_key;
+            """,
+            """
+            CREATE TABLE drought.files (
+                    file_id BIGSERIAL NOT NULL,
+                    order_id BIGINT NOT NULL,
+                    FOREIGN KEY (order_id)
+                        REFERENCES drought.orders
+                        ON UPDATE CASCADE,
+                    geom_id BIGINT NOT NULL,
+                    FOREIGN KEY (geom_id)
+                        REFERENCES drought.aois
+                        ON UPDATE CASCADE,
+                    path VARCHAR(255) NOT NULL,
+                    wq_index VARCHAR(20) NOT NULL,
+                    file_extension VARCHAR(20) NOT NULL,
+                    date TIMESTAMP NOT NULL,
+                    PRIMARY KEY (file_id, date),
+                    CONSTRAINT files_registration_key
+                        UNIQUE (order_id, geom_id, wq_index, date)
+                ) PARTITION BY RANGE (date);
+            """,
+            # partitions are created before files of a new month are registered
+            """
+            CREATE OR REPLACE FUNCTION drought.create_files_partition(day TIMESTAMP)
+            RETURNS VOID AS $$
+            DECLARE
+                month_start TIMESTAMP := date_trunc('month', day);
+            BEGIN
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS drought.%I PARTITION OF drought.files '
+                    'FOR VALUES FROM (%L) TO (%L)',
+                    'files_' || to_char(month_start, 'YYYYMM'),
+                    month_start,
+                    month_start + INTERVAL '1 month'
+                );
+            END;
+            $$ LANGUAGE plpgsql;
+            """,
+            """
+            SELECT drought.create_files_partition(month)
+            FROM (
+                SELECT DISTINCT date_trunc('month', date) AS month
+                FROM drought.files_unpartitioned
+            ) AS months;
+            """,
+            # files registered more than once keep the first registration
+            """
+            INSERT INTO drought.files (file_id, order_id, geom_id, path, wq_index, file_extension, date)
+            SELECT DISTINCT ON (order_id, geom_id, wq_index, date)
+                file_id, order_id, geom_id, path, wq_index, file_extension, date
+            FROM drought.files_unpartitioned
+            ORDER BY order_id, geom_id, wq_index, date, file_id;
+            """,
+            """
+            SELECT setval(
+                pg_get_serial_sequence('drought.files', 'file_id'),
+                COALESCE((SELECT max(file_id) FROM drought.files), 0) + 1,
+                false
+            );
+            """,
+            """
+            DROP TABLE drought.files_unpartitioned;
+            """,
+        ],
+    ),
+    (
+        3,
+        "statistics of indexes inside AOIs",
+        [
+            """
+            CREATE TABLE drought.stats (
+                    stat_id BIGSERIAL PRIMARY KEY,
+                    order_id BIGINT NOT NULL,
+                    FOREIGN KEY (order_id)
+                        REFERENCES drought.orders
+                        ON UPDATE CASCADE,
+                    geom_id BIGINT NOT NULL,
+                    FOREIGN KEY (geom_id)
+                        REFERENCES drought.aois
+                        ON UPDATE CASCADE,
+                    wq_index VARCHAR(20) NOT NULL,
+                    date TIMESTAMP NOT NULL,
+                    total_pixels BIGINT NOT NULL,
+                    valid_pixels BIGINT NOT NULL,
+                    valid_fraction DOUBLE PRECISION NOT NULL,
+                    cloud_fraction DOUBLE PRECISION,
+                    mean DOUBLE PRECISION,
+                    median DOUBLE PRECISION,
+                    std DOUBLE PRECISION,
+                    min DOUBLE PRECISION,
+                    max DOUBLE PRECISION,
+                    p10 DOUBLE PRECISION,
+                    p25 DOUBLE PRECISION,
+                    p75 DOUBLE PRECISION,
+                    p90 DOUBLE PRECISION,
+                    histogram JSONB,
+                    CONSTRAINT stats_series_key UNIQUE (geom_id, wq_index, date)
+                );
+            """,
+        ],
+    ),
+    (
+        4,
+        "time of the last change of statistics",
+        [
+            """
+            ALTER TABLE drought.stats
+            ADD COLUMN updated_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc');
+            """,
+        ],
+    ),
+    (
+        5,
+        "final rasters with footprints, for statistics of any polygon",
+        [
+            """
+            CREATE TABLE drought.products (
+                    product_id BIGSERIAL PRIMARY KEY,
+                    wq_index VARCHAR(20) NOT NULL,
+                    date TIMESTAMP NOT NULL,
+                    path VARCHAR(255) NOT NULL UNIQUE,
+                    footprint geometry(Polygon, 3857) NOT NULL
+                );
+            """,
+            """
+            CREATE INDEX products_footprint_idx ON drought.products USING GIST (footprint);
+            """,
+            """
+            CREATE INDEX products_index_date_idx ON drought.products (wq_index, date);
+            """,
+        ],
+    ),
+    (
+        6,
+        "products clipped to AOIs are visible only to owners of their orders",
+        [
+            """
+            ALTER TABLE drought.products
+            ADD COLUMN order_id BIGINT REFERENCES drought.orders ON UPDATE CASCADE;
+            """,
+        ],
+    ),
+    (
+        7,
+        "notify the API about disabled, deleted or changed users",
+        [
+            # the channel is USERS_CHANNEL from src.db_client.models.users
+            """
+            CREATE OR REPLACE FUNCTION drought.notify_users_change()
+            RETURNS TRIGGER AS $$
+            BEGIN
+                PERFORM pg_notify('drought_users', OLD.username);
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            """,
+            """
+            CREATE TRIGGER users_change AFTER UPDATE OR DELETE ON drought.users
+            FOR EACH ROW EXECUTE FUNCTION drought.notify_users_change();
+            """,
+        ],
+    ),
+    (
+        8,
+        "polygons of clouds detected in products, for vector tiles",
+        [
+            """
+            CREATE TABLE drought.clouds (
+                    cloud_id BIGSERIAL PRIMARY KEY,
+                    product VARCHAR(255) NOT NULL,
+                    date TIMESTAMP NOT NULL,
+                    geom geometry(Polygon, 3857) NOT NULL
+                );
+            """,
+            """
+            CREATE INDEX clouds_geom_idx ON drought.clouds USING GIST (geom);
+            """,
+            """
+            CREATE INDEX clouds_date_idx ON drought.clouds (date);
+            """,
+            """
+            CREATE INDEX clouds_product_idx ON drought.clouds (product);
+            """,
+        ],
+    ),
+    (
+        9,
+        "queue of background jobs",
+        [
+            """
+            CREATE TABLE drought.jobs (
+                    job_id BIGSERIAL PRIMARY KEY,
+                    kind VARCHAR(50) NOT NULL,
+                    user_id BIGINT REFERENCES drought.users ON UPDATE CASCADE,
+                    params JSONB NOT NULL,
+                    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                    result JSONB,
+                    error TEXT,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+                    started_at TIMESTAMP,
+                    finished_at TIMESTAMP
+                );
+            """,
+            # workers look only for queued jobs, which are a small part of the table
+            """
+            CREATE INDEX jobs_queued_idx ON drought.jobs (kind, job_id)
+            WHERE status = 'queued';
+            """,
+            """
+            CREATE INDEX jobs_user_id_idx ON drought.jobs (user_id);
+            """,
+        ],
+    ),
+    (
+        10,
+        "dependencies, retries and heartbeats of jobs, for distributed tasks",
+        [
+            """
+            ALTER TABLE drought.jobs
+            ADD COLUMN depends_on BIGINT[] NOT NULL DEFAULT '{}',
+            ADD COLUMN max_attempts INTEGER NOT NULL DEFAULT 1,
+            ADD COLUMN run_after TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'utc'),
+            ADD COLUMN heartbeat_at TIMESTAMP;
+            """,
+            # workers look for running jobs whose worker stopped sending heartbeats
+            """
+            CREATE INDEX jobs_heartbeat_idx ON drought.jobs (heartbeat_at)
+            WHERE status = 'running';
+            """,
+        ],
+    ),
+    (
+        11,
+        "checksums of produced files, computed when they are written",
+        [
+            """
+            ALTER TABLE drought.files ADD COLUMN checksum CHAR(64);
+            """,
+        ],
+    ),
+]
+
+# queries run for every pipeline run or API request, which must not scan whole tables
+hot_queries: Final = {
+    "AOIs of a user": """
+    SELECT aois.geom_id, aois.order_id, aois.geom
+    FROM drought.aois
+    LEFT JOIN drought.orders ON aois.order_id = orders.order_id
+    WHERE orders.user_id = 1
+    """,
+    "page of AOIs of a user": """
+    SELECT aois.geom_id, aois.order_id, aois.geom
+    FROM drought.aois
+    JOIN drought.orders ON aois.order_id = orders.order_id
+    WHERE orders.user_id = 1 AND aois.geom_id > 0
+    ORDER BY aois.geom_id
+    LIMIT 1000
+    """,
+    "AOIs overlapping an AOI": """
+    SELECT geom_id FROM drought.aois
+    WHERE geom && (SELECT geom FROM drought.aois WHERE geom_id = 1)
+    """,
+    "files of an AOI and index": """
+    SELECT path, date FROM drought.files
+    WHERE order_id = 1 AND geom_id = 1 AND wq_index = 'ndvi'
+    AND date >= '2023-01-01' AND date < '2023-02-01'
+    """,
+    "file by id": """
+    SELECT path, date FROM drought.files WHERE file_id = 1
+    """,
+    "files of an order": """
+    SELECT path, date FROM drought.files
+    WHERE order_id = 1 AND date >= '2023-01-01' AND date <= '2023-02-01'
+    """,
+    "products intersecting a polygon": """
+    SELECT path, date FROM drought.products
+    WHERE wq_index = 'nmdi' AND date >= '2023-01-01' AND date < '2024-01-01'
+    AND ST_Intersects(footprint, ST_MakeEnvelope(2200000, 6450000, 2201000, 6451000, 3857))
+    """,
+    "clouds of a date in a tile": """
+    SELECT cloud_id FROM drought.clouds
+    WHERE date = '2023-01-01' AND geom && ST_TileEnvelope(12, 2288, 1395)
+    """,
+    "AOIs of a user in a tile": """
+    SELECT aois.geom_id FROM drought.aois
+    JOIN drought.orders ON aois.order_id = orders.order_id
+    WHERE orders.user_id = 1 AND aois.geom && ST_TileEnvelope(12, 2288, 1395)
+    """,
+    "next queued job": """
+    SELECT job_id FROM drought.jobs
+    WHERE status = 'queued' AND kind = ANY(ARRAY['aoi_history'])
+    AND run_after <= now() AT TIME ZONE 'utc'
+    ORDER BY job_id
+    LIMIT 1
+    """,
+    "stale running jobs": """
+    SELECT job_id FROM drought.jobs
+    WHERE status = 'running' AND heartbeat_at < now() AT TIME ZONE 'utc' - interval '5 minutes'
+    """,
+    "time series of an AOI and index": """
+    SELECT date, mean, median, p10, p90 FROM drought.stats
+    WHERE geom_id = 1 AND wq_index = 'nmdi'
+    AND date >= '2023-01-01' AND date < '2024-01-01'
+    ORDER BY date
+    """,
+}
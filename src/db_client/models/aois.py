@@ -1,8 +1,9 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional, Sequence, Union
 
 from shapely.geometry import Polygon
-from shapely import wkt
+from shapely.geometry.base import BaseGeometry
+from shapely import wkb, wkt
 import geopandas as gpd
 
 
@@ -15,7 +16,30 @@ class AOI(BaseModel):
     class Config:
         arbitrary_types_allowed = True
 
-    def __init__(self, geom_id: int, order_id: int, geometry: str, epsg: int):
+    def __init__(
+        self,
+        geom_id: int,
+        order_id: int,
+        geometry: Union[str, bytes, BaseGeometry],
+        epsg: int,
+    ):
+        # geometry as WKT, WKB or already decoded
+        if isinstance(geometry, str):
+            geometry = wkt.loads(geometry)
+        elif isinstance(geometry, (bytes, memoryview)):
+            geometry = wkb.loads(bytes(geometry))
         super().__init__(
-            geom_id=geom_id, order_id=order_id, geometry=wkt.loads(geometry), epsg=epsg
+            geom_id=geom_id, order_id=order_id, geometry=geometry, epsg=epsg
         )
+
+
+def aois_from_rows(rows: Sequence[Sequence]) -> List[AOI]:
+    """
+    AOIs from rows of geom_id, order_id, WKB geometry and SRID,
+    all geometries are decoded at once.
+    """
+    geometries = gpd.GeoSeries.from_wkb([bytes(row[2]) for row in rows])
+    return [
+        AOI(geom_id=row[0], order_id=row[1], geometry=geometry, epsg=row[3])
+        for row, geometry in zip(rows, geometries)
+    ]
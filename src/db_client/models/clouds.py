@@ -0,0 +1,18 @@
+from pydantic import BaseModel
+from typing import List
+
+import datetime as dt
+from shapely.geometry import Polygon
+
+
+class Clouds(BaseModel):
+    """
+    Polygons of clouds detected in a product, in EPSG:3857.
+    """
+
+    product: str
+    date: dt.datetime
+    polygons: List[Polygon]
+
+    class Config:
+        arbitrary_types_allowed = True
@@ -13,6 +13,8 @@ class File(BaseModel):
     wq_index: str
     file_extension: str
     date: dt.datetime
+    # SHA-256 of the file
+    checksum: Optional[str] = None
 
     def make_path_relative(self):
         if not Path.cwd().name == "malopolska-drought":
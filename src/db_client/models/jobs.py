@@ -0,0 +1,32 @@
+from pydantic import BaseModel
+from typing import Final, List, Optional
+
+import datetime as dt
+
+# statuses of jobs in drought.jobs
+QUEUED: Final = "queued"
+RUNNING: Final = "running"
+DONE: Final = "done"
+FAILED: Final = "failed"
+
+
+class Job(BaseModel):
+    """
+    Job of the queue, params and result depend on its kind.
+    """
+
+    job_id: int
+    kind: str
+    user_id: Optional[int] = None
+    params: dict
+    status: str = QUEUED
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    attempts: int = 0
+    max_attempts: int = 1
+    # jobs which have to be done before this one is claimed
+    depends_on: List[int] = []
+    created_at: Optional[dt.datetime] = None
+    started_at: Optional[dt.datetime] = None
+    finished_at: Optional[dt.datetime] = None
+    heartbeat_at: Optional[dt.datetime] = None
@@ -0,0 +1,23 @@
+from pydantic import BaseModel
+from pathlib import Path
+from typing import Optional
+
+import datetime as dt
+from shapely.geometry import Polygon
+
+
+class Product(BaseModel):
+    """
+    Final raster of an index on a date, regional or clipped to an AOI
+    of the order, with its footprint in EPSG:3857.
+    """
+
+    product_id: int = None
+    order_id: Optional[int] = None
+    wq_index: str
+    date: dt.datetime
+    path: Path
+    footprint: Polygon
+
+    class Config:
+        arbitrary_types_allowed = True
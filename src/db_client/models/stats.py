@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Final, Optional
+
+import datetime as dt
+
+# notified with comma separated geom_ids of AOIs whose statistics changed
+STATS_CHANNEL: Final = "drought_stats"
+
+
+class Stats(BaseModel):
+    """
+    Statistics of an index inside an AOI on a date, computed while masking.
+    """
+
+    order_id: int
+    geom_id: int
+    wq_index: str
+    date: dt.datetime
+    total_pixels: int
+    valid_pixels: int
+    valid_fraction: float
+    cloud_fraction: Optional[float] = None
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    std: Optional[float] = None
+    min: Optional[float] = None
+    max: Optional[float] = None
+    p10: Optional[float] = None
+    p25: Optional[float] = None
+    p75: Optional[float] = None
+    p90: Optional[float] = None
+    # {"edges": [...], "counts": [...]}
+    histogram: Optional[dict] = None
@@ -1,5 +1,10 @@
+from typing import Final
+
 from pydantic import BaseModel
 
+# usernames of changed or deleted users are notified on this channel
+USERS_CHANNEL: Final = "drought_users"
+
 
 class UserNoPassword(BaseModel):
     user_id: int
@@ -0,0 +1,117 @@
+"""
+Connection pools shared by all DBClient instances of the process,
+so the pipeline and the API do not open a new connection for every query.
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+import psycopg2
+from psycopg2.pool import ThreadedConnectionPool
+
+from settings import DB_POOL_MIN, DB_POOL_MAX, DB_POOL_CHECK_SECONDS
+
+# errors after which the connection can not be used anymore
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+_pools: Dict[tuple, "ConnectionPool"] = {}
+_pools_lock = threading.Lock()
+
+
+class ConnectionPool:
+    """
+    Thread-safe pool of autocommit connections. When all connections are used,
+    callers wait for a free one instead of failing. Connections idle for longer
+    than check_seconds are checked before they are handed out.
+    """
+
+    def __init__(
+        self,
+        minconn: int = DB_POOL_MIN,
+        maxconn: int = DB_POOL_MAX,
+        check_seconds: float = DB_POOL_CHECK_SECONDS,
+        **params,
+    ):
+        self.check_seconds = check_seconds
+        self._pool = ThreadedConnectionPool(minconn, maxconn, **params)
+        self._available = threading.BoundedSemaphore(maxconn)
+        self._last_used: Dict[int, float] = {}
+
+    def _release(self, conn, close: bool = False) -> None:
+        # connections above minconn are closed by the pool
+        self._pool.putconn(conn, close=close or bool(conn.closed))
+        if conn.closed:
+            self._last_used.pop(id(conn), None)
+        else:
+            self._last_used[id(conn)] = time.monotonic()
+
+    def _is_healthy(self, conn) -> bool:
+        if conn.closed:
+            return False
+        idle = time.monotonic() - self._last_used.get(id(conn), 0.0)
+        if idle < self.check_seconds:
+            return True
+        try:
+            with conn.cursor() as curr:
+                curr.execute("SELECT 1")
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def _healthy_connection(self):
+        # every broken connection is replaced by a new one,
+        # so at most all pooled connections are checked
+        for _ in range(self._pool.maxconn + 1):
+            conn = self._pool.getconn()
+            try:
+                # before the health check, so it does not open a transaction
+                if not conn.closed:
+                    conn.autocommit = True
+                healthy = self._is_healthy(conn)
+            except (*CONNECTION_ERRORS, psycopg2.ProgrammingError):
+                healthy = False
+            except BaseException:
+                # the connection is returned to the pool on any error
+                self._release(conn, close=True)
+                raise
+            if healthy:
+                return conn
+            print("Replacing broken database connection")
+            self._release(conn, close=True)
+        raise psycopg2.OperationalError("No healthy database connection")
+
+    @contextmanager
+    def connection(self):
+        with self._available:
+            conn = self._healthy_connection()
+            broken = False
+            try:
+                yield conn
+            except CONNECTION_ERRORS:
+                broken = True
+                raise
+            finally:
+                self._release(conn, close=broken)
+
+    def close(self) -> None:
+        self._pool.closeall()
+        self._last_used.clear()
+
+
+def get_pool(**params) -> ConnectionPool:
+    """
+    Returns the pool of connections with given parameters, created on first use.
+    """
+    key = tuple(sorted(params.items()))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = ConnectionPool(**params)
+        return _pools[key]
+
+
+def close_pools() -> None:
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close()
+        _pools.clear()
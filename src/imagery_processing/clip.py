@@ -0,0 +1,84 @@
+"""
+Clipping of bands of a product to the window of a region, so indexes
+of a small region are calculated without reading whole bands.
+"""
+import math
+from pathlib import Path
+from typing import Dict, Final
+
+import rasterio
+from rasterio.warp import transform_bounds
+from rasterio.windows import Window, from_bounds
+from shapely.geometry.base import BaseGeometry
+
+from src.imagery_processing.metrics import instrumented
+
+# windows are aligned to pixels of the coarsest bands,
+# so bands of all resolutions cover the same area
+GRID_METERS: Final = 60
+
+
+def clip_windows(bands: Dict[str, Path], region: BaseGeometry) -> Dict[str, Window]:
+    """
+    Windows of bands covering the region given in EPSG:4326,
+    empty if the region is outside of the product.
+    """
+    layers = {name: path for name, path in bands.items() if path is not None}
+    with rasterio.open(next(iter(layers.values()))) as src:
+        left, bottom, right, top = transform_bounds(
+            "EPSG:4326", src.crs, *region.bounds, densify_pts=21
+        )
+        # all bands of a product have the same extent
+        origin_x, origin_y = src.bounds.left, src.bounds.top
+        left = max(left, src.bounds.left)
+        right = min(right, src.bounds.right)
+        bottom = max(bottom, src.bounds.bottom)
+        top = min(top, src.bounds.top)
+    if left >= right or bottom >= top:
+        return {}
+
+    left = origin_x + math.floor((left - origin_x) / GRID_METERS) * GRID_METERS
+    right = origin_x + math.ceil((right - origin_x) / GRID_METERS) * GRID_METERS
+    top = origin_y - math.floor((origin_y - top) / GRID_METERS) * GRID_METERS
+    bottom = origin_y - math.ceil((origin_y - bottom) / GRID_METERS) * GRID_METERS
+
+    windows = {}
+    for name, path in layers.items():
+        with rasterio.open(path) as src:
+            windows[name] = (
+                from_bounds(left, bottom, right, top, transform=src.transform)
+                .round_offsets()
+                .round_lengths()
+            )
+    return windows
+
+
+@instrumented("clip_bands")
+def clip_bands(
+    product: str,
+    bands: Dict[str, Path],
+    windows: Dict[str, Window],
+    output_folder: Path,
+) -> Dict[str, Path]:
+    """
+    Saves windows of bands, bands without a window are not available.
+    """
+    print("    Clipping bands of", product)
+    clipped = {name: None for name in bands}
+    for name, window in windows.items():
+        with rasterio.open(bands[name]) as src:
+            data = src.read(window=window)
+            profile = src.profile.copy()
+            profile.update(
+                driver="GTiff",
+                width=window.width,
+                height=window.height,
+                transform=src.window_transform(window),
+            )
+        # JPEG 2000 options are not valid for GeoTIFF
+        for option in ["tiled", "blockxsize", "blockysize", "compress"]:
+            profile.pop(option, None)
+        clipped[name] = output_folder.joinpath(f"{Path(bands[name]).stem}.tif")
+        with rasterio.open(clipped[name], "w", **profile) as dst:
+            dst.write(data)
+    return clipped
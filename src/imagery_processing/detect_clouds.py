@@ -9,7 +9,10 @@ import pandas as pd
 import geopandas as gpd
 from shapely.geometry import Polygon
 
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("clouds")
 def detect_clouds(
     product: str, cloud_classif_dir: Path, cloud_prob_dir: Path, output_folder: Path
 ) -> Path:
@@ -18,7 +21,7 @@ def detect_clouds(
     clouds_series = gpd.GeoSeries(dtype=object)
 
     if cloud_prob_dir:
-        clouds_prob = rasterio.open(cloud_prob_dir).read(1).astype("int")
+        clouds_prob = rasterio.open(cloud_prob_dir).read(1).astype("int32")
         # if probability of cloud > 20% then it is cloud
         clouds_prob[clouds_prob <= 5] = 0
         clouds_prob[clouds_prob > 5] = 1
@@ -35,7 +38,7 @@ def detect_clouds(
                     int(clouds_init.width * 3),
                 ),
                 resampling=Resampling.bilinear,
-            ).astype("int")[0]
+            ).astype("int32")[0]
 
             clouds = clouds + clouds_class
 
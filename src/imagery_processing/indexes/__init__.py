@@ -0,0 +1,39 @@
+from typing import Final
+
+# water indexes
+from .cdom import cdom
+from .turbidity import turbidity
+from .doc import doc
+from .chl_a import chl_a
+from .cya import cya
+
+# drought indexes
+from .ndwi import ndwi
+from .nmdi import nmdi
+from .ndmi import ndmi
+from .ndvi import ndvi
+from .wdrvi import wdrvi
+from .evi import evi
+
+# index name: (function, bands passed to the function in order of its arguments)
+INDEXES: Final = {
+    "cdom": (cdom, ["b03_10m", "b04_10m"]),
+    "turb": (turbidity, ["b03_60m", "b01_60m"]),
+    "doc": (doc, ["b03_10m", "b04_10m"]),
+    "chla": (chl_a, ["b03_60m", "b01_60m"]),
+    "cya": (cya, ["b03_10m", "b04_10m", "b02_10m"]),
+    "ndwi": (ndwi, ["b03_10m", "b08_10m"]),
+    "nmdi": (nmdi, ["b08_10m", "b11_20m", "b12_20m"]),
+    "ndmi": (ndmi, ["b08_10m", "b11_20m"]),
+    "ndvi": (ndvi, ["b04_10m", "b08_10m"]),
+    "wdrvi": (wdrvi, ["b04_10m", "b08_10m"]),
+    "evi": (evi, ["b02_10m", "b04_10m", "b08_10m"]),
+}
+WATER_INDEXES: Final = ["cdom", "turb", "doc", "chla", "cya"]
+DROUGHT_INDEXES: Final = ["ndwi", "nmdi", "ndmi", "ndvi", "wdrvi", "evi"]
+
+__all__ = [
+    "INDEXES",
+    "WATER_INDEXES",
+    "DROUGHT_INDEXES",
+]
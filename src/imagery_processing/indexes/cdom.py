@@ -1,11 +1,15 @@
 import numpy as np
-import os
 from pathlib import Path
 
 import rasterio
 from rasterio.warp import calculate_default_transform
 
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.writer import write_raster
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("index.cdom")
 def cdom(product: str, B03: Path, B04: Path, output_folder: Path) -> Path:
     """
     Calculates CDOM index.
@@ -30,14 +34,14 @@ def cdom(product: str, B03: Path, B04: Path, output_folder: Path) -> Path:
         srcB03.crs, dst_crs, srcB03.width, srcB03.height, *srcB03.bounds
     )
     kwargs = srcB03.meta.copy()
-    kwargs.update(driver="GTiff", dtype=rasterio.float32, count=1, compress="lzw")
-
-    home = Path.cwd()
-    os.chdir(output_folder)
-    name = "cdom_"
-    with rasterio.open(name + product + ".tif", "w", **kwargs) as dst:
-        dst.write(cdom.astype(rasterio.float32))
+    kwargs.update(
+        driver="GTiff",
+        dtype=rasterio.float32,
+        count=1,
+        **creation_options(output_folder),
+    )
 
-    os.chdir(home)
+    output_file = output_folder.joinpath("cdom_" + product + ".tif")
+    write_raster(output_file, cdom.astype(rasterio.float32), **kwargs)
 
-    return output_folder.joinpath(name + product + ".tif")
+    return output_file
@@ -1,10 +1,14 @@
 from pathlib import Path
 import numpy as np
-import os
 
 import rasterio
 
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.writer import write_raster
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("index.chla")
 def chl_a(product: str, B03: Path, B01: Path, output_folder: Path):
     """
     Concentration of Chlorophyll a
@@ -23,13 +27,14 @@ def chl_a(product: str, B03: Path, B01: Path, output_folder: Path):
     chla[chla <= 0] = np.nan
 
     kwargs = srcB03.meta.copy()
-    kwargs.update(driver="GTiff", dtype=rasterio.float32, count=1, compress="lzw")
+    kwargs.update(
+        driver="GTiff",
+        dtype=rasterio.float32,
+        count=1,
+        **creation_options(output_folder),
+    )
 
-    home = Path.cwd()
-    os.chdir(output_folder)
-    name = "chla_"
-    with rasterio.open(name + product + ".tif", "w", **kwargs) as dst:
-        dst.write(chla.astype(rasterio.float32))
-    os.chdir(home)
+    output_file = output_folder.joinpath("chla_" + product + ".tif")
+    write_raster(output_file, chla.astype(rasterio.float32), **kwargs)
 
-    return output_folder.joinpath(name + product + ".tif")
+    return output_file
@@ -1,10 +1,14 @@
 from pathlib import Path
 import numpy as np
-import os
 
 import rasterio
 
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.writer import write_raster
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("index.cya")
 def cya(product: str, B03: Path, B04: Path, B02: Path, output_folder: Path):
     """
     Density of Cyanobacteria
@@ -26,13 +30,14 @@ def cya(product: str, B03: Path, B04: Path, B02: Path, output_folder: Path):
     cya[cya <= 0] = np.nan
 
     kwargs = srcB03.meta.copy()
-    kwargs.update(driver="GTiff", dtype=rasterio.float32, count=1, compress="lzw")
+    kwargs.update(
+        driver="GTiff",
+        dtype=rasterio.float32,
+        count=1,
+        **creation_options(output_folder),
+    )
 
-    home = Path.cwd()
-    os.chdir(output_folder)
-    name = "cya_"
-    with rasterio.open(name + product + ".tif", "w", **kwargs) as dst:
-        dst.write(cya.astype(rasterio.float32))
-    os.chdir(home)
+    output_file = output_folder.joinpath("cya_" + product + ".tif")
+    write_raster(output_file, cya.astype(rasterio.float32), **kwargs)
 
-    return output_folder.joinpath(name + product + ".tif")
+    return output_file
@@ -1,11 +1,15 @@
 from pathlib import Path
 import numpy as np
-import os
 
 from rasterio.warp import calculate_default_transform
 import rasterio
 
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.writer import write_raster
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("index.ndvi")
 def ndvi(product: str, B04: Path, B08: Path, output_folder: Path) -> Path:
     """
     Calculates Normalized Difference Vegetation Index.
@@ -29,14 +33,14 @@ def ndvi(product: str, B04: Path, B08: Path, output_folder: Path) -> Path:
         srcB04.crs, dst_crs, srcB04.width, srcB04.height, *srcB04.bounds
     )
     kwargs = srcB04.meta.copy()
-    kwargs.update(driver="GTiff", dtype=rasterio.float32, count=1, compress="lzw")
-
-    home = Path.cwd()
-    os.chdir(output_folder)
-    name = "ndvi_"
-    with rasterio.open(name + product + ".tif", "w", **kwargs) as dst:
-        dst.write(ndvi.astype(rasterio.float32))
+    kwargs.update(
+        driver="GTiff",
+        dtype=rasterio.float32,
+        count=1,
+        **creation_options(output_folder),
+    )
 
-    os.chdir(home)
+    output_file = output_folder.joinpath("ndvi_" + product + ".tif")
+    write_raster(output_file, ndvi.astype(rasterio.float32), **kwargs)
 
-    return output_folder.joinpath(name + product + ".tif")
+    return output_file
@@ -1,11 +1,15 @@
 from pathlib import Path
 import numpy as np
-import os
 
 from rasterio.warp import calculate_default_transform
 import rasterio
 
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.writer import write_raster
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("index.ndwi")
 def ndwi(product: str, B03: Path, B08: Path, output_folder: Path) -> Path:
     """
     Calculates Normalized Difference Water Index.
@@ -30,14 +34,14 @@ def ndwi(product: str, B03: Path, B08: Path, output_folder: Path) -> Path:
     )
 
     kwargs = srcB03.meta.copy()
-    kwargs.update(driver="GTiff", dtype=rasterio.float32, count=1, compress="lzw")
-
-    home = Path.cwd()
-    os.chdir(output_folder)
-    name = "ndwi_"
-    with rasterio.open(name + product + ".tif", "w", **kwargs) as dst:
-        dst.write(ndwi.astype(rasterio.float32))
+    kwargs.update(
+        driver="GTiff",
+        dtype=rasterio.float32,
+        count=1,
+        **creation_options(output_folder),
+    )
 
-    os.chdir(home)
+    output_file = output_folder.joinpath("ndwi_" + product + ".tif")
+    write_raster(output_file, ndwi.astype(rasterio.float32), **kwargs)
 
-    return output_folder.joinpath(name + product + ".tif")
+    return output_file
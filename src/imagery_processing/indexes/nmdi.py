@@ -1,11 +1,15 @@
 from pathlib import Path
 import numpy as np
-import os
 
 from rasterio.warp import calculate_default_transform, Resampling
 import rasterio
 
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.writer import write_raster
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("index.nmdi")
 def nmdi(product: str, B08: Path, B11: Path, B12: Path, output_folder: Path) -> Path:
     """
     Calculates Normalized Multi-Band Drought Index.
@@ -46,14 +50,14 @@ def nmdi(product: str, B08: Path, B11: Path, B12: Path, output_folder: Path) ->
         srcB11.crs, dst_crs, srcB11.width, srcB11.height, *srcB11.bounds
     )
     kwargs = srcB11.meta.copy()
-    kwargs.update(driver="GTiff", dtype=rasterio.float32, count=1, compress="lzw")
-
-    home = Path.cwd()
-    os.chdir(output_folder)
-    name = "nmdi_"
-    with rasterio.open(name + product + ".tif", "w", **kwargs) as dst:
-        dst.write(nmdi.astype(rasterio.float32))
+    kwargs.update(
+        driver="GTiff",
+        dtype=rasterio.float32,
+        count=1,
+        **creation_options(output_folder),
+    )
 
-    os.chdir(home)
+    output_file = output_folder.joinpath("nmdi_" + product + ".tif")
+    write_raster(output_file, nmdi.astype(rasterio.float32), **kwargs)
 
-    return output_folder.joinpath(name + product + ".tif")
+    return output_file
@@ -4,20 +4,33 @@ from typing import Union
 import numpy as np
 import rasterio
 from rasterio.mask import mask
+from rasterio.features import geometry_mask
 from geopandas.geoseries import GeoSeries
 
 from src.db_client.models.aois import AOI
+from src.imagery_processing.metrics import instrumented
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.statistics import zonal_statistics
+from src.imagery_processing.writer import write_raster
 
 
+@instrumented("mask_aoi")
 def masking_aoi(
     layer: Path,
     masking_geom: AOI,
     epoch: str,
     output_folder: Path,
     invert: bool = False,
+    statistics: Union[dict, None] = None,
+    index: str = "",
+    cloud_fraction: Union[float, None] = None,
+    overviews: bool = False,
+    checksum: bool = False,
 ) -> Union[Path, None]:
     """
     Mask product with an AOI, by default take raster values that are inside shapes.
+    If statistics dict is given, it is filled with statistics of the index inside the AOI.
+    With checksum, the checksum of the file is computed by the writer.
     """
     if invert == True:
         crop = False
@@ -37,6 +50,16 @@ def masking_aoi(
         )
         out_meta = src.meta
 
+    if statistics is not None:
+        inside = geometry_mask(
+            [masking_geom.geometry],
+            out_shape=out_image.shape[1:],
+            transform=out_transform,
+            all_touched=True,
+            invert=not invert,
+        )
+        statistics.update(zonal_statistics(out_image[0][inside], index, cloud_fraction))
+
     # if all values in array are NaN
     if np.isnan(out_image).all():
         return None
@@ -47,17 +70,21 @@ def masking_aoi(
                 "height": out_image.shape[1],
                 "width": out_image.shape[2],
                 "transform": out_transform,
+                # pixels outside the shapes
+                "nodata": np.nan,
+                **creation_options(output_folder),
             }
         )
 
         output_file = output_folder.joinpath(
             f"{str(masking_geom.order_id)}_{str(masking_geom.geom_id)}_{layer.name}"
         )
-        with rasterio.open(output_file, "w", **out_meta) as dest:
-            dest.write(out_image)
-        return output_file
+        return write_raster(
+            output_file, out_image, overviews=overviews, checksum=checksum, **out_meta
+        )
 
 
+@instrumented("mask")
 def masking(
     layer: Path,
     mask_name: str,
@@ -96,6 +123,9 @@ def masking(
                 "height": out_image.shape[1],
                 "width": out_image.shape[2],
                 "transform": out_transform,
+                # pixels outside the shapes
+                "nodata": np.nan,
+                **creation_options(output_folder),
             }
         )
 
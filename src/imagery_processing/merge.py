@@ -1,11 +1,15 @@
 from pathlib import Path
-from typing import List
+from typing import List, Tuple
 from datetime import datetime
 
 import rasterio
 from rasterio.merge import merge
 
+from src.imagery_processing.storage import creation_options
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("merge")
 def merge_rasters(index_name: str, layers_to_merge: List[Path], output_folder):
     """ """
     layers_opened = []
@@ -26,7 +30,7 @@ def merge_rasters(index_name: str, layers_to_merge: List[Path], output_folder):
         transform=out_trans,
         dtype=rasterio.float32,
         count=1,
-        compress="lzw",
+        **creation_options(output_folder),
     )
 
     output_file = output_folder.joinpath(index_name + ".tif")
@@ -39,3 +43,39 @@ def merge_rasters(index_name: str, layers_to_merge: List[Path], output_folder):
         layer.close()
 
     return output_file
+
+
+@instrumented("merge_bounds")
+def merge_bounds(
+    layers_to_merge: List[Path],
+    bounds: Tuple[float, ...],
+    res: Tuple[float, float],
+    output_folder: Path,
+) -> Path:
+    """
+    Merges only the window of layers within bounds, with pixels of res size,
+    named as the first layer. Used for AOIs on borders of tiles,
+    which are small compared to tiles.
+    """
+    layers_opened = [rasterio.open(layer) for layer in layers_to_merge]
+    try:
+        mosaic, out_trans = merge(layers_opened, bounds=bounds, res=res)
+        kwargs = layers_opened[0].meta.copy()
+    finally:
+        for layer in layers_opened:
+            layer.close()
+
+    kwargs.update(
+        driver="GTiff",
+        height=mosaic.shape[1],
+        width=mosaic.shape[2],
+        transform=out_trans,
+        dtype=rasterio.float32,
+        count=1,
+        **creation_options(output_folder),
+    )
+
+    output_file = output_folder.joinpath(layers_to_merge[0].name)
+    with rasterio.open(output_file, "w", **kwargs) as dest:
+        dest.write(mosaic)
+    return output_file
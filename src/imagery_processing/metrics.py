@@ -0,0 +1,299 @@
+"""
+Instrumentation of processing stages: wall time, CPU time, peak RSS,
+bytes read and written and pixels processed, per stage and per product.
+Records are written as JSON lines, a Prometheus textfile and a summary table
+printed at the end of each run.
+CPU time and bytes read and written are of the thread running the stage,
+without nested measured blocks, so rasters written by RasterWriter threads
+are recorded as their own writer stage. Where IO counters of threads are not
+available, e.g. outside of Linux, bytes are counted for the whole process.
+Wall time includes nested blocks, peak RSS is of the whole process.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Union
+
+import psutil
+import rasterio
+
+from settings import METRICS
+from src.imagery_processing import writer
+
+SAMPLING_INTERVAL = 0.05
+
+_process = psutil.Process()
+_lock = threading.Lock()
+_active: List[dict] = []
+# records being measured in the thread, innermost last
+_local = threading.local()
+_records: List[dict] = []
+_run = {"name": None, "folder": None, "jsonl": None}
+
+
+def _rss() -> int:
+    return _process.memory_info().rss
+
+
+def _io() -> tuple:
+    # counters of the thread on Linux
+    try:
+        with open("/proc/thread-self/io") as io:
+            counters = dict(line.split(": ") for line in io.read().splitlines())
+        return int(counters["read_bytes"]), int(counters["write_bytes"])
+    except (OSError, KeyError, ValueError):
+        pass
+    # not available on every platform, e.g. macOS
+    try:
+        counters = _process.io_counters()
+        return counters.read_bytes, counters.write_bytes
+    except (AttributeError, psutil.Error):
+        return 0, 0
+
+
+def _sample() -> None:
+    """
+    Updates peak RSS of all running stages.
+    """
+    while True:
+        time.sleep(SAMPLING_INTERVAL)
+        rss = _rss()
+        with _lock:
+            for record in _active:
+                record["peak_rss_bytes"] = max(record["peak_rss_bytes"], rss)
+
+
+_sampler = threading.Thread(target=_sample, name="metrics-sampler", daemon=True)
+
+
+def raster_pixels(layer: Union[Path, None]) -> int:
+    if isinstance(layer, Path) and layer.suffix == ".tif":
+        # rasters written in the background may not be complete yet
+        pixels = writer.pending_pixels(layer)
+        if pixels is not None:
+            return pixels
+        with rasterio.open(layer) as src:
+            return src.width * src.height
+    return 0
+
+
+@contextmanager
+def measure(stage: str, product: str = ""):
+    """
+    Measures code inside the block, number of processed pixels
+    can be set in the yielded record.
+    """
+    if not METRICS:
+        yield {}
+        return
+
+    if not _sampler.is_alive():
+        try:
+            _sampler.start()
+        except RuntimeError:
+            pass
+
+    read_bytes, written_bytes = _io()
+    record = {
+        "run": _run["name"],
+        "stage": stage,
+        "product": product,
+        "started": datetime.now().isoformat(),
+        "pixels": 0,
+        "peak_rss_bytes": _rss(),
+    }
+    wall = time.perf_counter()
+    cpu = time.thread_time()
+    # totals of nested blocks, subtracted from the record
+    nested = {"cpu_seconds": 0.0, "read_bytes": 0, "written_bytes": 0}
+    stack = _local.__dict__.setdefault("stack", [])
+    stack.append(nested)
+    with _lock:
+        _active.append(record)
+
+    try:
+        yield record
+    finally:
+        with _lock:
+            _active.remove(record)
+        stack.pop()
+        read_after, written_after = _io()
+        totals = {
+            "cpu_seconds": time.thread_time() - cpu,
+            "read_bytes": read_after - read_bytes,
+            "written_bytes": written_after - written_bytes,
+        }
+        if stack:
+            for key, value in totals.items():
+                stack[-1][key] += value
+        record.update(
+            {
+                "wall_seconds": time.perf_counter() - wall,
+                "peak_rss_bytes": max(record["peak_rss_bytes"], _rss()),
+                **{key: value - nested[key] for key, value in totals.items()},
+            }
+        )
+        _save(record)
+
+
+def instrumented(stage: str, product_arg: Union[int, None] = 0) -> Callable:
+    """
+    Decorator measuring the function, product is taken from its positional
+    argument product_arg, pixels are counted in the returned raster.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            product = ""
+            if product_arg is not None and len(args) > product_arg:
+                product = args[product_arg]
+                product = product.name if isinstance(product, Path) else str(product)
+
+            with measure(stage, product) as record:
+                result = func(*args, **kwargs)
+                if record:
+                    record["pixels"] = raster_pixels(result)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _save(record: dict) -> None:
+    with _lock:
+        _records.append(record)
+        if _run["jsonl"] is not None:
+            with open(_run["jsonl"], "a") as jsonl:
+                jsonl.write(json.dumps(record) + "\n")
+
+
+def start_child() -> None:
+    """
+    Called in child processes, e.g. downloading products: records are not
+    written to the file of the run inherited from the parent, they are sent
+    to the parent from collect_records and saved there with add_records.
+    """
+    with _lock:
+        _records.clear()
+        _run["jsonl"] = None
+
+
+def collect_records() -> List[dict]:
+    """
+    Records saved since the last call, removed from this process.
+    """
+    with _lock:
+        records = list(_records)
+        _records.clear()
+    return records
+
+
+def add_records(records: List[dict]) -> None:
+    """
+    Saves records measured in a child process to the run.
+    """
+    for record in records:
+        _save({**record, "run": _run["name"]})
+
+
+def start_run(name: str, folder: Path) -> None:
+    folder.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        _records.clear()
+        _run["name"] = name
+        _run["folder"] = folder
+        _run["jsonl"] = folder.joinpath(
+            f"{name}_{datetime.now().strftime('%Y%m%dT%H%M%S')}.jsonl"
+        )
+
+
+def summary() -> Dict[str, dict]:
+    """
+    Records of the run aggregated by stage.
+    """
+    stages = {}
+    with _lock:
+        records = list(_records)
+    for record in records:
+        stage = stages.setdefault(
+            record["stage"],
+            {
+                "calls": 0,
+                "wall_seconds": 0.0,
+                "cpu_seconds": 0.0,
+                "peak_rss_bytes": 0,
+                "read_bytes": 0,
+                "written_bytes": 0,
+                "pixels": 0,
+            },
+        )
+        stage["calls"] += 1
+        stage["peak_rss_bytes"] = max(stage["peak_rss_bytes"], record["peak_rss_bytes"])
+        for key in ["wall_seconds", "cpu_seconds", "read_bytes", "written_bytes"]:
+            stage[key] += record[key]
+        stage["pixels"] += record["pixels"]
+    return stages
+
+
+def _write_prometheus(name: str, folder: Path, stages: Dict[str, dict]) -> None:
+    metrics = {
+        "calls": ("drought_stage_calls", "Number of stage runs"),
+        "wall_seconds": ("drought_stage_wall_seconds", "Wall time of the stage"),
+        "cpu_seconds": ("drought_stage_cpu_seconds", "CPU time of the stage"),
+        "peak_rss_bytes": ("drought_stage_peak_rss_bytes", "Peak RSS of the stage"),
+        "read_bytes": ("drought_stage_read_bytes", "Bytes read by the stage"),
+        "written_bytes": ("drought_stage_written_bytes", "Bytes written by the stage"),
+        "pixels": ("drought_stage_pixels", "Pixels processed by the stage"),
+    }
+    lines = []
+    for key, (metric, help) in metrics.items():
+        lines.append(f"# HELP {metric} {help}")
+        lines.append(f"# TYPE {metric} gauge")
+        for stage, values in stages.items():
+            lines.append(f'{metric}{{task="{name}",stage="{stage}"}} {values[key]}')
+    lines.append("# HELP drought_run_finished_seconds Time of the last finished run")
+    lines.append("# TYPE drought_run_finished_seconds gauge")
+    lines.append(f'drought_run_finished_seconds{{task="{name}"}} {time.time()}')
+
+    # textfile collector must never see a half written file
+    prom = folder.joinpath(f"{name}.prom")
+    tmp = folder.joinpath(f"{name}.prom.tmp")
+    tmp.write_text("\n".join(lines) + "\n")
+    os.replace(tmp, prom)
+
+
+def print_summary(stages: Dict[str, dict]) -> None:
+    header = f"{'stage':<28}{'calls':>7}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}{'read MB':>10}{'write MB':>10}{'Mpx':>10}{'Mpx/s':>9}"
+    print(header)
+    print("-" * len(header))
+    for stage, values in sorted(
+        stages.items(), key=lambda item: item[1]["wall_seconds"], reverse=True
+    ):
+        mpx = values["pixels"] / 10**6
+        throughput = mpx / values["wall_seconds"] if values["wall_seconds"] else 0
+        print(
+            f"{stage:<28}{values['calls']:>7}{values['wall_seconds']:>10.1f}"
+            f"{values['cpu_seconds']:>10.1f}{values['peak_rss_bytes'] / 2**20:>10.0f}"
+            f"{values['read_bytes'] / 2**20:>10.0f}{values['written_bytes'] / 2**20:>10.0f}"
+            f"{mpx:>10.1f}{throughput:>9.1f}"
+        )
+
+
+def finish_run() -> Dict[str, dict]:
+    """
+    Writes Prometheus textfile and prints summary table of the run.
+    """
+    stages = summary()
+    if METRICS and _run["name"] is not None:
+        _write_prometheus(_run["name"], _run["folder"], stages)
+        print_summary(stages)
+    with _lock:
+        _run.update({"name": None, "folder": None, "jsonl": None})
+    return stages
@@ -0,0 +1,86 @@
+"""
+MGRS tiles of Sentinel-2 products, so every tile can be processed separately
+instead of merging all products of the region into one raster.
+"""
+from pathlib import Path
+from typing import Dict, Final, List, Tuple
+
+import numpy as np
+import rasterio
+from pyproj import Transformer
+from rasterio.features import shapes
+from rasterio.transform import Affine
+from shapely.geometry import shape as geometry_shape
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import transform as shapely_transform, unary_union
+
+from src.db_client.models.aois import AOI
+
+# footprints are read from rasters decimated by this factor,
+# 10m bands give footprints with 320m pixels
+FOOTPRINT_SCALE: Final = 32
+
+
+def mgrs_tile(product: str) -> str:
+    """
+    Tile from the name of the product, e.g. T34UDA for
+    S2A_MSIL2A_20230409T094031_N0509_R036_T34UDA_20230409T140117.SAFE
+    """
+    return product.split("_")[5]
+
+
+def tile_footprint(layer: Path, scale: int = FOOTPRINT_SCALE) -> BaseGeometry:
+    """
+    Footprint of valid pixels of the raster in EPSG:3857. Swaths of Sentinel-2
+    do not cover whole tiles, pixels outside of them are no data or 0.
+    The raster is read decimated by scale, so the footprint is shrunk by two
+    decimated pixels to keep AOIs inside it away from pixels without data.
+    """
+    with rasterio.open(layer) as src:
+        shape = (max(src.height // scale, 1), max(src.width // scale, 1))
+        data = src.read(1, out_shape=shape, masked=True)
+        transform = src.transform * Affine.scale(
+            src.width / shape[1], src.height / shape[0]
+        )
+        crs = src.crs
+
+    valid = (~np.ma.getmaskarray(data) & (data.filled(0) != 0)).astype("uint8")
+    pixel = max(abs(transform.a), abs(transform.e))
+    footprint = (
+        unary_union(
+            [
+                geometry_shape(polygon)
+                for polygon, _ in shapes(valid, mask=valid, transform=transform)
+            ]
+        )
+        .simplify(pixel)
+        .buffer(-2 * pixel)
+    )
+    to_web_mercator = Transformer.from_crs(crs, "EPSG:3857", always_xy=True)
+    return shapely_transform(to_web_mercator.transform, footprint)
+
+
+def shard_aois(
+    aois: List[AOI], footprints: Dict[str, BaseGeometry]
+) -> Tuple[Dict[str, List[AOI]], List[AOI]]:
+    """
+    AOIs inside a tile by tile, the first tile in order of footprints is used
+    where tiles overlap, and AOIs straddling borders of tiles or of their valid
+    pixels, which are masked with windows merged from all tiles.
+    """
+    inside = {tile: [] for tile in footprints}
+    straddling = []
+    for aoi in aois:
+        tile = next(
+            (
+                tile
+                for tile, footprint in footprints.items()
+                if footprint.contains(aoi.geometry)
+            ),
+            None,
+        )
+        if tile is None:
+            straddling.append(aoi)
+        else:
+            inside[tile].append(aoi)
+    return inside, straddling
@@ -4,7 +4,10 @@ from pathlib import Path
 import rasterio
 from rasterio.warp import calculate_default_transform, reproject, Resampling
 
+from src.imagery_processing.metrics import instrumented
 
+
+@instrumented("reproject")
 def epsg3857(layer: Path, output_folder: Path):
     """
     Saves reprojected to EPSG 3857 (Web Mercator) .tif file.
@@ -11,8 +11,11 @@ import geopandas
 from sentinelsat import SentinelAPI, read_geojson, geojson_to_wkt, make_path_filter
 from sentinelsat.exceptions import InvalidChecksumError, ServerError
 from requests.exceptions import HTTPError
+import shutil
 import zipfile
 
+from src.imagery_processing.metrics import instrumented
+
 
 def _update_lastRefresh_file(datetime: dt.datetime) -> None:
     fileRefresh = open("lastRefresh.txt", "w")
@@ -46,6 +49,7 @@ def _any_product_offline(api, products_df) -> bool:
         return False
 
 
+@instrumented("sentinel.check", product_arg=None)
 def data_check_2A(
     folder: Path,
     polygon: Polygon,
@@ -124,6 +128,7 @@ def data_check_2A(
     return products_df
 
 
+@instrumented("sentinel.download", product_arg=None)
 def data_download_2A(folder: Path, products_df) -> List[Path]:
     """
     Downloads and unzips products found.
@@ -138,14 +143,27 @@ def data_download_2A(folder: Path, products_df) -> List[Path]:
         downloaded = []
         for product in products_df.iterrows():
             # product = products_df
+            if folder.joinpath(product[1]["filename"]).is_dir():
+                print("Already downloaded: ", product[1]["filename"])
+                downloaded.append(folder.joinpath(product[1]["filename"]))
+                continue
             print(
                 "Now downloading: ", product[1]["filename"]
             )  # filename of the product
             api.download(product[1]["uuid"])  # download the product using uuid
             odata = api.get_product_odata(product[1]["uuid"], full=True)
+            # extracted next to the product first, so an interrupted extraction
+            # is not taken for a downloaded product
+            partial = Path(odata["title"] + ".partial")
             with zipfile.ZipFile(odata["title"] + ".zip", "r") as zip_ref:
-                zip_ref.extractall()
+                zip_ref.extractall(partial)
+                os.replace(
+                    partial.joinpath(product[1]["filename"]), product[1]["filename"]
+                )
+                shutil.rmtree(partial)
                 print("    Zipped file extracted to", product[1]["filename"], "folder")
+            # the extracted product is as big as the zip
+            os.remove(odata["title"] + ".zip")
 
             downloaded.append(folder.joinpath(product[1]["filename"]))
 
@@ -159,6 +177,7 @@ def data_download_2A(folder: Path, products_df) -> List[Path]:
         data_download_2A(folder, products_df)
 
 
+@instrumented("sentinel.download_clouds", product_arg=None)
 def data_download_clouds_bands(folder: Path, products_df) -> List[Path]:
     home = Path.cwd()
     os.chdir(folder)
@@ -0,0 +1,113 @@
+"""
+Zonal statistics of index values inside an AOI, computed from the masked
+array before it is written, so no raster has to be read again,
+or inside any polygon, from windows of rasters intersecting it.
+"""
+from typing import Final, List, Union
+
+import numpy as np
+import rasterio
+from rasterio.errors import WindowError
+from rasterio.features import geometry_mask, geometry_window
+from rasterio.merge import merge
+from shapely import wkb
+
+from src.imagery_processing.indexes import DROUGHT_INDEXES
+
+PERCENTILES: Final = [10, 25, 75, 90]
+HISTOGRAM_BINS: Final = 20
+# drought indexes are normalized differences, other indexes have no fixed range
+HISTOGRAM_RANGES: Final = {index: (-1.0, 1.0) for index in DROUGHT_INDEXES}
+
+
+def zonal_statistics(
+    values: np.ndarray,
+    index: str,
+    cloud_fraction: Union[float, None] = None,
+) -> dict:
+    """
+    Statistics of values of pixels inside the AOI, NaN values are not valid.
+    """
+    total = int(values.size)
+    valid = values[np.isfinite(values)].astype("f8")
+
+    statistics = {
+        "total_pixels": total,
+        "valid_pixels": int(valid.size),
+        "valid_fraction": valid.size / total if total else 0.0,
+        "cloud_fraction": cloud_fraction,
+        "mean": None,
+        "median": None,
+        "std": None,
+        "min": None,
+        "max": None,
+        **{f"p{percentile}": None for percentile in PERCENTILES},
+        "histogram": None,
+    }
+    if not valid.size:
+        return statistics
+
+    percentiles = np.percentile(valid, [50, *PERCENTILES])
+    counts, edges = np.histogram(
+        valid,
+        bins=HISTOGRAM_BINS,
+        range=HISTOGRAM_RANGES.get(index, (valid.min(), valid.max())),
+    )
+    statistics.update(
+        {
+            "mean": float(valid.mean()),
+            "median": float(percentiles[0]),
+            "std": float(valid.std()),
+            "min": float(valid.min()),
+            "max": float(valid.max()),
+            **{
+                f"p{percentile}": float(value)
+                for percentile, value in zip(PERCENTILES, percentiles[1:])
+            },
+            "histogram": {"edges": edges.tolist(), "counts": counts.tolist()},
+        }
+    )
+    return statistics
+
+
+def polygon_statistics(layers: List[str], geometry: bytes, index: str) -> dict:
+    """
+    Statistics of the index inside the polygon given as WKB in CRS of the layers.
+    Layers of one date overlap (regional rasters and rasters clipped to AOIs),
+    so windows of the layers intersecting the polygon are merged on one grid,
+    each pixel taken from the first layer with a valid value.
+    """
+    polygon = wkb.loads(geometry)
+    opened = [rasterio.open(layer) for layer in layers]
+    try:
+        intersecting = []
+        for src in opened:
+            try:
+                window = geometry_window(src, [polygon])
+            except WindowError:
+                continue
+            intersecting.append((src, src.window_bounds(window)))
+        if not intersecting:
+            return zonal_statistics(np.array([], dtype="f4"), index)
+
+        # windows are on the grid of regional rasters, AOI rasters are cut from them
+        lefts, bottoms, rights, tops = zip(*(bounds for _, bounds in intersecting))
+        mosaic, transform = merge(
+            [src for src, _ in intersecting],
+            bounds=(min(lefts), min(bottoms), max(rights), max(tops)),
+            res=intersecting[0][0].res,
+            nodata=np.nan,
+        )
+    finally:
+        for src in opened:
+            src.close()
+
+    # pixels touched by the polygon, as in statistics of AOIs
+    inside = geometry_mask(
+        [polygon],
+        out_shape=mosaic.shape[1:],
+        transform=transform,
+        all_touched=True,
+        invert=True,
+    )
+    return zonal_statistics(mosaic[0][inside], index)
@@ -0,0 +1,108 @@
+from pathlib import Path
+from shutil import rmtree
+from typing import Iterable, Union
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.enums import Resampling
+
+from settings import INTERMEDIATE_IN_MEMORY, INTERMEDIATE_SPILL_THRESHOLD_MB
+
+MEMORY_ROOT = Path("/vsimem")
+
+# bytes of rasters currently kept in /vsimem/, shared by all storages of the process
+_memory_used = 0
+
+
+def is_in_memory(path: Path) -> bool:
+    return path.as_posix().startswith(MEMORY_ROOT.as_posix())
+
+
+def raster_nbytes(layer: Path) -> int:
+    """
+    Uncompressed size of the raster in bytes, only the header is read.
+    """
+    with rasterio.open(layer) as src:
+        return src.width * src.height * src.count * np.dtype(src.dtypes[0]).itemsize
+
+
+def creation_options(output_folder: Path) -> dict:
+    """
+    GeoTIFF creation options for rasters saved in output_folder.
+    Rasters kept in memory live for seconds, so they are not compressed.
+    Rasters on disk are tiled, so windows can be read without reading whole rows.
+    """
+    if is_in_memory(output_folder):
+        return {}
+    return {"compress": "lzw", "tiled": True, "blockxsize": 256, "blockysize": 256}
+
+
+def add_overviews(layer: Path, tile_size: int = 256) -> Path:
+    """
+    Adds overviews halving resolution until the raster fits in one tile,
+    so zoomed out views read a few blocks instead of the whole raster.
+    """
+    if is_in_memory(layer):
+        return layer
+    with rasterio.open(layer, "r+") as dst:
+        factors = []
+        factor = 2
+        while max(dst.width, dst.height) / factor >= tile_size / 2:
+            factors.append(factor)
+            factor *= 2
+        if factors:
+            dst.build_overviews(factors, Resampling.average)
+    return layer
+
+
+class IntermediateStorage:
+    """
+    Storage for short-lived rasters passed between processing stages.
+    Rasters are kept in GDAL /vsimem/ until the spill threshold is reached,
+    after that they are written to disk_folder.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        disk_folder: Path,
+        in_memory: bool = INTERMEDIATE_IN_MEMORY,
+        spill_threshold: int = INTERMEDIATE_SPILL_THRESHOLD_MB * 1024 * 1024,
+    ):
+        self.memory_folder = MEMORY_ROOT.joinpath(name)
+        self.disk_folder = disk_folder
+        self.in_memory = in_memory
+        self.spill_threshold = spill_threshold
+        self.reserved = 0
+
+    def folder(self, nbytes: int) -> Path:
+        """
+        Returns folder for rasters with expected uncompressed size of nbytes.
+        """
+        global _memory_used
+
+        if self.in_memory and _memory_used + nbytes <= self.spill_threshold:
+            _memory_used += nbytes
+            self.reserved += nbytes
+            return self.memory_folder
+
+        if self.in_memory:
+            print(f"    Memory threshold reached, spilling to {self.disk_folder}")
+        self.disk_folder.mkdir(parents=True, exist_ok=True)
+        return self.disk_folder
+
+    def delete(self, layers: Iterable[Union[Path, None]]) -> None:
+        """
+        Deletes rasters of this storage after the next stage has read them.
+        """
+        global _memory_used
+
+        for layer in layers:
+            if layer is not None and is_in_memory(layer):
+                rasterio.shutil.delete(layer)
+        _memory_used -= self.reserved
+        self.reserved = 0
+
+        if self.disk_folder.is_dir():
+            rmtree(self.disk_folder)
@@ -0,0 +1,146 @@
+"""
+Writing of computed rasters in background threads, so compression and overviews
+of one raster overlap with computation of the next one. GDAL releases the GIL
+while it encodes, so threads write in parallel with numpy in the stage.
+Checksums of rasters registered in DB are computed by the same threads.
+"""
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+import rasterio
+
+from settings import WRITER_QUEUE_SIZE, WRITER_THREADS
+from src.imagery_processing import metrics
+from src.imagery_processing.storage import add_overviews
+
+# writer of the stage running in the thread, rasters are written at once without it
+_local = threading.local()
+# rasters being written, by path
+_pending: Dict[Path, np.ndarray] = {}
+_pending_lock = threading.Lock()
+# checksums of written rasters not taken by raster_checksum yet, by path
+_checksums: Dict[Path, str] = {}
+
+
+def _sha256(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(2**20), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def _write(
+    path: Path, data: np.ndarray, overviews: bool, checksum: bool, meta: dict
+) -> Path:
+    with rasterio.open(path, "w", **meta) as dst:
+        dst.write(data)
+    if overviews:
+        add_overviews(path)
+    if checksum:
+        digest = _sha256(path)
+        with _pending_lock:
+            _checksums[path] = digest
+    return path
+
+
+def _write_measured(
+    path: Path, data: np.ndarray, overviews: bool, checksum: bool, meta: dict
+) -> Path:
+    # stages are measured in their own thread, rasters written by threads
+    # of the writer are recorded separately
+    with metrics.measure("writer", path.name) as record:
+        if record:
+            record["pixels"] = data.shape[-1] * data.shape[-2]
+        return _write(path, data, overviews, checksum, meta)
+
+
+class RasterWriter:
+    """
+    Writes rasters given to write_raster inside the with block in background
+    threads. At most queue_size rasters wait for writing, then write_raster
+    blocks, so computed arrays do not pile up in memory. All rasters are
+    written when the block ends, errors of writing are raised there.
+    """
+
+    def __init__(
+        self, threads: int = WRITER_THREADS, queue_size: int = WRITER_QUEUE_SIZE
+    ):
+        self.executor = ThreadPoolExecutor(threads, thread_name_prefix="writer")
+        self.slots = threading.BoundedSemaphore(queue_size)
+        self.futures: List[Future] = []
+        self.previous = None
+
+    def submit(
+        self, path: Path, data: np.ndarray, overviews: bool, checksum: bool, meta: dict
+    ) -> None:
+        self.slots.acquire()
+        with _pending_lock:
+            _pending[path] = data
+        future = self.executor.submit(
+            _write_measured, path, data, overviews, checksum, meta
+        )
+        future.add_done_callback(lambda _: self._done(path))
+        self.futures.append(future)
+
+    def _done(self, path: Path) -> None:
+        with _pending_lock:
+            _pending.pop(path, None)
+        self.slots.release()
+
+    def __enter__(self) -> "RasterWriter":
+        self.previous = getattr(_local, "writer", None)
+        _local.writer = self
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        _local.writer = self.previous
+        self.executor.shutdown(wait=True)
+        if exc_type is None:
+            for future in self.futures:
+                future.result()
+
+
+def write_raster(
+    path: Path,
+    data: np.ndarray,
+    overviews: bool = False,
+    checksum: bool = False,
+    **meta,
+) -> Path:
+    """
+    Writes data to a new raster with meta as creation options, adding overviews
+    and computing the checksum of the file for raster_checksum if asked.
+    Inside RasterWriter it is written in the background, so data must not be
+    changed after the call.
+    """
+    writer: Optional[RasterWriter] = getattr(_local, "writer", None)
+    if writer is None:
+        return _write(path, data, overviews, checksum, meta)
+    writer.submit(path, data, overviews, checksum, meta)
+    return path
+
+
+def raster_checksum(path: Path) -> str:
+    """
+    SHA-256 of the raster file, computed when it was written with checksum,
+    or read from the file. The raster must be written already.
+    """
+    with _pending_lock:
+        digest = _checksums.pop(path, None)
+    return digest or _sha256(path)
+
+
+def pending_pixels(path: Path) -> Optional[int]:
+    """
+    Pixels of the raster if it is still being written, None otherwise.
+    """
+    with _pending_lock:
+        data = _pending.get(path)
+    if data is None:
+        return None
+    return data.shape[-1] * data.shape[-2]
@@ -0,0 +1,271 @@
+import hashlib
+import inspect
+import json
+from pathlib import Path
+from shutil import rmtree
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from settings import PIPELINE_CACHE, PIPELINE_KEEP_CACHE
+from src.imagery_processing.storage import IntermediateStorage
+from src.imagery_processing.metrics import measure
+
+
+def fingerprint(folder: Path) -> str:
+    """
+    Cheap fingerprint of all files in the folder, based on their names and sizes,
+    used for inputs too big to hash their content. Modification times are not
+    used, as they change when the same product is extracted again.
+    """
+    sha = hashlib.sha256()
+    for file in sorted(folder.rglob("*")):
+        if file.is_file():
+            sha.update(f"{file.relative_to(folder)}:{file.stat().st_size}".encode())
+    return sha.hexdigest()
+
+
+def _source(module: ModuleType) -> str:
+    """
+    Source of the module, or of all modules of the package.
+    """
+    if not hasattr(module, "__path__"):
+        return inspect.getsource(module)
+    files = sorted(
+        file for folder in module.__path__ for file in Path(folder).rglob("*.py")
+    )
+    return "".join(file.read_text() for file in files)
+
+
+def _encode(obj: Any) -> Any:
+    if isinstance(obj, Path):
+        return {"__path__": str(obj)}
+    raise TypeError(f"Stage result of type {type(obj)} can not be cached")
+
+
+def _decode(obj: dict) -> Any:
+    if "__path__" in obj:
+        return Path(obj["__path__"])
+    return obj
+
+
+def _paths(result: Any) -> List[Path]:
+    """
+    All paths referenced in the result of a stage.
+    """
+    if isinstance(result, Path):
+        return [result]
+    if isinstance(result, dict):
+        return [path for value in result.values() for path in _paths(value)]
+    if isinstance(result, (list, tuple)):
+        return [path for value in result for path in _paths(value)]
+    return []
+
+
+class Stage:
+    """
+    One step of the pipeline. Function of the stage is called with the storage for
+    its rasters, results of input stages (in order of inputs) and parameters.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable,
+        inputs: List[str],
+        params: Dict[str, Any],
+        code: Iterable[ModuleType],
+        cache: bool,
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = inputs
+        self.params = params
+        self.code = [inspect.getmodule(func), *code]
+        self.cache = cache
+
+    def code_version(self) -> str:
+        sha = hashlib.sha256()
+        for module in self.code:
+            sha.update(_source(module).encode())
+        return sha.hexdigest()
+
+    def key(self, input_keys: List[str]) -> str:
+        """
+        Hash of input stages, parameters and code of the stage.
+        """
+        sha = hashlib.sha256()
+        sha.update(self.name.encode())
+        sha.update(self.code_version().encode())
+        sha.update(json.dumps(self.params, sort_keys=True, default=str).encode())
+        for input_key in input_keys:
+            sha.update(input_key.encode())
+        return sha.hexdigest()[:16]
+
+
+class Pipeline:
+    """
+    Small DAG engine. Stages are run in order they were added, results of cached
+    stages are saved under data/cache, so the rerun starts at first invalidated stage.
+    Code of a stage is the module of its function, modules given to the stage
+    and modules given to the pipeline, used by all its stages.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        cache_folder: Path,
+        cache: bool = PIPELINE_CACHE,
+        keep_cache: bool = PIPELINE_KEEP_CACHE,
+        code: Iterable[ModuleType] = (),
+    ):
+        self.name = name
+        self.code = list(code)
+        self.cache_folder = cache_folder.joinpath(name)
+        self.cache = cache
+        self.keep_cache = keep_cache
+        self.stages: Dict[str, Stage] = {}
+        # results and storages of stages run by earlier runs, so stages added
+        # later can be run without running the earlier ones again
+        self.done: Dict[str, Tuple[str, Any]] = {}
+        self.storages: Dict[str, IntermediateStorage] = {}
+
+    def add(
+        self,
+        name: str,
+        func: Callable,
+        inputs: Iterable[str] = (),
+        code: Iterable[ModuleType] = (),
+        cache: bool = True,
+        **params,
+    ) -> str:
+        """
+        Adds stage to the pipeline, all its inputs have to be added before.
+        Returns name of the stage to be used as input of next stages.
+        """
+        inputs = list(inputs)
+        for input_name in inputs:
+            if input_name not in self.stages:
+                raise ValueError(f"Stage {name} needs {input_name} that is not added")
+        if name in self.stages:
+            raise ValueError(f"Stage {name} already added")
+
+        self.stages[name] = Stage(
+            name, func, inputs, params, [*self.code, *code], cache
+        )
+        return name
+
+    def _is_cached(self, stage: Stage) -> bool:
+        return self.cache and stage.cache
+
+    def _manifest(self, stage: Stage, key: str) -> Path:
+        return self.cache_folder.joinpath(stage.name, key + ".json")
+
+    def _storage(self, stage: Stage, key: str) -> IntermediateStorage:
+        if self._is_cached(stage):
+            return IntermediateStorage(
+                stage.name,
+                self.cache_folder.joinpath(stage.name, key),
+                in_memory=False,
+            )
+        return IntermediateStorage(
+            f"{self.name}/{stage.name}",
+            self.cache_folder.joinpath("spilled", stage.name),
+        )
+
+    def _load(self, stage: Stage, key: str):
+        manifest = self._manifest(stage, key)
+        if not self._is_cached(stage) or not manifest.is_file():
+            return None, False
+
+        result = json.loads(manifest.read_text(), object_hook=_decode)
+        if not all(path.exists() for path in _paths(result)):
+            return None, False
+        return result, True
+
+    def _save(self, stage: Stage, key: str, result: Any) -> None:
+        if self._is_cached(stage):
+            manifest = self._manifest(stage, key)
+            manifest.parent.mkdir(parents=True, exist_ok=True)
+            manifest.write_text(json.dumps(result, default=_encode))
+
+    def run(self, targets: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Runs stages which are not cached and are needed by the next stages,
+        returns results by stage name. Given targets, only they and stages
+        they need are run, and the cache is kept for the runs of other targets.
+        """
+        targets = None if targets is None else set(targets)
+        for name in targets or ():
+            if name not in self.stages:
+                raise ValueError(f"No stage {name} in the pipeline")
+
+        keys = {}
+        results = {}
+        earlier = set()
+        for stage in self.stages.values():
+            keys[stage.name] = stage.key([keys[name] for name in stage.inputs])
+            key, result = self.done.get(stage.name, (None, None))
+            if key == keys[stage.name]:
+                results[stage.name] = result
+                earlier.add(stage.name)
+                continue
+            result, cached = self._load(stage, keys[stage.name])
+            if cached:
+                results[stage.name] = result
+
+        # going backwards from the last stages, cached result stops the walk
+        needed = set()
+        for stage in reversed(self.stages.values()):
+            if targets is None:
+                is_target = not any(
+                    stage.name in other.inputs for other in self.stages.values()
+                )
+            else:
+                is_target = stage.name in targets
+            if stage.name not in results and (is_target or stage.name in needed):
+                needed.add(stage.name)
+                needed.update(stage.inputs)
+        needed.difference_update(results)
+
+        consumers = {name: 0 for name in self.stages}
+        for name in needed:
+            for input_name in self.stages[name].inputs:
+                consumers[input_name] += 1
+
+        storages = self.storages
+        for stage in self.stages.values():
+            if stage.name not in needed:
+                if stage.name in results and stage.name not in earlier:
+                    print(f"Stage {stage.name} is cached, skipping")
+                continue
+
+            storages[stage.name] = self._storage(stage, keys[stage.name])
+            kind, _, product = stage.name.partition("/")
+            with measure(f"pipeline.{kind}", product):
+                results[stage.name] = stage.func(
+                    storages[stage.name],
+                    *[results[name] for name in stage.inputs],
+                    **stage.params,
+                )
+            self._save(stage, keys[stage.name], results[stage.name])
+            self.done[stage.name] = (keys[stage.name], results[stage.name])
+
+            # intermediates not cached are deleted when all next stages have read them
+            for input_name in stage.inputs:
+                consumers[input_name] -= 1
+                if (
+                    consumers[input_name] == 0
+                    and input_name in storages
+                    and not self._is_cached(self.stages[input_name])
+                ):
+                    storages.pop(input_name).delete(_paths(results[input_name]))
+                    self.done.pop(input_name, None)
+
+        if targets is None:
+            self.clear_cache()
+
+        return results
+
+    def clear_cache(self) -> None:
+        if self.cache and not self.keep_cache and self.cache_folder.is_dir():
+            rmtree(self.cache_folder)
@@ -0,0 +1,142 @@
+"""
+Tasks run by many workers, possibly on many nodes, through the queue of jobs:
+one job per product calculating its indexes, one job per index (or per MGRS
+tile of an index) merging and masking it when all products are done and one
+job finishing the task.
+Workers share data/download and data/cache, e.g. on NFS, results of stages
+are passed between jobs through the cache of the pipeline. Every submitted run
+has its own cache folder, so runs of the same task, e.g. of many seasons, can be
+queued together and finishing one does not delete the cache of the others.
+"""
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import List, Union
+
+import pandas
+
+from settings import JOBS_MAX_ATTEMPTS
+from src.db_client.db_client import DBClient
+from src.db_client.models.jobs import Job
+from src.imagery_processing.mgrs import mgrs_tile
+from src.imagery_processing.sentinel_api import data_download_2A
+from src.pipeline.dag import Pipeline
+from src.pipeline.engine import build_pipeline, check_folder, find_products
+from src.pipeline.models.tasks import TaskDefinition
+
+
+def submit_task(
+    task: TaskDefinition,
+    sen_from: Union[datetime, None],
+    sen_to: Union[datetime, None],
+) -> List[int]:
+    """
+    Finds new products for the task and queues its jobs, returns their ids.
+    """
+    products_df = find_products(task, sen_from, sen_to)
+    if products_df is None:
+        return []
+
+    params = {
+        "run": f"{task.name}_{datetime.utcnow().strftime('%Y%m%dT%H%M%S%f')}",
+        "task": json.loads(task.json(by_alias=True)),
+        "products": products_df[["uuid", "filename"]].to_dict("records"),
+        "timestamp": products_df["generationdate"].mean().to_pydatetime().isoformat(),
+    }
+    products = [
+        ("task_product", {**params, "product": product}, [])
+        for product in params["products"]
+    ]
+    # sharded tasks have a job for every MGRS tile of every index
+    tiles = [None]
+    if task.output.sharded:
+        tiles = sorted(
+            {mgrs_tile(product["filename"]) for product in params["products"]}
+        )
+    indexes = [
+        (
+            "task_index",
+            {**params, "index": key, "tile": tile},
+            list(range(len(products))),
+        )
+        for key in task.indexes
+        for tile in tiles
+    ]
+    finish = (
+        "task_finish",
+        params,
+        list(range(len(products), len(products) + len(indexes))),
+    )
+    job_ids = DBClient().submit_jobs(
+        [*products, *indexes, finish], max_attempts=JOBS_MAX_ATTEMPTS
+    )
+    print(f"Queued {len(job_ids)} jobs of task {task.name}: {job_ids}")
+    return job_ids
+
+
+def _download(product: dict) -> Path:
+    folder = check_folder(Path.cwd().joinpath("data", "download"))
+    if not folder.joinpath(product["filename"]).is_dir():
+        data_download_2A(folder, pandas.DataFrame([product]))
+    return folder.joinpath(product["filename"])
+
+
+def _task(job: Job) -> TaskDefinition:
+    return TaskDefinition(**job.params["task"])
+
+
+def _pipeline(job: Job, downloaded: List[Path]) -> Pipeline:
+    # results are passed to next jobs only through the cache, so it is always on
+    return build_pipeline(
+        _task(job),
+        downloaded,
+        datetime.fromisoformat(job.params["timestamp"]),
+        cache=True,
+        name=job.params.get("run"),
+    )
+
+
+def _downloaded(job: Job) -> List[Path]:
+    folder = Path.cwd().joinpath("data", "download")
+    return [folder.joinpath(product["filename"]) for product in job.params["products"]]
+
+
+def task_product(job: Job) -> dict:
+    """
+    Downloads one product and runs stages of the product.
+    """
+    folder = _download(job.params["product"])
+    # keys of stages of a product do not depend on other products,
+    # so they are the same as in the pipeline with all products
+    pipeline = _pipeline(job, [folder])
+    targets = [name for name in pipeline.stages if name.endswith(f"/{folder.name}")]
+    pipeline.run(targets)
+    return {"product": folder.name, "stages": targets}
+
+
+def task_index(job: Job) -> dict:
+    """
+    Merges and masks one index, or its MGRS tile for sharded tasks,
+    of products calculated by task_product jobs.
+    """
+    pipeline = _pipeline(job, _downloaded(job))
+    shard = job.params["index"]
+    if job.params.get("tile"):
+        shard = f"{shard}.{job.params['tile']}"
+    targets = [name for name in pipeline.stages if name.endswith(f"/{shard}")]
+    pipeline.run(targets)
+    return {"shard": shard, "stages": targets}
+
+
+def task_finish(job: Job) -> dict:
+    """
+    Runs remaining stages of the task, e.g. registering files in DB,
+    and deletes the cache of the run.
+    """
+    pipeline = _pipeline(job, _downloaded(job))
+    results = pipeline.run()
+    return {
+        name: result
+        for name, result in results.items()
+        if "/" not in name and isinstance(result, (int, float, str))
+    }
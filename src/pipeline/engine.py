@@ -0,0 +1,476 @@
+from collections import defaultdict
+from datetime import datetime
+from pathlib import Path
+from shutil import rmtree
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+import geopandas
+import pandas
+from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
+from shapely.ops import unary_union
+
+from settings import PIPELINE_CACHE, PIPELINE_DELETE_PRODUCTS
+
+from src.imagery_processing.sentinel_api import data_check_2A
+from src.imagery_processing.clip import clip_windows
+from src.imagery_processing.get_bands import bands_2A
+from src.imagery_processing.mgrs import mgrs_tile, shard_aois, tile_footprint
+from src.db_client.db_client import DBClient
+from src.db_client.models.aois import AOI
+from src.pipeline.dag import Pipeline, fingerprint
+from src.pipeline.models.tasks import TaskDefinition
+from src.pipeline.prefetch import prefetched_downloads
+from src.pipeline import stages
+from src.imagery_processing import metrics
+import src.imagery_processing as imagery_processing
+
+
+def check_folder(folder: Path) -> Path:
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder
+
+
+def run_task(
+    task: TaskDefinition,
+    sen_from: Union[datetime, None],
+    sen_to: Union[datetime, None],
+) -> None:
+    """
+    Finds and downloads new products for the region of the task,
+    then calculates, merges and masks its indexes.
+    """
+    metrics.start_run(task.name, Path.cwd().joinpath("data", "metrics"))
+    try:
+        _run_task(task, sen_from, sen_to)
+    finally:
+        metrics.finish_run()
+
+
+def find_products(
+    task: TaskDefinition,
+    sen_from: Union[datetime, None],
+    sen_to: Union[datetime, None],
+) -> Union[pandas.DataFrame, None]:
+    """
+    New products for the region of the task, with their generation dates.
+    """
+    products_df = data_check_2A(
+        check_folder(Path.cwd().joinpath("data", "download")),
+        task.region.geometry(),
+        sen_from,
+        sen_to,
+        if_polygon_inside_image=task.region.inside_image,
+    )
+    if products_df is None:
+        return None
+
+    # imagery before 2021 have no generationdate field
+    if "generationdate" not in products_df:
+        products_df["generationdate"] = products_df["filename"].apply(
+            lambda x: datetime.strptime(x.split("_")[-1].split(".")[0], "%Y%m%dT%H%M%S")
+        )
+    return products_df
+
+
+def _run_task(
+    task: TaskDefinition,
+    sen_from: Union[datetime, None],
+    sen_to: Union[datetime, None],
+) -> None:
+    # ------------------------------------------------------------------------------------ find new products
+    products_df = find_products(task, sen_from, sen_to)
+    if products_df is None:
+        return
+
+    timestamp = products_df["generationdate"].mean()
+
+    # ------------------------------------------------------------------------------------ download new satellite imagery
+    # products are processed while next ones are downloaded
+    downloads = prefetched_downloads(
+        check_folder(Path.cwd().joinpath("data", "download")), products_df
+    )
+
+    process_downloads(task, downloads, timestamp)
+
+
+def process_products(
+    task: TaskDefinition,
+    downloaded: List[Path],
+    timestamp: datetime,
+    aois: Optional[List[AOI]] = None,
+    clip_to: Optional[BaseGeometry] = None,
+) -> Dict[str, Any]:
+    """
+    Calculates, merges and masks indexes of the task for downloaded products.
+    The aois layout masks with given AOIs, all AOIs from DB by default.
+    If clip_to is given in EPSG:4326, or the task clips to its region, only its
+    window of bands is processed and products outside of it are skipped.
+    Returns results of all pipeline stages.
+    """
+    return build_pipeline(task, downloaded, timestamp, aois, clip_to).run()
+
+
+def _aois_params(aois: List[AOI]) -> List[dict]:
+    return [
+        {
+            "geom_id": aoi.geom_id,
+            "order_id": aoi.order_id,
+            "geometry": aoi.geometry.wkt,
+            "epsg": aoi.epsg,
+        }
+        for aoi in aois
+    ]
+
+
+def process_downloads(
+    task: TaskDefinition, downloads: Iterable[Path], timestamp: datetime
+) -> Dict[str, Any]:
+    """
+    As process_products, for products given while they are downloaded.
+    Stages of a product are run as soon as it is downloaded,
+    the remaining stages when all products are downloaded.
+    Products are deleted when their stages are done if PIPELINE_DELETE_PRODUCTS,
+    so they have to be downloaded again to rerun the task.
+    """
+    pipeline = Pipeline(
+        task.name, Path.cwd().joinpath("data", "cache"), code=[imagery_processing]
+    )
+    aois = None
+    if task.region.clip and task.output.layout == "aois":
+        aois = DBClient().get_all_aois()
+    clip_to = clip_geometry(task, aois)
+    downloaded = []
+    footprints = {}
+    for folder in downloads:
+        if clip_to is not None and not covers_region(folder, clip_to):
+            print(f"Skipping {folder.name}, it does not cover the region")
+        else:
+            downloaded.append(folder)
+            pipeline.run(add_product_stages(pipeline, task, folder, clip_to))
+            if task.output.sharded:
+                footprints[folder.name] = product_footprint(folder)
+        if PIPELINE_DELETE_PRODUCTS:
+            rmtree(folder)
+    if not downloaded:
+        return {}
+    add_task_stages(pipeline, task, downloaded, timestamp, aois, footprints)
+    return pipeline.run()
+
+
+def build_pipeline(
+    task: TaskDefinition,
+    downloaded: List[Path],
+    timestamp: datetime,
+    aois: Optional[List[AOI]] = None,
+    clip_to: Optional[BaseGeometry] = None,
+    cache: bool = PIPELINE_CACHE,
+    name: Optional[str] = None,
+) -> Pipeline:
+    """
+    Pipeline of process_products, stages are named kind/product for stages
+    of one product, kind/index for stages of one index, kind/index.tile for
+    stages of one MGRS tile of sharded tasks and kind for the rest.
+    The cache is in data/cache/name, named as the task by default.
+    """
+    # stages only wrap functions of src.imagery_processing, so its code is hashed too
+    pipeline = Pipeline(
+        name or task.name,
+        Path.cwd().joinpath("data", "cache"),
+        cache=cache,
+        code=[imagery_processing],
+    )
+    if clip_to is None and task.region.clip:
+        if task.output.layout == "aois" and aois is None:
+            aois = DBClient().get_all_aois()
+        clip_to = clip_geometry(task, aois)
+    if clip_to is not None:
+        downloaded = [folder for folder in downloaded if covers_region(folder, clip_to)]
+    if not downloaded:
+        print("No products cover the region")
+        return pipeline
+
+    for folder in downloaded:
+        add_product_stages(pipeline, task, folder, clip_to)
+    add_task_stages(pipeline, task, downloaded, timestamp, aois)
+    return pipeline
+
+
+def clip_geometry(
+    task: TaskDefinition, aois: Optional[List[AOI]] = None
+) -> Optional[BaseGeometry]:
+    """
+    Geometry in EPSG:4326 products of the task are clipped to, None if the task
+    does not clip. For the aois layout it is the bounds of the region and
+    of all AOIs, so AOIs outside of the region or on its border are covered.
+    """
+    if not task.region.clip:
+        return None
+    region = task.region.geometry()
+    if task.output.layout != "aois" or not aois:
+        return region
+
+    by_epsg = defaultdict(list)
+    for aoi in aois:
+        by_epsg[aoi.epsg].append(aoi.geometry)
+    bounds = [box(*region.bounds)] + [
+        box(
+            *geopandas.GeoSeries(geometries, crs=f"EPSG:{epsg}")
+            .to_crs("EPSG:4326")
+            .total_bounds
+        )
+        for epsg, geometries in by_epsg.items()
+    ]
+    return box(*unary_union(bounds).bounds)
+
+
+def covers_region(folder: Path, region: BaseGeometry) -> bool:
+    """
+    If the product has any pixels of the region given in EPSG:4326.
+    """
+    return bool(clip_windows(bands_2A(folder), region))
+
+
+def product_footprint(folder: Path) -> BaseGeometry:
+    """
+    Footprint of the product in EPSG:3857.
+    """
+    return tile_footprint(bands_2A(folder)["b03_10m"])
+
+
+def add_product_stages(
+    pipeline: Pipeline,
+    task: TaskDefinition,
+    folder: Path,
+    clip_to: Optional[BaseGeometry] = None,
+) -> List[str]:
+    """
+    Adds stages calculating indexes and clouds of one product,
+    returns their names.
+    """
+    # ------------------------------------------------------------------------------------ calculate indexes and detect clouds
+    bands = pipeline.add(
+        f"bands/{folder.name}",
+        stages.locate_bands,
+        folder=folder,
+        fingerprint=fingerprint(folder),
+    )
+    added = [bands]
+    if clip_to is not None:
+        bands = pipeline.add(
+            f"clipped/{folder.name}",
+            stages.clip_to_region,
+            inputs=[bands],
+            product=folder.name,
+            region=clip_to.wkt,
+        )
+        added.append(bands)
+    indexes = pipeline.add(
+        f"indexes/{folder.name}",
+        stages.calculate_indexes,
+        inputs=[bands],
+        product=folder.name,
+        indexes=task.indexes,
+    )
+    added.append(indexes)
+    if task.uses_clouds():
+        added.append(
+            pipeline.add(
+                f"clouds/{folder.name}",
+                stages.find_clouds,
+                inputs=[bands],
+                product=folder.name,
+                output_folder=Path.cwd().joinpath("data", "clouds_masks_per_imagery"),
+            )
+        )
+
+    # ------------------------------------------------------------------------------------ reproject to web mercator: EPSG 3857
+    added.append(
+        pipeline.add(
+            f"reprojected/{folder.name}",
+            stages.reproject_indexes,
+            inputs=[indexes],
+        )
+    )
+    return added
+
+
+def add_task_stages(
+    pipeline: Pipeline,
+    task: TaskDefinition,
+    downloaded: List[Path],
+    timestamp: datetime,
+    aois: Optional[List[AOI]] = None,
+    footprints: Optional[Dict[str, BaseGeometry]] = None,
+) -> None:
+    """
+    Adds stages merging and masking indexes of products,
+    stages of the products have to be added before.
+    Sharded tasks use footprints of products by product name,
+    read from products not given.
+    """
+    epoch = int(timestamp.timestamp())
+    suffix = f"epoch{epoch}_date{timestamp.strftime('%Y%m%d')}"
+
+    reprojected = [f"reprojected/{folder.name}" for folder in downloaded]
+    detected_clouds = []
+    if task.uses_clouds():
+        detected_clouds = [f"clouds/{folder.name}" for folder in downloaded]
+
+    # ------------------------------------------------------------------------------------ merge all products for each index
+    # sharded tasks merge only products of the same MGRS tile, stages of a tile
+    # are named kind/index.tile
+    if task.output.sharded:
+        shards = defaultdict(list)
+        for position, folder in enumerate(downloaded):
+            shards[mgrs_tile(folder.name)].append(position)
+    else:
+        shards = {None: list(range(len(downloaded)))}
+
+    def shard_name(key: str, tile: Optional[str]) -> str:
+        return key if tile is None else f"{key}.{tile}"
+
+    merged = {
+        key: {
+            tile: pipeline.add(
+                f"merged/{shard_name(key, tile)}",
+                stages.merge_index,
+                inputs=[reprojected[position] for position in positions],
+                index=key,
+                output_name=key if task.output.layout == "aois" else f"{key}_{suffix}",
+            )
+            for tile, positions in shards.items()
+        }
+        for key in task.indexes
+    }
+
+    # ------------------------------------------------------------------------------------ mask rasters with water bodies, clouds etc.
+    for mask in task.masks:
+        for key in mask.indexes or task.indexes:
+            for tile, positions in shards.items():
+                if mask.clouds:
+                    # tasks with clouds masks support only regions inside one imagery
+                    inputs = [merged[key][tile], detected_clouds[positions[0]]]
+                    params = {}
+                else:
+                    inputs = [merged[key][tile]]
+                    params = {"shapefile": Path.cwd().joinpath(mask.shapefile)}
+                merged[key][tile] = pipeline.add(
+                    f"{mask.name}Masked/{shard_name(key, tile)}",
+                    stages.mask_with_shapefile,
+                    inputs=inputs,
+                    mask_name=mask.name,
+                    invert=mask.invert,
+                    **params,
+                )
+
+    # ------------------------------------------------------------------------------------ add detected clouds to DB, for vector tiles
+    if detected_clouds and (task.output.layout == "aois" or task.output.register_in_db):
+        pipeline.add(
+            "registerClouds",
+            stages.register_clouds,
+            inputs=detected_clouds,
+            products=[folder.name for folder in downloaded],
+            date=timestamp.isoformat(),
+        )
+
+    # ------------------------------------------------------------------------------------ mask rasters with AOIs
+    if task.output.layout == "aois":
+        aois = DBClient().get_all_aois() if aois is None else aois
+        aois_params = {
+            "epoch": epoch,
+            "output_folder": Path.cwd().joinpath("data", "final"),
+        }
+        if task.output.sharded:
+            footprints = footprints or {}
+            tile_footprints = {
+                tile: unary_union(
+                    [
+                        footprints[folder.name]
+                        if folder.name in footprints
+                        else product_footprint(folder)
+                        for folder in (downloaded[position] for position in positions)
+                    ]
+                )
+                for tile, positions in shards.items()
+            }
+            inside, straddling = shard_aois(aois, tile_footprints)
+        else:
+            inside, straddling = {None: aois}, []
+
+        masked = []
+        for key in task.indexes:
+            parts = [
+                pipeline.add(
+                    f"aois/{shard_name(key, tile)}",
+                    stages.mask_aois,
+                    inputs=[merged[key][tile], *detected_clouds],
+                    aois=_aois_params(tile_aois),
+                    index=key,
+                    **aois_params,
+                )
+                for tile, tile_aois in inside.items()
+                if tile_aois or tile is None
+            ]
+            if straddling:
+                parts.append(
+                    pipeline.add(
+                        f"aois/{key}.straddling",
+                        stages.mask_straddling_aois,
+                        inputs=[*merged[key].values(), *detected_clouds],
+                        tiles=len(merged[key]),
+                        aois=_aois_params(straddling),
+                        index=key,
+                        **aois_params,
+                    )
+                )
+            if task.output.sharded:
+                parts = [
+                    pipeline.add(f"aois/{key}", stages.gather_masked, inputs=parts)
+                ]
+            masked.extend(parts)
+
+        # add produced TIF files to DB
+        pipeline.add(
+            "register",
+            stages.register_files,
+            inputs=masked,
+            indexes=task.indexes,
+            date=timestamp.isoformat(),
+        )
+
+    else:
+        aoi = Path.cwd().joinpath(task.output.shapefile)
+        output_folder = Path.cwd().joinpath("data", "final", suffix)
+        final = [
+            pipeline.add(
+                f"aoiMasked/{key}",
+                stages.mask_with_shapefile,
+                inputs=[merged[key][None]],
+                shapefile=aoi,
+                mask_name="aoi",
+                invert=False,
+                output_folder=output_folder,
+            )
+            for key in task.indexes
+        ]
+
+        # add final rasters to DB, for statistics of any polygon
+        if task.output.register_in_db:
+            pipeline.add(
+                "registerProducts",
+                stages.register_products,
+                inputs=final,
+                indexes=task.indexes,
+                date=timestamp.isoformat(),
+            )
+
+        # ------------------------------------------------------------------------------------ create SHP with clouds
+        if task.output.clouds:
+            pipeline.add(
+                "clouds_aoiClipped",
+                stages.clip_clouds,
+                inputs=[detected_clouds[0]],
+                aoi=aoi,
+                output_file=output_folder.joinpath(f"clouds_{suffix}"),
+            )
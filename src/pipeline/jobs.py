@@ -0,0 +1,128 @@
+"""
+Background jobs queued in drought.jobs by the API and run by workers
+started with tools.process_jobs.
+"""
+import threading
+import traceback
+from collections import defaultdict
+from datetime import date, datetime
+from pathlib import Path
+from typing import Callable, Dict, Final, List
+
+import geopandas
+
+from settings import JOBS_HEARTBEAT_SECONDS, JOBS_RETRY_SECONDS
+from src.db_client.db_client import DBClient
+from src.db_client.models.jobs import Job
+from src.pipeline.distributed import task_finish, task_index, task_product
+from src.pipeline.engine import covers_region, process_products
+from src.pipeline.models.tasks import Output, Region, TaskDefinition
+
+
+def product_time(folder: Path) -> datetime:
+    """
+    Sensing time from the name of the product,
+    e.g. S2A_MSIL2A_20230409T094031_N0509_R036_T34UDA_20230409T140117.SAFE
+    """
+    return datetime.strptime(folder.name.split("_")[2], "%Y%m%dT%H%M%S")
+
+
+def downloaded_products(
+    folder: Path, date_from: date, date_to: date
+) -> Dict[date, List[Path]]:
+    """
+    Products already downloaded to the folder, sensed in the date range, by date.
+    """
+    products = defaultdict(list)
+    for product in sorted(folder.glob("S2*_MSIL2A_*")):
+        if product.is_dir() and date_from <= product_time(product).date() <= date_to:
+            products[product_time(product).date()].append(product)
+    return dict(sorted(products.items()))
+
+
+def aoi_history(job: Job) -> dict:
+    """
+    Calculates indexes for one AOI from products downloaded in the date range,
+    reading only the window of the AOI from their bands.
+    Params: geom_id, indexes, from and to as ISO dates.
+    """
+    db = DBClient()
+    aoi = db.get_aoi(job.params["geom_id"])
+    if aoi is None:
+        raise ValueError(f"No AOI {job.params['geom_id']}")
+    region = (
+        geopandas.GeoSeries([aoi.geometry], crs=f"EPSG:{aoi.epsg}")
+        .to_crs("EPSG:4326")
+        .iloc[0]
+    )
+    task = TaskDefinition(
+        name=f"job{job.job_id}",
+        region=Region(polygon=list(region.convex_hull.exterior.coords)),
+        indexes=job.params["indexes"],
+        output=Output(layout="aois"),
+    )
+
+    dates = []
+    inserted = 0
+    products = downloaded_products(
+        Path.cwd().joinpath("data", "download"),
+        date.fromisoformat(job.params["from"]),
+        date.fromisoformat(job.params["to"]),
+    )
+    for day, folders in products.items():
+        covering = [folder for folder in folders if covers_region(folder, region)]
+        if not covering:
+            continue
+        print(f"Processing AOI {aoi.geom_id} for {day} from {len(covering)} products")
+        results = process_products(
+            task,
+            covering,
+            min(product_time(folder) for folder in covering),
+            aois=[aoi],
+            clip_to=region,
+        )
+        dates.append(day.isoformat())
+        inserted += results["register"]
+
+    return {"geom_id": aoi.geom_id, "dates": dates, "inserted_files": inserted}
+
+
+# job kind: function calculating the result of the job
+JOBS: Final[Dict[str, Callable[[Job], dict]]] = {
+    "aoi_history": aoi_history,
+    "task_product": task_product,
+    "task_index": task_index,
+    "task_finish": task_finish,
+}
+
+
+def _send_heartbeats(job: Job, db: DBClient, done: threading.Event) -> None:
+    while not done.wait(JOBS_HEARTBEAT_SECONDS):
+        if not db.heartbeat(job):
+            print(f"Job {job.job_id} was queued again by another worker")
+            return
+
+
+def run_job(job: Job, db: DBClient) -> bool:
+    """
+    Runs the claimed job and saves its result or error, returns if it succeeded.
+    While it runs, heartbeats keep other workers from queueing it again.
+    """
+    print(f"Running job {job.job_id} ({job.kind}), attempt {job.attempts}")
+    done = threading.Event()
+    heartbeats = threading.Thread(
+        target=_send_heartbeats, args=(job, db, done), daemon=True
+    )
+    heartbeats.start()
+    try:
+        result = JOBS[job.kind](job)
+    except Exception as error:
+        traceback.print_exc()
+        db.fail_job(job, f"{type(error).__name__}: {error}", JOBS_RETRY_SECONDS)
+        return False
+    finally:
+        done.set()
+        heartbeats.join()
+    db.finish_job(job, result)
+    print(f"Finished job {job.job_id}")
+    return True
@@ -0,0 +1,120 @@
+from pathlib import Path
+from typing import List, Optional
+
+import geopandas
+import yaml
+from pydantic import BaseModel, Field, root_validator, validator
+from shapely.geometry import Polygon
+
+from src.imagery_processing.indexes import INDEXES
+
+
+class Region(BaseModel):
+    """
+    Area for which Sentinel-2 products are searched,
+    given as a polygon in EPSG:4326 or a shapefile.
+    """
+
+    polygon: Optional[List[List[float]]] = None
+    shapefile: Optional[Path] = None
+    # search only for products containing the whole region
+    inside_image: bool = False
+    # process only the window of the region from bands of products,
+    # products outside of the region are skipped, the aois layout
+    # extends the window to bounds of all AOIs
+    clip: bool = False
+
+    @root_validator(skip_on_failure=True)
+    def polygon_or_shapefile(cls, values):
+        if (values["polygon"] is None) == (values["shapefile"] is None):
+            raise ValueError("Region needs either polygon or shapefile")
+        return values
+
+    def geometry(self) -> Polygon:
+        if self.polygon is not None:
+            return Polygon(self.polygon)
+        shapes = geopandas.read_file(Path.cwd().joinpath(self.shapefile))
+        return shapes.to_crs("EPSG:4326").unary_union.convex_hull
+
+
+class Mask(BaseModel):
+    """
+    Masking of merged indexes, with shapes from a shapefile or with detected clouds.
+    """
+
+    name: str
+    shapefile: Optional[Path] = None
+    clouds: bool = False
+    # by default values inside shapes are removed
+    invert: bool = True
+    # by default all indexes of the task are masked
+    indexes: Optional[List[str]] = None
+
+    @root_validator(skip_on_failure=True)
+    def shapefile_or_clouds(cls, values):
+        if (values["shapefile"] is None) == (not values["clouds"]):
+            raise ValueError(f"Mask {values['name']} needs either shapefile or clouds")
+        return values
+
+
+class Output(BaseModel):
+    """
+    Layout of final products:
+    - aois: masked with every AOI from DB, saved to data/final/order_id/geom_id/epoch
+      and registered in DB,
+    - region: masked with the shapefile, saved to data/final/epoch_date.
+    """
+
+    layout: str
+    shapefile: Optional[Path] = None
+    # save detected clouds clipped to the shapefile next to the products
+    clouds: bool = False
+    # register regional products and detected clouds in DB for the API,
+    # register is a method of pydantic models, so the field has an alias
+    register_in_db: bool = Field(False, alias="register")
+    # aois layout only: merge and mask products of every MGRS tile separately,
+    # AOIs on borders of tiles are masked with windows merged from their tiles
+    sharded: bool = False
+
+    @validator("layout")
+    def known_layout(cls, layout):
+        if layout not in ["aois", "region"]:
+            raise ValueError(f"Unknown output layout {layout}")
+        return layout
+
+    @root_validator(skip_on_failure=True)
+    def region_needs_shapefile(cls, values):
+        if values["layout"] == "region" and values["shapefile"] is None:
+            raise ValueError("Output with region layout needs shapefile")
+        if values["layout"] != "aois" and values["sharded"]:
+            raise ValueError("Only output with aois layout can be sharded")
+        return values
+
+
+class TaskDefinition(BaseModel):
+    name: str
+    region: Region
+    indexes: List[str]
+    masks: List[Mask] = []
+    output: Output
+
+    @validator("indexes", each_item=True)
+    def known_index(cls, index):
+        if index not in INDEXES:
+            raise ValueError(f"Unknown index {index}")
+        return index
+
+    @validator("masks", each_item=True)
+    def masks_known_indexes(cls, mask, values):
+        for index in mask.indexes or []:
+            if index not in values.get("indexes", []):
+                raise ValueError(f"Mask {mask.name} uses index {index} not in the task")
+        return mask
+
+    @classmethod
+    def from_file(cls, file: Path) -> "TaskDefinition":
+        with open(file, "r", encoding="utf-8") as definition:
+            return cls(name=file.stem, **yaml.safe_load(definition))
+
+    def uses_clouds(self) -> bool:
+        return self.output.clouds or any(mask.clouds for mask in self.masks)
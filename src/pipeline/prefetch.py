@@ -0,0 +1,156 @@
+"""
+Downloads of products in a separate process, so products are processed while
+next ones are downloaded. The downloader changes the working directory,
+so it can not run in a thread of the process running the pipeline.
+"""
+import multiprocessing
+import shutil
+import time
+from pathlib import Path
+from queue import Empty
+from typing import Iterator
+
+import pandas
+import psutil
+
+from settings import (
+    DOWNLOAD_MIN_FREE_GB,
+    PIPELINE_MIN_FREE_MEMORY_GB,
+    PIPELINE_PREFETCH_GB,
+    PIPELINE_PREFETCH_PRODUCTS,
+)
+from src.imagery_processing import metrics
+from src.imagery_processing.sentinel_api import data_download_2A
+
+UNITS = {"KB": 2**10, "MB": 2**20, "GB": 2**30, "TB": 2**40}
+
+
+def product_bytes(size: str) -> int:
+    """
+    Size of the product from the size field of Open Access Hub, e.g. 1.07 GB,
+    0 if it is not known.
+    """
+    try:
+        value, unit = str(size).split()
+        return int(float(value) * UNITS[unit.upper()])
+    except (KeyError, ValueError):
+        return 0
+
+
+def _outstanding_bytes(outstanding) -> int:
+    with outstanding.get_lock():
+        return outstanding.value
+
+
+def _add_outstanding(outstanding, nbytes: int) -> None:
+    with outstanding.get_lock():
+        outstanding.value += nbytes
+
+
+def _wait_for_resources(
+    folder: Path,
+    nbytes: int,
+    outstanding,
+    budget_gb: float,
+    min_free_gb: float,
+    min_memory_gb: float,
+) -> None:
+    """
+    Waits until products downloaded but not yet processed take less than the
+    budget with the next download, and processed products deleted by the
+    pipeline free disk and memory for it. Fails if disk space is still low
+    when no product is waiting for processing.
+    """
+    while True:
+        waiting = _outstanding_bytes(outstanding)
+        if not waiting:
+            break
+        if (
+            waiting + nbytes <= budget_gb * 2**30
+            and shutil.disk_usage(folder).free - nbytes >= min_free_gb * 2**30
+            and psutil.virtual_memory().available >= min_memory_gb * 2**30
+        ):
+            break
+        print("    Waiting for processing of downloaded products")
+        time.sleep(5)
+
+    if shutil.disk_usage(folder).free - nbytes < min_free_gb * 2**30:
+        raise OSError(f"Not enough disk space in {folder} to download {nbytes} bytes")
+
+
+def _download_products(
+    folder: Path,
+    products_df: pandas.DataFrame,
+    queue,
+    outstanding,
+    budget_gb: float,
+    min_free_gb: float,
+    min_memory_gb: float,
+) -> None:
+    metrics.start_child()
+    for _, product in products_df.iterrows():
+        nbytes = product_bytes(product.get("size"))
+        _wait_for_resources(
+            folder, nbytes, outstanding, budget_gb, min_free_gb, min_memory_gb
+        )
+        # counted until the product is processed
+        _add_outstanding(outstanding, nbytes)
+        data_download_2A(folder, products_df.loc[[product.name]])
+        # blocks while PIPELINE_PREFETCH_PRODUCTS products are waiting,
+        # measurements of the download are saved by the parent
+        queue.put(
+            (folder.joinpath(product["filename"]), nbytes, metrics.collect_records())
+        )
+    queue.put(None)
+
+
+def prefetched_downloads(
+    folder: Path,
+    products_df: pandas.DataFrame,
+    prefetch: int = PIPELINE_PREFETCH_PRODUCTS,
+    budget_gb: float = PIPELINE_PREFETCH_GB,
+    min_free_gb: float = DOWNLOAD_MIN_FREE_GB,
+    min_memory_gb: float = PIPELINE_MIN_FREE_MEMORY_GB,
+) -> Iterator[Path]:
+    """
+    Yields folders of products as they are downloaded, in order of products_df.
+    At most prefetch downloaded products wait until they are taken, and products
+    are not downloaded while the ones not processed yet, taken when the next one
+    is asked for, would take more than budget_gb or too little memory is free.
+    """
+    queue = multiprocessing.Queue(maxsize=prefetch)
+    outstanding = multiprocessing.Value("q", 0)
+    downloader = multiprocessing.Process(
+        target=_download_products,
+        args=(
+            folder,
+            products_df,
+            queue,
+            outstanding,
+            budget_gb,
+            min_free_gb,
+            min_memory_gb,
+        ),
+        daemon=True,
+    )
+    downloader.start()
+    try:
+        while True:
+            try:
+                item = queue.get(timeout=1)
+            except Empty:
+                if not downloader.is_alive() and queue.empty():
+                    raise RuntimeError(
+                        f"Downloading products failed, exit code {downloader.exitcode}"
+                    )
+                continue
+            if item is None:
+                return
+            product, nbytes, records = item
+            metrics.add_records(records)
+            yield product
+            _add_outstanding(outstanding, -nbytes)
+    finally:
+        if downloader.is_alive():
+            downloader.terminate()
+        downloader.join()
@@ -0,0 +1,377 @@
+"""
+Stages of the imagery pipeline, wrapping functions from src.imagery_processing.
+Each stage gets storage for its rasters as the first argument, then results
+of its input stages and parameters.
+"""
+import math
+from pathlib import Path
+from typing import Dict, Iterable, List, Union
+
+import geopandas
+import pandas
+import rasterio
+from shapely import wkt
+from shapely.geometry import box
+
+from src.imagery_processing.get_bands import bands_2A
+from src.imagery_processing.clip import clip_bands, clip_windows
+from src.imagery_processing.indexes import INDEXES
+from src.imagery_processing.detect_clouds import detect_clouds
+from src.imagery_processing.reproject import epsg3857
+from src.imagery_processing.merge import merge_bounds, merge_rasters
+from src.imagery_processing.mask import masking, masking_aoi
+from src.imagery_processing.storage import (
+    IntermediateStorage,
+    add_overviews,
+    raster_nbytes,
+)
+from src.imagery_processing.writer import RasterWriter, raster_checksum
+from src.db_client.db_client import DBClient, FilesBuffer
+from src.db_client.models.aois import AOI
+from src.db_client.models.clouds import Clouds
+from src.db_client.models.files import File
+from src.db_client.models.products import Product
+from src.db_client.models.stats import Stats
+
+
+def locate_bands(storage: IntermediateStorage, folder: Path, fingerprint: str) -> dict:
+    return bands_2A(folder)
+
+
+def clip_to_region(
+    storage: IntermediateStorage, bands: dict, product: str, region: str
+) -> dict:
+    """
+    Bands clipped to the window of the region given as WKT in EPSG:4326.
+    """
+    windows = clip_windows(bands, wkt.loads(region))
+    # bands and cloud masks have at most 2 bytes per pixel
+    output_folder = storage.folder(
+        sum(2 * window.width * window.height for window in windows.values())
+    )
+    return clip_bands(product, bands, windows, output_folder)
+
+
+def calculate_indexes(
+    storage: IntermediateStorage, bands: dict, product: str, indexes: List[str]
+) -> Dict[str, Path]:
+    # none of the indexes is bigger than one 10m band in float32
+    output_folder = storage.folder(len(indexes) * raster_nbytes(bands["b03_10m"]))
+
+    calculated = {}
+    # an index is compressed and written while the next one is calculated
+    with RasterWriter():
+        for key in indexes:
+            index, index_bands = INDEXES[key]
+            calculated[key] = index(
+                product, *[bands[band] for band in index_bands], output_folder
+            )
+    return calculated
+
+
+def find_clouds(
+    storage: IntermediateStorage, bands: dict, product: str, output_folder: Path
+) -> Path:
+    output_folder.mkdir(parents=True, exist_ok=True)
+    return detect_clouds(
+        product, bands["cloud_classif"], bands["cloud_prob"], output_folder
+    )
+
+
+def reproject_indexes(
+    storage: IntermediateStorage, indexes: Dict[str, Path]
+) -> Dict[str, Path]:
+    return {
+        key: epsg3857(layer, storage.folder(raster_nbytes(layer)))
+        for key, layer in indexes.items()
+    }
+
+
+def merge_index(
+    storage: IntermediateStorage,
+    *reprojected: Dict[str, Path],
+    index: str,
+    output_name: str,
+) -> Path:
+    layers = [product[index] for product in reprojected]
+    return merge_rasters(
+        output_name,
+        layers,
+        storage.folder(sum(raster_nbytes(layer) for layer in layers)),
+    )
+
+
+def mask_with_shapefile(
+    storage: IntermediateStorage,
+    layer: Union[Path, None],
+    shapefile: Path,
+    mask_name: str,
+    invert: bool = False,
+    output_folder: Union[Path, None] = None,
+) -> Union[Path, None]:
+    """
+    Masks layer with shapes from the file, result is saved in output_folder
+    with overviews if given, otherwise it is an intermediate raster.
+    """
+    if layer is None:
+        return None
+    final = output_folder is not None
+    if final:
+        output_folder.mkdir(parents=True, exist_ok=True)
+    else:
+        output_folder = storage.folder(raster_nbytes(layer))
+
+    masked = masking(
+        layer=layer,
+        mask_name=mask_name,
+        masking_geom=geopandas.read_file(shapefile).geometry,
+        output_folder=output_folder,
+        invert=invert,
+    )
+    if final and masked is not None:
+        add_overviews(masked)
+    return masked
+
+
+def _clouds_union(clouds: Iterable[Path]):
+    clouds = list(clouds)
+    if not clouds:
+        return None
+    return pandas.concat(
+        [geopandas.read_file(shapes).geometry for shapes in clouds]
+    ).unary_union
+
+
+def _mask_aoi(
+    layer: Path,
+    aoi: AOI,
+    clouds_union,
+    epoch: int,
+    output_folder: Path,
+    index: str,
+) -> dict:
+    aoi_folder = output_folder.joinpath(str(aoi.order_id), str(aoi.geom_id), str(epoch))
+    aoi_folder.mkdir(parents=True, exist_ok=True)
+    cloud_fraction = None
+    if clouds_union is not None and aoi.geometry.area:
+        cloud_fraction = (
+            aoi.geometry.intersection(clouds_union).area / aoi.geometry.area
+        )
+
+    statistics = {}
+    layer_file = masking_aoi(
+        layer=layer,
+        masking_geom=aoi,
+        epoch=str(epoch),
+        output_folder=aoi_folder,
+        statistics=statistics,
+        index=index,
+        cloud_fraction=cloud_fraction,
+        overviews=True,
+        checksum=True,
+    )
+    return {
+        "order_id": aoi.order_id,
+        "geom_id": aoi.geom_id,
+        "path": layer_file,
+        "statistics": statistics,
+    }
+
+
+def _with_checksums(masked: List[dict]) -> List[dict]:
+    # checksums are computed by the writer, so all files have to be written
+    for file in masked:
+        file["checksum"] = raster_checksum(file["path"]) if file["path"] else None
+    return masked
+
+
+def mask_aois(
+    storage: IntermediateStorage,
+    layer: Union[Path, None],
+    *clouds: Path,
+    aois: List[dict],
+    epoch: int,
+    output_folder: Path,
+    index: str,
+) -> List[dict]:
+    """
+    Masks layer with every AOI, results are saved with overviews in
+    output_folder/order_id/geom_id/epoch, with statistics of the index inside
+    the AOI and the fraction of the AOI covered by clouds, if they were detected.
+    """
+    if layer is None:
+        return []
+
+    clouds_union = _clouds_union(clouds)
+    # files of AOIs are written while next AOIs are masked
+    with RasterWriter():
+        masked = [
+            _mask_aoi(layer, AOI(**aoi), clouds_union, epoch, output_folder, index)
+            for aoi in aois
+        ]
+    return _with_checksums(masked)
+
+
+def mask_straddling_aois(
+    storage: IntermediateStorage,
+    *layers_and_clouds: Union[Path, None],
+    tiles: int,
+    aois: List[dict],
+    epoch: int,
+    output_folder: Path,
+    index: str,
+) -> List[dict]:
+    """
+    As mask_aois for AOIs on borders of tiles, inputs are layers of tiles
+    followed by clouds. Windows of the AOI are merged from tiles it touches.
+    """
+    layers = [layer for layer in layers_and_clouds[:tiles] if layer is not None]
+    if not layers:
+        return []
+    clouds_union = _clouds_union(layers_and_clouds[tiles:])
+    bounds = {}
+    for layer in layers:
+        with rasterio.open(layer) as src:
+            bounds[layer] = src.bounds
+    # merge of whole tiles has pixels of the first tile
+    with rasterio.open(layers[0]) as src:
+        x_res, y_res = src.res
+    # windows are aligned to the grid of the merge of whole tiles,
+    # so pixels are the same as in tasks which are not sharded
+    origin_x = min(layer_bounds.left for layer_bounds in bounds.values())
+    origin_y = max(layer_bounds.top for layer_bounds in bounds.values())
+
+    masked = []
+    # files of AOIs are written while next AOIs are merged and masked
+    with RasterWriter():
+        for aoi in aois:
+            aoi = AOI(**aoi)
+            touched = [
+                layer
+                for layer in layers
+                if box(*bounds[layer]).intersects(aoi.geometry)
+            ]
+            if not touched:
+                continue
+            # one more pixel on every side, as pixels touching the AOI are kept
+            left, bottom, right, top = aoi.geometry.bounds
+            left = origin_x + (math.floor((left - origin_x) / x_res) - 1) * x_res
+            right = origin_x + (math.ceil((right - origin_x) / x_res) + 1) * x_res
+            top = origin_y - (math.floor((origin_y - top) / y_res) - 1) * y_res
+            bottom = origin_y - (math.ceil((origin_y - bottom) / y_res) + 1) * y_res
+            nbytes = 4 * round((right - left) / x_res) * round((top - bottom) / y_res)
+            merged = merge_bounds(
+                touched,
+                (left, bottom, right, top),
+                (x_res, y_res),
+                storage.folder(nbytes),
+            )
+            masked.append(
+                _mask_aoi(merged, aoi, clouds_union, epoch, output_folder, index)
+            )
+            storage.delete([merged])
+    return _with_checksums(masked)
+
+
+def gather_masked(storage: IntermediateStorage, *masked: List[dict]) -> List[dict]:
+    """
+    Results of mask_aois of all tiles of an index, as one list.
+    """
+    return [file for files in masked for file in files]
+
+
+def _product(
+    layer: Path, index: str, date: str, order_id: Union[int, None] = None
+) -> Product:
+    with rasterio.open(layer) as src:
+        footprint = box(*src.bounds)
+    return Product(
+        order_id=order_id, wq_index=index, date=date, path=layer, footprint=footprint
+    )
+
+
+def register_files(
+    storage: IntermediateStorage, *masked: List[dict], indexes: List[str], date: str
+) -> int:
+    """
+    Adds produced TIF files and statistics of AOIs to DB,
+    masked are results of mask_aois in order of indexes.
+    """
+    stats = []
+    products = []
+    with FilesBuffer() as files_buffer:
+        for key, files in zip(indexes, masked):
+            for file in files:
+                # AOIs with no valid pixels have statistics, but no file
+                if file["path"]:
+                    files_buffer.add(
+                        File(
+                            order_id=file["order_id"],
+                            geom_id=file["geom_id"],
+                            path=file["path"],
+                            wq_index=key,
+                            file_extension="TIF",
+                            date=date,
+                            checksum=file.get("checksum"),
+                        )
+                    )
+                    products.append(_product(file["path"], key, date, file["order_id"]))
+                stats.append(
+                    Stats(
+                        order_id=file["order_id"],
+                        geom_id=file["geom_id"],
+                        wq_index=key,
+                        date=date,
+                        **file["statistics"],
+                    )
+                )
+    files_buffer.db.insert_stats(stats)
+    files_buffer.db.insert_products(products)
+    return files_buffer.inserted
+
+
+def register_products(
+    storage: IntermediateStorage,
+    *layers: Union[Path, None],
+    indexes: List[str],
+    date: str,
+) -> int:
+    """
+    Adds final regional rasters to DB, layers are in order of indexes.
+    """
+    products = [
+        _product(layer, key, date)
+        for key, layer in zip(indexes, layers)
+        if layer is not None
+    ]
+    DBClient().insert_products(products)
+    return len(products)
+
+
+def register_clouds(
+    storage: IntermediateStorage, *clouds: Path, products: List[str], date: str
+) -> int:
+    """
+    Adds polygons of detected clouds to DB, clouds are in order of products.
+    """
+    detected = []
+    for product, shapes in zip(products, clouds):
+        polygons = geopandas.read_file(shapes).geometry.explode(index_parts=False)
+        detected.append(
+            Clouds(
+                product=product,
+                date=date,
+                polygons=[polygon for polygon in polygons if not polygon.is_empty],
+            )
+        )
+    DBClient().insert_clouds(detected)
+    return sum(len(clouds.polygons) for clouds in detected)
+
+
+def clip_clouds(
+    storage: IntermediateStorage, clouds: Path, aoi: Path, output_file: Path
+) -> Path:
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    clouds_aoiClipped = geopandas.read_file(clouds).clip(geopandas.read_file(aoi))
+    clouds_aoiClipped.to_file(output_file)
+    return output_file
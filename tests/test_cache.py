@@ -0,0 +1,36 @@
+from src.api.internal.cache import LRUCache
+
+
+def test_least_recently_used_items_are_removed():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_expired_items_are_not_returned():
+    cache = LRUCache(2, ttl=-1)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+
+
+def test_invalidate_matching_keys():
+    cache = LRUCache(3)
+    for key in ["a", "b", "c"]:
+        cache.put(key, key)
+    assert cache.invalidate(lambda key: key != "a") == 2
+    assert cache.get("a") == "a" and cache.get("b") is None
+    assert cache.invalidate() == 1
+
+
+def test_results_of_queries_started_before_invalidation_are_dropped():
+    cache = LRUCache(2)
+    generation = cache.generation
+    cache.invalidate()
+    cache.put("a", "stale", generation)
+    assert cache.get("a") is None
+    cache.put("a", "fresh", cache.generation)
+    assert cache.get("a") == "fresh"
@@ -0,0 +1,58 @@
+import os
+
+from src.pipeline import dag, models
+from src.pipeline.dag import Stage, fingerprint
+
+
+def _stage_function(storage, value):
+    return value
+
+
+def _stage(name="stage", params=None) -> Stage:
+    return Stage(name, _stage_function, [], params or {"value": 1}, [], cache=True)
+
+
+def test_key_is_stable():
+    assert _stage().key(["input"]) == _stage().key(["input"])
+    assert len(_stage().key([])) == 16
+
+
+def test_key_ignores_order_of_params():
+    first = _stage(params={"a": 1, "b": 2})
+    second = _stage(params={"b": 2, "a": 1})
+    assert first.key([]) == second.key([])
+
+
+def test_key_changes_with_name_params_and_inputs():
+    key = _stage().key(["input"])
+    assert _stage(name="other").key(["input"]) != key
+    assert _stage(params={"value": 2}).key(["input"]) != key
+    assert _stage().key(["other"]) != key
+    assert _stage().key(["input", "other"]) != key
+
+
+def test_code_version_includes_modules_of_packages():
+    stage = Stage("stage", _stage_function, [], {}, [models], cache=True)
+    assert stage.code_version() != _stage().code_version()
+    source = dag._source(models)
+    with open(models.tasks.__file__) as tasks:
+        assert tasks.read() in source
+
+
+def test_fingerprint_ignores_modification_times(tmp_path):
+    tmp_path.joinpath("B04.jp2").write_bytes(b"band")
+    tmp_path.joinpath("GRANULE").mkdir()
+    tmp_path.joinpath("GRANULE", "B08.jp2").write_bytes(b"other band")
+    before = fingerprint(tmp_path)
+    os.utime(tmp_path.joinpath("B04.jp2"), (0, 0))
+    assert fingerprint(tmp_path) == before
+
+
+def test_fingerprint_changes_with_names_and_sizes(tmp_path):
+    tmp_path.joinpath("B04.jp2").write_bytes(b"band")
+    before = fingerprint(tmp_path)
+    tmp_path.joinpath("B04.jp2").write_bytes(b"longer band")
+    resized = fingerprint(tmp_path)
+    assert resized != before
+    tmp_path.joinpath("B04.jp2").rename(tmp_path.joinpath("B03.jp2"))
+    assert fingerprint(tmp_path) != resized
@@ -0,0 +1,30 @@
+from src.api.internal.encoding import compress, etag, etag_matches
+
+
+def test_etag_is_weak_and_depends_on_body():
+    assert etag(b"body").startswith('W/"')
+    assert etag(b"body") == etag(b"body")
+    assert etag(b"body") != etag(b"other body")
+
+
+def test_etag_matches_weakly():
+    tag = etag(b"body")
+    assert etag_matches(tag, tag)
+    assert etag_matches(tag[2:], tag)
+    assert etag_matches(f'"other", {tag}', tag)
+    assert etag_matches("*", tag)
+
+
+def test_etag_does_not_match_other_tags():
+    tag = etag(b"body")
+    assert not etag_matches("", tag)
+    assert not etag_matches(etag(b"other body"), tag)
+
+
+def test_compress_only_accepted_and_big_bodies():
+    body = b"x" * 4096
+    compressed, headers = compress(body, "deflate, GZIP")
+    assert len(compressed) < len(body)
+    assert headers["Content-Encoding"] == "gzip"
+    assert compress(body, "deflate") == (body, {"Vary": "Accept-Encoding"})
+    assert compress(b"x", "gzip")[0] == b"x"
@@ -0,0 +1,33 @@
+from shapely.geometry import box
+
+from src.db_client.models.aois import AOI
+from src.imagery_processing.mgrs import mgrs_tile, shard_aois
+
+
+def _aoi(geom_id: int, *bounds: float) -> AOI:
+    return AOI(geom_id=geom_id, order_id=1, geometry=box(*bounds), epsg=3857)
+
+
+def test_mgrs_tile():
+    product = "S2A_MSIL2A_20230409T094031_N0509_R036_T34UDA_20230409T140117.SAFE"
+    assert mgrs_tile(product) == "T34UDA"
+
+
+def test_shard_aois():
+    footprints = {"T34UDA": box(0, 0, 10, 10), "T34UDB": box(8, 0, 20, 10)}
+    inside_first = _aoi(1, 1, 1, 2, 2)
+    overlap = _aoi(2, 8.5, 1, 9.5, 2)
+    inside_second = _aoi(3, 15, 1, 16, 2)
+    straddling = _aoi(4, 5, 5, 15, 15)
+    inside, straddles = shard_aois(
+        [inside_first, overlap, inside_second, straddling], footprints
+    )
+    # the first tile in order of footprints is used where tiles overlap
+    assert [aoi.geom_id for aoi in inside["T34UDA"]] == [1, 2]
+    assert [aoi.geom_id for aoi in inside["T34UDB"]] == [3]
+    assert [aoi.geom_id for aoi in straddles] == [4]
+
+
+def test_shard_aois_without_footprints():
+    aoi = _aoi(1, 0, 0, 1, 1)
+    assert shard_aois([aoi], {}) == ({}, [aoi])
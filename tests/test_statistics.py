@@ -0,0 +1,43 @@
+import numpy as np
+
+from src.imagery_processing.statistics import (
+    HISTOGRAM_BINS,
+    PERCENTILES,
+    zonal_statistics,
+)
+
+
+def test_zonal_statistics():
+    values = np.array([[0.1, 0.2, np.nan], [0.3, 0.4, np.nan]], dtype="float32")
+    statistics = zonal_statistics(values, "ndvi", cloud_fraction=0.5)
+    assert statistics["total_pixels"] == 6
+    assert statistics["valid_pixels"] == 4
+    assert np.isclose(statistics["valid_fraction"], 4 / 6)
+    assert statistics["cloud_fraction"] == 0.5
+    assert np.isclose(statistics["mean"], 0.25)
+    assert np.isclose(statistics["median"], 0.25)
+    assert np.isclose(statistics["min"], 0.1)
+    assert np.isclose(statistics["max"], 0.4)
+    assert all(f"p{percentile}" in statistics for percentile in PERCENTILES)
+
+
+def test_histogram_of_drought_indexes_has_fixed_range():
+    statistics = zonal_statistics(np.array([0.5, 0.5]), "ndvi")
+    histogram = statistics["histogram"]
+    assert histogram["edges"][0] == -1.0 and histogram["edges"][-1] == 1.0
+    assert len(histogram["counts"]) == HISTOGRAM_BINS
+    assert sum(histogram["counts"]) == 2
+
+
+def test_histogram_of_other_indexes_has_range_of_values():
+    statistics = zonal_statistics(np.array([2.0, 4.0]), "turb")
+    edges = statistics["histogram"]["edges"]
+    assert (edges[0], edges[-1]) == (2.0, 4.0)
+
+
+def test_statistics_without_valid_pixels():
+    statistics = zonal_statistics(np.full((2, 2), np.nan), "ndvi")
+    assert statistics["valid_pixels"] == 0
+    assert statistics["valid_fraction"] == 0.0
+    assert statistics["mean"] is None and statistics["histogram"] is None
+    assert zonal_statistics(np.array([]), "ndvi")["valid_fraction"] == 0.0
@@ -0,0 +1,58 @@
+from pathlib import Path
+
+import pytest
+from pydantic import ValidationError
+
+from src.pipeline.models.tasks import TaskDefinition
+
+POLYGON = [[19.0, 50.0], [20.0, 50.0], [20.0, 49.0], [19.0, 50.0]]
+
+
+def _task(**definition) -> TaskDefinition:
+    return TaskDefinition(
+        **{
+            "name": "task",
+            "region": {"polygon": POLYGON},
+            "indexes": ["ndvi", "turb"],
+            "output": {"layout": "aois"},
+            **definition,
+        }
+    )
+
+
+def test_task_of_the_repository():
+    task = TaskDefinition.from_file(
+        Path(__file__).parents[1].joinpath("tools/process_new_imagery/tasks/task.yml")
+    )
+    assert task.name == "task"
+    assert task.region.clip
+    assert task.output.layout == "aois"
+
+
+def test_valid_task():
+    task = _task(
+        masks=[{"name": "clouds", "clouds": True, "indexes": ["ndvi"]}],
+        output={"layout": "aois", "sharded": True, "register": True},
+    )
+    assert task.uses_clouds()
+    assert task.output.register_in_db
+    assert not _task().uses_clouds()
+
+
+@pytest.mark.parametrize(
+    "definition",
+    [
+        {"region": {}},
+        {"region": {"polygon": POLYGON, "shapefile": "region.shp"}},
+        {"indexes": ["ndvi", "unknown"]},
+        {"masks": [{"name": "mask"}]},
+        {"masks": [{"name": "mask", "shapefile": "mask.shp", "clouds": True}]},
+        {"masks": [{"name": "mask", "clouds": True, "indexes": ["ndmi"]}]},
+        {"output": {"layout": "unknown"}},
+        {"output": {"layout": "region"}},
+        {"output": {"layout": "region", "shapefile": "region.shp", "sharded": True}},
+    ],
+)
+def test_invalid_task(definition):
+    with pytest.raises(ValidationError):
+        _task(**definition)
@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.api.internal.tiles import (
+    COLORS,
+    ORIGIN_SHIFT,
+    _classify,
+    is_valid_tile,
+    tile_bounds,
+    value_range,
+)
+
+
+def test_classes_split_the_range_evenly():
+    data = np.array([[-1.0, -0.5, 0.0, 0.5, 1.0]])
+    rgba = _classify(data, -1.0, 1.0)
+    assert rgba.shape == (1, 5, 4)
+    expected = COLORS[[0, 1, 2, 3, 4]]
+    assert (rgba[0] == expected).all()
+
+
+def test_values_out_of_range_get_extreme_classes():
+    rgba = _classify(np.array([[-5.0, 5.0]]), -1.0, 1.0)
+    assert (rgba[0, 0] == COLORS[0]).all()
+    assert (rgba[0, 1] == COLORS[-1]).all()
+
+
+def test_invalid_values_are_transparent():
+    rgba = _classify(np.array([[np.nan, np.inf, 0.0]]), -1.0, 1.0)
+    assert (rgba[0, :2] == 0).all()
+    assert rgba[0, 2, 3] == 255
+
+
+def test_constant_range_does_not_divide_by_zero():
+    rgba = _classify(np.array([[0.3, 0.3]]), 0.3, 0.3)
+    assert (rgba[0] == COLORS[0]).all()
+
+
+def test_drought_indexes_have_fixed_range():
+    assert value_range("missing.tif", "ndvi") == (-1.0, 1.0)
+
+
+def test_tile_bounds():
+    assert tile_bounds(0, 0, 0) == (
+        -ORIGIN_SHIFT,
+        -ORIGIN_SHIFT,
+        ORIGIN_SHIFT,
+        ORIGIN_SHIFT,
+    )
+    left, bottom, right, top = tile_bounds(1, 1, 1)
+    assert (left, top) == (0, 0)
+    assert np.isclose(right, ORIGIN_SHIFT) and np.isclose(bottom, -ORIGIN_SHIFT)
+    assert is_valid_tile(1, 1, 1)
+    assert not is_valid_tile(1, 2, 0)
+    assert not is_valid_tile(-1, 0, 0)
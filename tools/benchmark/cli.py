@@ -0,0 +1,78 @@
+import argparse
+import sys
+from pathlib import Path
+from typing import Final
+
+from .synthetic import synthetic_products
+from .suite import compare, git_commit, previous_results, run_suite, save_results
+
+BENCHMARK_FOLDER: Final = Path.cwd().joinpath("data", "benchmark")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmark imagery processing on synthetic Sentinel-2 products."
+    )
+
+    parser.add_argument(
+        "--size",
+        "-s",
+        action="store",
+        required=False,
+        type=int,
+        default=1830,
+        dest="size",
+        help="width of synthetic tiles in 10m pixels, divisible by 6, real tiles have 10980",
+    )
+    parser.add_argument(
+        "--count",
+        "-c",
+        action="store",
+        required=False,
+        type=int,
+        default=2,
+        dest="count",
+        help="number of synthetic products",
+    )
+    parser.add_argument(
+        "--clouds",
+        action="store",
+        required=False,
+        type=float,
+        default=0.2,
+        dest="clouds",
+        help="fraction of tiles covered by clouds",
+    )
+    parser.add_argument(
+        "--repeat",
+        "-r",
+        action="store",
+        required=False,
+        type=int,
+        default=3,
+        dest="repeat",
+    )
+    parser.add_argument(
+        "--fail-on-regression",
+        action="store_true",
+        dest="fail_on_regression",
+        help="exit with an error if any benchmark is slower than on previous commit",
+    )
+
+    args = parser.parse_args()
+
+    products_folder = BENCHMARK_FOLDER.joinpath(
+        "products", f"{args.size}px_{int(args.clouds * 100)}clouds"
+    )
+    products = synthetic_products(products_folder, args.count, args.size, args.clouds)
+
+    timings = run_suite(products, BENCHMARK_FOLDER.joinpath("work"), args.repeat)
+
+    params = {"size": args.size, "count": args.count, "clouds": args.clouds}
+    results_file = BENCHMARK_FOLDER.joinpath("results.jsonl")
+    previous = previous_results(results_file, git_commit(), params)
+    results = save_results(results_file, timings, params)
+    regressions = compare(results, previous)
+
+    if regressions and args.fail_on_regression:
+        sys.exit(f"Regressions in: {', '.join(regressions)}")
@@ -0,0 +1,235 @@
+"""
+Benchmarks of imagery processing functions and of the whole pipeline,
+run offline on synthetic products.
+"""
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import geopandas
+import rasterio
+from shapely.geometry import box
+
+from src.db_client.models.aois import AOI
+from src.imagery_processing.detect_clouds import detect_clouds
+from src.imagery_processing.get_bands import bands_2A
+from src.imagery_processing.indexes import INDEXES
+from src.imagery_processing.mask import masking, masking_aoi
+from src.imagery_processing.merge import merge_rasters
+from src.imagery_processing.reproject import epsg3857
+from src.pipeline.engine import process_products
+from src.pipeline.models.tasks import TaskDefinition
+
+# slowdown reported as a regression
+REGRESSION_THRESHOLD = 0.10
+# differences of fast benchmarks below this are noise
+NOISE_SECONDS = 0.01
+
+
+def _time(func: Callable, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"min_seconds": min(times), "median_seconds": statistics.median(times)}
+
+
+def _clean(folder: Path) -> Path:
+    shutil.rmtree(folder, ignore_errors=True)
+    folder.mkdir(parents=True)
+    return folder
+
+
+def central_box(layer: Path, fraction: float = 0.5):
+    """
+    Box in the middle of the raster, in its CRS.
+    """
+    with rasterio.open(layer) as src:
+        left, bottom, right, top = src.bounds
+    margin_x = (right - left) * (1 - fraction) / 2
+    margin_y = (top - bottom) * (1 - fraction) / 2
+    return box(left + margin_x, bottom + margin_y, right - margin_x, top - margin_y)
+
+
+def run_suite(products: List[Path], work_folder: Path, repeat: int) -> Dict[str, dict]:
+    """
+    Times every processing function on the products, returns timings by benchmark.
+    """
+    timings = {}
+    product = products[0]
+
+    timings["bands_2A"] = _time(lambda: bands_2A(product), repeat)
+    bands = [bands_2A(folder) for folder in products]
+
+    # ------------------------------------------------------------------------------------ indexes
+    indexes_folder = _clean(work_folder.joinpath("indexes"))
+    for key, (index, index_bands) in INDEXES.items():
+        timings[f"index.{key}"] = _time(
+            lambda: index(
+                product.name,
+                *[bands[0][band] for band in index_bands],
+                indexes_folder,
+            ),
+            repeat,
+        )
+    ndvi, ndvi_bands = INDEXES["ndvi"]
+    layers = [
+        ndvi(folder.name, *[found[band] for band in ndvi_bands], indexes_folder)
+        for folder, found in zip(products, bands)
+    ]
+
+    # ------------------------------------------------------------------------------------ reproject and merge
+    reprojected_folder = _clean(work_folder.joinpath("reprojected"))
+    timings["epsg3857"] = _time(lambda: epsg3857(layers[0], reprojected_folder), repeat)
+    reprojected = [epsg3857(layer, reprojected_folder) for layer in layers]
+
+    merged_folder = _clean(work_folder.joinpath("merged"))
+    timings["merge_rasters"] = _time(
+        lambda: merge_rasters("ndvi", reprojected, merged_folder), repeat
+    )
+    merged = merge_rasters("ndvi", reprojected, merged_folder)
+
+    # ------------------------------------------------------------------------------------ masking
+    masked_folder = _clean(work_folder.joinpath("masked"))
+    shapes = geopandas.GeoSeries([central_box(merged)], crs="EPSG:3857")
+    timings["masking"] = _time(
+        lambda: masking(merged, "benchmark", shapes, masked_folder), repeat
+    )
+    aoi = AOI(
+        geom_id=1,
+        order_id=1,
+        geometry=central_box(merged, fraction=0.1).wkt,
+        epsg=3857,
+    )
+    timings["masking_aoi"] = _time(
+        lambda: masking_aoi(merged, aoi, "0", masked_folder), repeat
+    )
+
+    # ------------------------------------------------------------------------------------ clouds
+    clouds_folder = _clean(work_folder.joinpath("clouds"))
+    timings["detect_clouds"] = _time(
+        lambda: detect_clouds(
+            product.name,
+            bands[0]["cloud_classif"],
+            bands[0]["cloud_prob"],
+            clouds_folder,
+        ),
+        repeat,
+    )
+
+    # ------------------------------------------------------------------------------------ whole task
+    timings["task"] = _time(lambda: run_task(products, work_folder), repeat)
+    return timings
+
+
+def run_task(products: List[Path], work_folder: Path) -> None:
+    """
+    Runs the pipeline of a region task with all indexes and a clouds mask,
+    like a task.run without searching and downloading products.
+    """
+    task_folder = _clean(work_folder.joinpath("task"))
+    shapefile = task_folder.joinpath("region.shp")
+    layers = [bands_2A(folder)["b03_60m"] for folder in products]
+    with rasterio.open(layers[0]) as src:
+        crs = src.crs
+    geopandas.GeoSeries([central_box(layers[0])], crs=crs).to_crs("EPSG:3857").to_file(
+        shapefile
+    )
+
+    task = TaskDefinition(
+        name="benchmark",
+        region={"shapefile": shapefile},
+        indexes=list(INDEXES),
+        masks=[{"name": "clouds", "clouds": True, "indexes": ["ndwi", "ndvi"]}],
+        output={"layout": "region", "shapefile": shapefile, "clouds": True},
+    )
+
+    # pipeline writes to data folder of the working directory
+    home = Path.cwd()
+    os.chdir(task_folder)
+    try:
+        process_products(task, products, datetime(2023, 4, 1, 12))
+    finally:
+        os.chdir(home)
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return commit + ("-dirty" if status else "")
+
+
+def save_results(
+    results_file: Path, timings: Dict[str, dict], params: dict
+) -> List[dict]:
+    commit = git_commit()
+    date = datetime.now().isoformat()
+    results = [
+        {"commit": commit, "date": date, "benchmark": name, **params, **values}
+        for name, values in timings.items()
+    ]
+    results_file.parent.mkdir(parents=True, exist_ok=True)
+    with open(results_file, "a") as jsonl:
+        for result in results:
+            jsonl.write(json.dumps(result) + "\n")
+    return results
+
+
+def previous_results(results_file: Path, commit: str, params: dict) -> Dict[str, dict]:
+    """
+    Latest results of each benchmark from another commit, with the same parameters.
+    """
+    previous = {}
+    if not results_file.exists():
+        return previous
+    with open(results_file) as jsonl:
+        for line in jsonl:
+            result = json.loads(line)
+            if result["commit"] == commit:
+                continue
+            if any(result.get(key) != value for key, value in params.items()):
+                continue
+            previous[result["benchmark"]] = result
+    return previous
+
+
+def compare(results: List[dict], previous: Dict[str, dict]) -> List[str]:
+    """
+    Prints results next to previous ones, returns names of regressed benchmarks.
+    """
+    regressions = []
+    header = f"{'benchmark':<20}{'min s':>10}{'median s':>10}{'before s':>10}{'change':>9}  commit"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        line = f"{result['benchmark']:<20}{result['min_seconds']:>10.3f}{result['median_seconds']:>10.3f}"
+        before = previous.get(result["benchmark"])
+        if before:
+            # minimum is the least noisy estimate of the time
+            change = result["min_seconds"] / before["min_seconds"] - 1
+            line += (
+                f"{before['min_seconds']:>10.3f}{change:>+9.0%}  {before['commit'][:8]}"
+            )
+            slower = result["min_seconds"] - before["min_seconds"]
+            if change > REGRESSION_THRESHOLD and slower > NOISE_SECONDS:
+                line += "  REGRESSION"
+                regressions.append(result["benchmark"])
+        print(line)
+    return regressions
@@ -0,0 +1,153 @@
+"""
+Generator of synthetic Sentinel-2 L2A products, with the same folder layout,
+band names, resolutions, CRS and cloud masks as products from Open Access Hub.
+"""
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Final, List
+
+import numpy as np
+import rasterio
+from rasterio.transform import from_origin
+
+# bands read by src.imagery_processing.get_bands.bands_2A
+BANDS: Final = {
+    10: ["B02", "B03", "B04", "B08"],
+    20: ["B11", "B12"],
+    60: ["B01", "B03"],
+}
+# real tiles are 109.8 km wide, with 9.8 km overlap
+TILE_OVERLAP: Final = 0.09
+# origin of the first tile, UTM zone 34N (EPSG:32634)
+ORIGIN: Final = (399960.0, 5600040.0)
+TILES: Final = ["CA", "DA", "EA", "CV", "DV", "EV", "CB", "DB", "EB"]
+
+
+def _driver() -> str:
+    with rasterio.Env() as env:
+        if "JP2OpenJPEG" in env.drivers():
+            return "JP2OpenJPEG"
+    # GDAL recognizes the format by content, not by .jp2 extension
+    return "GTiff"
+
+
+def _surface(rng: np.random.Generator, size: int, low: int, high: int) -> np.ndarray:
+    """
+    Smooth field with noise, so compression and index values resemble real imagery.
+    """
+    coarse = rng.uniform(low, high, (max(size // 64, 2), max(size // 64, 2)))
+    rows = np.linspace(0, coarse.shape[0] - 1, size).astype(int)
+    cols = np.linspace(0, coarse.shape[1] - 1, size).astype(int)
+    smooth = coarse[np.ix_(rows, cols)]
+    noise = rng.normal(0, (high - low) * 0.02, (size, size))
+    return np.clip(smooth + noise, low, high)
+
+
+def _write(file: Path, data: np.ndarray, resolution: int, origin: tuple, driver: str):
+    file.parent.mkdir(parents=True, exist_ok=True)
+    with rasterio.open(
+        file,
+        "w",
+        driver=driver,
+        width=data.shape[1],
+        height=data.shape[0],
+        count=1,
+        dtype=data.dtype,
+        crs="EPSG:32634",
+        transform=from_origin(origin[0], origin[1], resolution, resolution),
+    ) as dst:
+        dst.write(data, 1)
+
+
+def synthetic_product(
+    folder: Path,
+    tile: str,
+    sensing: datetime,
+    size: int = 10980,
+    origin: tuple = ORIGIN,
+    clouds: float = 0.2,
+    seed: int = 0,
+) -> Path:
+    """
+    Writes one L2A SAFE-like product, size is the width of the tile in 10m pixels.
+    Returns folder of the product.
+    """
+    if size % 6:
+        raise ValueError("Size of the tile must be divisible by 6, as 60m bands are")
+
+    rng = np.random.default_rng(seed)
+    driver = _driver()
+
+    date = sensing.strftime("%Y%m%dT%H%M%S")
+    generation = (sensing + timedelta(hours=3)).strftime("%Y%m%dT%H%M%S")
+    name = f"S2A_MSIL2A_{date}_N0509_R079_T{tile}_{generation}.SAFE"
+    granule = folder.joinpath(name, "GRANULE", f"L2A_T{tile}_A000000_{date}")
+
+    for resolution, bands in BANDS.items():
+        pixels = size * 10 // resolution
+        for band in bands:
+            data = _surface(rng, pixels, 1, 10000).astype("uint16")
+            _write(
+                granule.joinpath(
+                    "IMG_DATA",
+                    f"R{resolution}m",
+                    f"T{tile}_{date}_{band}_{resolution}m.jp2",
+                ),
+                data,
+                resolution,
+                origin,
+                driver,
+            )
+
+    # probability of clouds in 20m, classification of clouds in 60m
+    probability = _surface(rng, size // 2, 0, 100)
+    threshold = np.quantile(probability, 1 - clouds) if clouds > 0 else 101
+    probability = np.where(probability >= threshold, probability, 0).astype("uint8")
+    _write(
+        granule.joinpath("QI_DATA", "MSK_CLDPRB_20m.jp2"),
+        probability,
+        20,
+        origin,
+        driver,
+    )
+    classification = (probability[::3, ::3] > 50).astype("uint8")
+    _write(
+        granule.joinpath("QI_DATA", "MSK_CLASSI_B00.jp2"),
+        classification,
+        60,
+        origin,
+        driver,
+    )
+
+    return folder.joinpath(name)
+
+
+def synthetic_products(
+    folder: Path,
+    count: int = 2,
+    size: int = 10980,
+    clouds: float = 0.2,
+    sensing: datetime = datetime(2023, 4, 1, 9, 50, 31),
+) -> List[Path]:
+    """
+    Writes count products of neighbouring tiles, sensed on the same day.
+    Products already written with the same parameters are reused.
+    """
+    if count > len(TILES):
+        raise ValueError(f"At most {len(TILES)} synthetic products are supported")
+
+    stride = size * 10 * (1 - TILE_OVERLAP)
+    products = []
+    for i in range(count):
+        row, col = divmod(i, 3)
+        origin = (ORIGIN[0] + col * stride, ORIGIN[1] - row * stride)
+        tile = f"34U{TILES[i]}"
+        existing = list(folder.glob(f"*_T{tile}_*.SAFE"))
+        if existing:
+            products.append(existing[0])
+            continue
+        print(f"Writing synthetic product {tile} ({size}x{size} px)")
+        products.append(
+            synthetic_product(folder, tile, sensing, size, origin, clouds, seed=i)
+        )
+    return products
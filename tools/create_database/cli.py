@@ -1,5 +1,26 @@
-from src.db_client.db_client import DBClient, DBClientModel
+import argparse
+import sys
+
+from src.db_client.db_client import DBClient
 
 
 def cli() -> None:
-    db = DBClient().prepare_database()
+    parser = argparse.ArgumentParser(
+        description="Create the database or migrate it to the latest schema."
+    )
+    parser.add_argument(
+        "--check-indexes",
+        action="store_true",
+        dest="check_indexes",
+        help="check with EXPLAIN that frequent queries use indexes",
+    )
+
+    args = parser.parse_args()
+
+    db = DBClient()
+    if args.check_indexes:
+        scans = db.check_query_plans()
+        if any(scans.values()):
+            sys.exit("Some queries scan whole tables")
+    else:
+        db.prepare_database()
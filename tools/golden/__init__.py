@@ -0,0 +1,7 @@
+from .cli import cli
+
+
+__all__ = [
+    # cli
+    "cli",
+]
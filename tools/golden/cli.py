@@ -0,0 +1,70 @@
+import argparse
+import sys
+from pathlib import Path
+from typing import Final
+
+from tools.benchmark.synthetic import synthetic_products
+from .compare import compare, load, print_speedups, record
+from .outputs import produce_outputs
+
+GOLDEN_FOLDER: Final = Path.cwd().joinpath("data", "golden")
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(
+        description="Compare outputs of imagery processing with golden outputs."
+    )
+
+    parser.add_argument(
+        "--record",
+        action="store_true",
+        dest="record",
+        help="replace golden outputs with outputs of the current code",
+    )
+    parser.add_argument(
+        "--size",
+        "-s",
+        action="store",
+        required=False,
+        type=int,
+        default=600,
+        dest="size",
+        help="width of synthetic tiles in 10m pixels, divisible by 6",
+    )
+    parser.add_argument(
+        "--count",
+        "-c",
+        action="store",
+        required=False,
+        type=int,
+        default=2,
+        dest="count",
+        help="number of synthetic products",
+    )
+
+    args = parser.parse_args()
+
+    name = f"{args.size}px_{args.count}products"
+    golden_folder = GOLDEN_FOLDER.joinpath(name)
+    products = synthetic_products(
+        GOLDEN_FOLDER.joinpath("products", f"{args.size}px"), args.count, args.size
+    )
+    outputs, timings = produce_outputs(products, GOLDEN_FOLDER.joinpath("work", name))
+
+    if args.record:
+        record(
+            golden_folder, outputs, timings, {"size": args.size, "count": args.count}
+        )
+        return
+
+    if not golden_folder.joinpath("golden.json").exists():
+        sys.exit(f"No golden outputs in {golden_folder}, record them with --record")
+
+    golden = load(golden_folder)
+    print(f"Comparing with golden outputs of commit {golden['commit']}")
+    drifted = compare(golden_folder, outputs)
+    print()
+    print_speedups(golden["timings"], timings)
+
+    if drifted:
+        sys.exit(f"{len(drifted)} outputs differ from golden outputs")
@@ -0,0 +1,178 @@
+"""
+Golden rasters with their statistics, and comparison of new outputs with them.
+"""
+import json
+import shutil
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Final, List, Union
+
+import numpy as np
+import rasterio
+
+from tools.benchmark.suite import git_commit
+
+# exponential and power indexes are more sensitive to reordered float32 operations
+TOLERANCES: Final = {
+    "default": {"abs": 1e-6, "rel": 1e-5},
+    "cdom": {"abs": 1e-6, "rel": 1e-4},
+    "doc": {"abs": 1e-6, "rel": 1e-4},
+    "chla": {"abs": 1e-6, "rel": 1e-4},
+    "cya": {"abs": 1e-6, "rel": 1e-4},
+}
+
+
+def _file_name(name: str) -> str:
+    return name.replace("/", "__") + ".tif"
+
+
+def statistics(layer: Path) -> dict:
+    with rasterio.open(layer) as src:
+        data = src.read().astype("f8")
+        shape = [src.count, src.height, src.width]
+    valid = data[np.isfinite(data)]
+    return {
+        "shape": shape,
+        "nan_pixels": int(np.count_nonzero(np.isnan(data))),
+        "inf_pixels": int(np.count_nonzero(np.isinf(data))),
+        "min": float(valid.min()) if valid.size else None,
+        "max": float(valid.max()) if valid.size else None,
+        "mean": float(valid.mean()) if valid.size else None,
+    }
+
+
+def record(
+    golden_folder: Path,
+    outputs: Dict[str, Union[Path, None]],
+    timings: Dict[str, float],
+    params: dict,
+) -> None:
+    """
+    Replaces golden rasters and statistics with the outputs.
+    """
+    shutil.rmtree(golden_folder, ignore_errors=True)
+    rasters = golden_folder.joinpath("rasters")
+    rasters.mkdir(parents=True)
+
+    stats = {}
+    for name, layer in outputs.items():
+        if layer is None:
+            stats[name] = None
+            continue
+        shutil.copy(layer, rasters.joinpath(_file_name(name)))
+        stats[name] = statistics(layer)
+
+    golden = {
+        "commit": git_commit(),
+        "date": datetime.now().isoformat(),
+        **params,
+        "timings": timings,
+        "statistics": stats,
+    }
+    with open(golden_folder.joinpath("golden.json"), "w") as file:
+        json.dump(golden, file, indent=2)
+    print(f"Recorded {len(outputs)} golden outputs in {golden_folder}")
+
+
+def load(golden_folder: Path) -> dict:
+    with open(golden_folder.joinpath("golden.json")) as file:
+        return json.load(file)
+
+
+def compare_rasters(golden: Path, new: Path, tolerance: dict) -> dict:
+    """
+    Compares georeference, shape and NaN pattern of the rasters, and finite values
+    which can differ by tolerance["abs"] or by tolerance["rel"] of the golden value.
+    """
+    with rasterio.open(golden) as src:
+        expected = src.read().astype("f8")
+        georeference = (src.crs, src.transform)
+    with rasterio.open(new) as src:
+        actual = src.read().astype("f8")
+        same_georeference = src.crs == georeference[0] and src.transform.almost_equals(
+            georeference[1]
+        )
+
+    if expected.shape != actual.shape:
+        return {"passed": False, "reason": f"shape {actual.shape} != {expected.shape}"}
+    if not same_georeference:
+        return {"passed": False, "reason": "different CRS or transform"}
+
+    # NaN and infinite values must be at the same pixels
+    nan_differences = sum(
+        int(np.count_nonzero(special(expected) != special(actual)))
+        for special in [np.isnan, np.isposinf, np.isneginf]
+    )
+
+    valid = np.isfinite(expected) & np.isfinite(actual)
+    difference = np.abs(expected[valid] - actual[valid])
+    magnitude = np.abs(expected[valid])
+    max_abs = float(difference.max()) if difference.size else 0.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = np.where(magnitude > 0, difference / magnitude, difference)
+    max_rel = float(relative.max()) if relative.size else 0.0
+    within = np.all(difference <= tolerance["abs"] + tolerance["rel"] * magnitude)
+
+    return {
+        "passed": bool(nan_differences == 0 and within),
+        "reason": ""
+        if nan_differences == 0
+        else f"{nan_differences} NaN or infinite pixels differ",
+        "max_abs": max_abs,
+        "max_rel": max_rel,
+    }
+
+
+def compare(golden_folder: Path, outputs: Dict[str, Union[Path, None]]) -> List[str]:
+    """
+    Prints comparison of every output with its golden raster,
+    returns names of outputs that drifted.
+    """
+    golden = load(golden_folder)
+    names = sorted(set(golden["statistics"]) | set(outputs))
+
+    drifted = []
+    header = f"{'output':<60}{'status':>8}{'max abs':>12}{'max rel':>12}  details"
+    print(header)
+    print("-" * len(header))
+    for name in names:
+        expected = golden["statistics"].get(name, "missing")
+        layer = outputs.get(name, "missing")
+        max_abs = max_rel = ""
+        if expected == "missing" or layer == "missing":
+            passed = False
+            reason = (
+                "not in golden outputs" if expected == "missing" else "not produced"
+            )
+        elif expected is None or layer is None:
+            passed = expected is None and layer is None
+            reason = "" if passed else "only one of outputs is empty"
+        else:
+            tolerance = TOLERANCES.get(name.split("/")[1], TOLERANCES["default"])
+            result = compare_rasters(
+                golden_folder.joinpath("rasters", _file_name(name)), layer, tolerance
+            )
+            passed, reason = result["passed"], result["reason"]
+            if "max_abs" in result:
+                max_abs = f"{result['max_abs']:.3g}"
+                max_rel = f"{result['max_rel']:.3g}"
+
+        if not passed:
+            drifted.append(name)
+        print(
+            f"{name[:59]:<60}{'ok' if passed else 'DRIFT':>8}{max_abs:>12}{max_rel:>12}  {reason}"
+        )
+    return drifted
+
+
+def print_speedups(golden_timings: Dict[str, float], timings: Dict[str, float]) -> None:
+    header = f"{'stage':<20}{'golden s':>10}{'new s':>10}{'speedup':>9}"
+    print(header)
+    print("-" * len(header))
+    for stage, seconds in timings.items():
+        before = golden_timings.get(stage)
+        if before is None:
+            print(f"{stage:<20}{'':>10}{seconds:>10.3f}")
+            continue
+        speedup = before / seconds if seconds else float("inf")
+        print(f"{stage:<20}{before:>10.3f}{seconds:>10.3f}{speedup:>8.2f}x")
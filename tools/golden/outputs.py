@@ -0,0 +1,84 @@
+"""
+Outputs of indexes, reprojection, merging, masking and of the whole pipeline
+for fixed synthetic products, with time spent in each stage.
+"""
+import shutil
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple, Union
+
+import geopandas
+
+from src.db_client.models.aois import AOI
+from src.imagery_processing.get_bands import bands_2A
+from src.imagery_processing.indexes import INDEXES
+from src.imagery_processing.mask import masking, masking_aoi
+from src.imagery_processing.merge import merge_rasters
+from src.imagery_processing.reproject import epsg3857
+from tools.benchmark.suite import central_box, run_task
+
+
+def _timed(timings: Dict[str, float], stage: str, func: Callable):
+    start = time.perf_counter()
+    result = func()
+    timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+    return result
+
+
+def produce_outputs(
+    products: List[Path], work_folder: Path
+) -> Tuple[Dict[str, Union[Path, None]], Dict[str, float]]:
+    """
+    Returns outputs by name, as <stage>/<index>/<detail>, and seconds by stage.
+    Output is None when the stage produced no raster.
+    """
+    shutil.rmtree(work_folder, ignore_errors=True)
+    outputs = {}
+    timings = {}
+    bands = [bands_2A(folder) for folder in products]
+
+    for key, (index, index_bands) in INDEXES.items():
+        folder = work_folder.joinpath(key)
+        folder.mkdir(parents=True)
+
+        reprojected = []
+        for product, found in zip(products, bands):
+            tile = product.name.split("_")[5]
+            layer = _timed(
+                timings,
+                f"index.{key}",
+                lambda: index(
+                    product.name, *[found[band] for band in index_bands], folder
+                ),
+            )
+            outputs[f"index/{key}/{tile}"] = layer
+            reprojected.append(
+                _timed(timings, "reproject", lambda: epsg3857(layer, folder))
+            )
+            outputs[f"reproject/{key}/{tile}"] = reprojected[-1]
+
+        merged = _timed(
+            timings, "merge", lambda: merge_rasters(key, reprojected, folder)
+        )
+        outputs[f"merge/{key}/mosaic"] = merged
+
+        shapes = geopandas.GeoSeries([central_box(merged)], crs="EPSG:3857")
+        outputs[f"mask/{key}/box"] = _timed(
+            timings, "mask", lambda: masking(merged, "golden", shapes, folder)
+        )
+        aoi = AOI(
+            geom_id=1,
+            order_id=1,
+            geometry=central_box(merged, fraction=0.1).wkt,
+            epsg=3857,
+        )
+        outputs[f"mask_aoi/{key}/aoi"] = _timed(
+            timings, "mask_aoi", lambda: masking_aoi(merged, aoi, "0", folder)
+        )
+
+    # final products of a regional task, named <index>_epoch..._<masks>.tif
+    _timed(timings, "task", lambda: run_task(products, work_folder))
+    for layer in sorted(work_folder.joinpath("task", "data", "final").rglob("*.tif")):
+        outputs[f"task/{layer.stem.split('_')[0]}/{layer.stem}"] = layer
+
+    return outputs, timings
@@ -0,0 +1,137 @@
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+import requests
+
+
+def get_token(url: str, username: str, password: str) -> str:
+    response = requests.post(
+        f"{url}/token", data={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+
+def _request(session: requests.Session, url: str) -> float:
+    start = time.perf_counter()
+    response = session.get(url)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+def run_level(url: str, token: str, concurrency: int, requests_count: int) -> dict:
+    """
+    Sends requests_count requests from concurrency threads at once.
+    """
+    sessions = []
+    for _ in range(concurrency):
+        session = requests.Session()
+        session.headers["Authorization"] = f"Bearer {token}"
+        sessions.append(session)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = list(
+            executor.map(
+                lambda i: _request(sessions[i % concurrency], url),
+                range(requests_count),
+            )
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": requests_count / elapsed,
+        "median_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def print_results(endpoint: str, results: List[dict]) -> None:
+    print(endpoint)
+    header = f"{'threads':>8}{'req/s':>10}{'median ms':>12}{'p95 ms':>10}{'scaling':>9}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        scaling = result["throughput"] / results[0]["throughput"]
+        print(
+            f"{result['concurrency']:>8}{result['throughput']:>10.1f}"
+            f"{result['median_ms']:>12.1f}{result['p95_ms']:>10.1f}{scaling:>8.1f}x"
+        )
+    print()
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(
+        description="Measure throughput of the API under concurrent requests."
+    )
+    parser.add_argument(
+        "--url",
+        action="store",
+        required=False,
+        type=str,
+        default="http://127.0.0.2:8000",
+        dest="url",
+    )
+    parser.add_argument(
+        "--username",
+        "-u",
+        action="store",
+        required=False,
+        type=str,
+        default="test_user_1",
+        dest="username",
+    )
+    parser.add_argument(
+        "--password",
+        "-p",
+        action="store",
+        required=True,
+        type=str,
+        dest="password",
+    )
+    parser.add_argument(
+        "--concurrency",
+        "-c",
+        action="store",
+        required=False,
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8, 16, 32],
+        dest="concurrency",
+        help="numbers of concurrent clients to test",
+    )
+    parser.add_argument(
+        "--requests",
+        "-n",
+        action="store",
+        required=False,
+        type=int,
+        default=200,
+        dest="requests_count",
+        help="number of requests for every number of clients",
+    )
+    parser.add_argument(
+        "--endpoints",
+        "-e",
+        action="store",
+        required=False,
+        type=str,
+        nargs="+",
+        default=["/users/me/", "/aois/mine/"],
+        dest="endpoints",
+    )
+
+    args = parser.parse_args()
+
+    token = get_token(args.url, args.username, args.password)
+    for endpoint in args.endpoints:
+        results = [
+            run_level(args.url + endpoint, token, concurrency, args.requests_count)
+            for concurrency in args.concurrency
+        ]
+        print_results(endpoint, results)
@@ -0,0 +1,82 @@
+import argparse
+import multiprocessing
+import time
+from typing import List
+
+from settings import JOBS_POLL_SECONDS, JOBS_STALE_SECONDS
+from src.db_client.db_client import DBClient
+from src.pipeline.jobs import JOBS, run_job
+
+
+def cli() -> None:
+    parser = argparse.ArgumentParser(
+        description="Run background jobs queued in the database."
+    )
+    parser.add_argument(
+        "--kinds",
+        "-k",
+        action="store",
+        required=False,
+        type=str,
+        nargs="+",
+        choices=list(JOBS),
+        default=list(JOBS),
+        dest="kinds",
+        help="kinds of jobs run by this worker",
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        dest="once",
+        help="exit when there are no queued jobs",
+    )
+    parser.add_argument(
+        "--poll-seconds",
+        action="store",
+        required=False,
+        type=float,
+        default=JOBS_POLL_SECONDS,
+        dest="poll_seconds",
+    )
+
+    parser.add_argument(
+        "--workers",
+        "-w",
+        action="store",
+        required=False,
+        type=int,
+        default=1,
+        dest="workers",
+        help="worker processes started on this node",
+    )
+
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        work(args.kinds, args.once, args.poll_seconds)
+        return
+    # every process opens its own connections to the database
+    processes = [
+        multiprocessing.Process(
+            target=work, args=(args.kinds, args.once, args.poll_seconds)
+        )
+        for _ in range(args.workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+def work(kinds: List[str], once: bool, poll_seconds: float) -> None:
+    db = DBClient()
+    while True:
+        for job_id in db.requeue_stale_jobs(JOBS_STALE_SECONDS):
+            print(f"Job {job_id} has no heartbeats, queued again")
+        job = db.claim_job(kinds)
+        if job is not None:
+            run_job(job, db)
+        elif once:
+            break
+        else:
+            time.sleep(poll_seconds)
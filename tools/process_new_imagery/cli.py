@@ -1,22 +1,40 @@
-from .task import run
-from .task_boleslaw import run_boleslaw
+from pathlib import Path
+from typing import Final
+
+from src.pipeline.distributed import submit_task
+from src.pipeline.engine import run_task
+from src.pipeline.models.tasks import TaskDefinition
 from .task_check_clouds_coverage import run_check_clouds_coverage
 import argparse
 from datetime import datetime
 
+# every .yml file in this folder defines a task, named after the file
+TASKS_FOLDER: Final = Path(__file__).parent.joinpath("tasks")
+
 
 def cli() -> None:
+    tasks = {file.stem: file for file in sorted(TASKS_FOLDER.glob("*.yml"))}
+
     parser = argparse.ArgumentParser(description="Process new satellite imagery.")
 
     parser.add_argument(
         "--task-name",
         "-tn",
         action="store",
-        choices=["task", "boleslaw", "clouds"],
-        required=True,
+        choices=[*tasks.keys(), "clouds"],
+        required=False,
         type=str,
         dest="task_name",
     )
+    parser.add_argument(
+        "--task-file",
+        "-tf",
+        action="store",
+        required=False,
+        type=Path,
+        dest="task_file",
+        help="task definition outside of the tasks folder",
+    )
     parser.add_argument(
         "--from",
         "-f",
@@ -34,11 +52,24 @@ def cli() -> None:
         dest="sentinel_to",
     )
 
+    parser.add_argument(
+        "--distributed",
+        "-d",
+        action="store_true",
+        dest="distributed",
+        help="queue jobs of the task for workers of tools.process_jobs",
+    )
+
     args = parser.parse_args()
+    run = submit_task if args.distributed else run_task
 
-    if args.task_name == "task":
-        run(args.sentinel_from, args.sentinel_to)
-    elif args.task_name == "boleslaw":
-        run_boleslaw(args.sentinel_from, args.sentinel_to)
+    if args.task_file:
+        task = TaskDefinition.from_file(args.task_file)
+        run(task, args.sentinel_from, args.sentinel_to)
     elif args.task_name == "clouds":
         run_check_clouds_coverage(args.sentinel_from, args.sentinel_to)
+    elif args.task_name:
+        task = TaskDefinition.from_file(tasks[args.task_name])
+        run(task, args.sentinel_from, args.sentinel_to)
+    else:
+        parser.error("one of --task-name or --task-file is required")